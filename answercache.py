@@ -0,0 +1,103 @@
+"""Cache jawaban semantik: pertanyaan yang mirip (cosine) dengan pertanyaan sebelumnya dijawab dari cache."""
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 2000
+
+class SemanticAnswerCache:
+    """Cache in-process (TTL + LRU) dengan kunci (koleksi, versi koleksi, scope, embedding pertanyaan).
+
+    `scope` menggabungkan model chat, model embedding, dan parameter retrieval. Versi koleksi
+    dinaikkan lewat `invalidate` setiap ada chunk ditambah/dihapus, sehingga entri lama tidak
+    pernah cocok lagi. `lookup` mengembalikan versi yang dilihatnya; jawaban yang disusun dari
+    retrieval versi itu diteruskan ke `store` bersama versinya dan dibuang bila koleksi sudah
+    di-invalidate sementara jawaban dibuat. Perubahan dari replika lain hanya tertangkap lewat TTL.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._versions = {}
+        self._entries = OrderedDict()  # id -> (bucket, vektor ternormalisasi, payload, dibuat, biaya_detik)
+        self._buckets = {}             # bucket -> {id: vektor}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _bucket(self, collection, scope):
+        return (collection, self._versions.get(collection, 0), scope)
+
+    def lookup(self, collection, scope, embedding, threshold=DEFAULT_THRESHOLD, ttl=DEFAULT_TTL):
+        """Mengembalikan (hit, versi): hit = (payload, similarity) untuk entri termirip di atas
+        `threshold` atau None; versi koleksi saat lookup diteruskan ke `store`."""
+        vec = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            version = self._versions.get(collection, 0)
+            bucket = self._buckets.get(self._bucket(collection, scope))
+            if bucket:
+                ids = list(bucket)
+                sims = np.stack([bucket[i] for i in ids]) @ vec
+                for pos in np.argsort(-sims):
+                    if sims[pos] < threshold: break
+                    entry_id = ids[pos]
+                    _, _, payload, created, cost = self._entries[entry_id]
+                    if now - created > ttl:
+                        self._drop(entry_id)
+                        continue
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    self.saved_seconds += cost
+                    return (payload, float(sims[pos])), version
+            self.misses += 1
+            return None, version
+
+    def store(self, collection, scope, embedding, payload, cost_seconds, version=None):
+        """Simpan jawaban; dengan `version` dari `lookup`, jawaban dibuang (False) bila koleksi sudah
+        di-invalidate sejak itu, karena disusun dari retrieval yang sudah usang."""
+        with self._lock:
+            if version is not None and version != self._versions.get(collection, 0): return False
+            bucket_key = self._bucket(collection, scope)
+            entry_id, self._next_id = self._next_id, self._next_id + 1
+            vec = self._normalize(embedding)
+            self._entries[entry_id] = (bucket_key, vec, payload, time.time(), cost_seconds)
+            self._buckets.setdefault(bucket_key, {})[entry_id] = vec
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def invalidate(self, collection):
+        """Naikkan versi koleksi (dipanggil setelah chunk ditambah/dihapus) dan buang entrinya."""
+        with self._lock:
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+            for entry_id in [i for i, e in self._entries.items() if e[0][0] == collection]:
+                self._drop(entry_id)
+
+    def _drop(self, entry_id):
+        bucket_key = self._entries.pop(entry_id)[0]
+        bucket = self._buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket: del self._buckets[bucket_key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": len(self._entries),
+        }
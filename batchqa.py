@@ -0,0 +1,196 @@
+"""Tanya-jawab massal atas satu koleksi (uji regresi, pembuatan FAQ, QA run).
+
+Retrieval untuk semua pertanyaan dilakukan dengan satu `collection.query` berisi banyak query
+(dipecah per `QUERY_BATCH`), lalu panggilan LLM dijalankan konkuren dengan batas jumlah
+panggilan bersamaan dan batas panggilan per menit. Setiap jawaban langsung ditulis ke file
+JSONL/CSV begitu selesai, sehingga hasil parsial tetap ada bila proses dihentikan.
+"""
+import os
+import io
+import csv
+import json
+import time
+import asyncio
+
+import openai
+
+import tracing
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 300
+QUERY_BATCH = 100  # query per panggilan collection.query (Chroma Cloud membatasi ukuran request)
+NO_CONTEXT = "Tidak ada konteks relevan ditemukan"
+FIELDS = ["index", "question", "answer", "error", "sources", "wait_ms", "llm_ms", "latency_ms", "done_at_ms",
+          "prompt_tokens", "completion_tokens"]
+_QUESTION_COLUMNS = ("question", "pertanyaan", "q")
+
+def load_questions(data, filename="", errors=None):
+    """Daftar pertanyaan dari file unggahan: .csv (kolom question/pertanyaan, atau kolom pertama),
+    .jsonl (string atau objek dengan kunci question/pertanyaan), selain itu satu pertanyaan per baris.
+
+    Baris .jsonl yang tidak valid dilewati; bila `errors` (list) diberikan, pesannya ditambahkan ke
+    sana beserta nomor barisnya. Nilai non-string (mis. angka) diubah dengan `str()`."""
+    text = data.decode("utf-8-sig", "replace") if isinstance(data, bytes) else data
+    name = filename.lower()
+    errors = [] if errors is None else errors
+    questions = []
+    if name.endswith(".csv"):
+        rows = list(csv.reader(io.StringIO(text)))
+        if not rows: return []
+        header = [h.strip().lower() for h in rows[0]]
+        column = next((header.index(c) for c in _QUESTION_COLUMNS if c in header), None)
+        body = rows[1:] if column is not None else rows
+        questions = [r[column or 0] for r in body if len(r) > (column or 0)]
+    elif name.endswith((".jsonl", ".ndjson")):
+        for n, line in enumerate(text.splitlines(), start=1):
+            if not line.strip(): continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                errors.append(f"baris {n}: JSON tidak valid ({e})")
+                continue
+            if isinstance(rec, dict):
+                rec = next((rec[c] for c in _QUESTION_COLUMNS if rec.get(c) is not None), None)
+            if rec is None or isinstance(rec, (dict, list)):
+                errors.append(f"baris {n}: tidak ada pertanyaan (string atau kunci {'/'.join(_QUESTION_COLUMNS)})")
+                continue
+            questions.append(str(rec))
+    else:
+        questions = [line for line in text.splitlines() if not line.lstrip().startswith("#")]
+    return [q.strip() for q in questions if q and q.strip()]
+
+def query_batch(collection, n_results, query_embeddings=None, query_texts=None, batch_size=QUERY_BATCH):
+    """Top-k untuk banyak query sekaligus; mengembalikan list (ids, documents, metadatas) per query."""
+    queries = query_embeddings if query_embeddings is not None else query_texts
+    field = "query_embeddings" if query_embeddings is not None else "query_texts"
+    hits = []
+    for start in range(0, len(queries), batch_size):
+        part = list(queries[start:start + batch_size])
+        with tracing.span("collection.query", k=n_results, queries=len(part)):
+            res = collection.query(n_results=n_results, include=["documents", "metadatas"], **{field: part})
+        ids, docs, metas = res.get("ids") or [], res.get("documents") or [], res.get("metadatas") or []
+        for j in range(len(part)):
+            d = docs[j] if j < len(docs) else []
+            hits.append((ids[j] if j < len(ids) else [], d, (metas[j] if j < len(metas) else None) or [{}] * len(d)))
+    return hits
+
+class RateLimiter:
+    """Maks. `rpm` panggilan dimulai per menit, dijarakkan rata (dipakai di dalam satu event loop)."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Tunggu giliran; mengembalikan lama menunggu (detik)."""
+        if not self.interval: return 0.0
+        async with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+        if wait: await asyncio.sleep(wait)
+        return wait
+
+async def _answer_one(client, semaphore, limiter, model, job, batch_started, params):
+    row = {"index": job["index"], "question": job["question"], "answer": None, "error": None,
+           "sources": job.get("sources") or []}
+    async with semaphore:
+        queued = time.perf_counter()
+        await limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(model=model, messages=job["messages"], **params)
+            row["answer"] = response.choices[0].message.content
+            usage = getattr(response, "usage", None)
+            row["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+            row["completion_tokens"] = getattr(usage, "completion_tokens", None)
+        except openai.OpenAIError as e:
+            row["error"] = str(e)
+        finished = time.perf_counter()
+    row.update(wait_ms=round((started - queued) * 1000, 1), llm_ms=round((finished - started) * 1000, 1),
+               latency_ms=round((finished - queued) * 1000, 1), done_at_ms=round((finished - batch_started) * 1000, 1))
+    tracing.record("llm.batch", finished - started, model=model, question=job["index"],
+                   prompt_tokens=row.get("prompt_tokens"), completion_tokens=row.get("completion_tokens"))
+    return row
+
+async def answer_batch(jobs, api_key, model, concurrency=DEFAULT_CONCURRENCY, rpm=DEFAULT_RPM, on_result=None, **params):
+    """Jawab semua job ({index, question, messages, sources}) secara konkuren.
+
+    Job tanpa `messages` (retrieval kosong) tidak dikirim ke model. `on_result(row)` dipanggil di
+    thread event loop setiap satu jawaban selesai (urutan selesai, bukan urutan input). Galat per
+    pertanyaan dicatat di kolom `error` tanpa menghentikan yang lain; 429/5xx diulang oleh SDK.
+    Mengembalikan semua baris terurut `index`.
+    """
+    batch_started = time.perf_counter()
+    rows = []
+    for job in jobs:
+        if not job.get("messages"):
+            rows.append({"index": job["index"], "question": job["question"], "answer": None, "error": NO_CONTEXT,
+                         "sources": [], "done_at_ms": 0.0})
+            if on_result: on_result(rows[-1])
+    client = openai.AsyncOpenAI(api_key=api_key, max_retries=5)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    limiter = RateLimiter(rpm)
+    tasks = [asyncio.ensure_future(_answer_one(client, semaphore, limiter, model, job, batch_started, params))
+             for job in jobs if job.get("messages")]
+    try:
+        for task in asyncio.as_completed(tasks):
+            rows.append(await task)
+            if on_result: on_result(rows[-1])
+    finally:
+        for task in tasks: task.cancel()
+        await client.close()
+    return sorted(rows, key=lambda r: r["index"])
+
+class ResultWriter:
+    """Tulis baris hasil ke JSONL atau CSV (dari ekstensi `path`), di-flush per baris."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.csv = path.lower().endswith(".csv")
+        self._fh = open(path, "w", encoding="utf-8", newline="")
+        if self.csv:
+            self._writer = csv.DictWriter(self._fh, fieldnames=FIELDS, extrasaction="ignore")
+            self._writer.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self._writer.writerow(dict(row, sources="; ".join(row.get("sources") or [])))
+        else:
+            self._fh.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+def default_output_path(collection_name, fmt="jsonl"):
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in collection_name) or "koleksi"
+    return os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "batchqa",
+                        f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}.{fmt}")
+
+def _percentile(values, q):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def summarize(rows, wall_seconds, retrieval_seconds=0.0):
+    """Ringkasan run: throughput agregat dan sebaran latensi per pertanyaan (ms)."""
+    latencies = [r["latency_ms"] for r in rows if r.get("latency_ms") is not None]
+    return {
+        "questions": len(rows),
+        "answered": sum(1 for r in rows if r.get("answer")),
+        "errors": sum(1 for r in rows if r.get("error")),
+        "wall_seconds": round(wall_seconds, 2),
+        "questions_per_sec": round(len(rows) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "retrieval_ms": round(retrieval_seconds * 1000, 1),
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+        "latency_max_ms": max(latencies) if latencies else None,
+        "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in rows),
+        "completion_tokens": sum(r.get("completion_tokens") or 0 for r in rows),
+    }
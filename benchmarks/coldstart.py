@@ -0,0 +1,137 @@
+"""Ukur cold start: lama impor modul berat dan waktu run pertama aplikasi Streamlit (lazy vs eager).
+
+Setiap pengukuran berjalan di interpreter baru (subprocess) agar tidak ada modul yang sudah
+ter-cache. Aplikasi dijalankan dengan streamlit.testing.v1.AppTest; untuk cobalagi.py kunci API
+palsu diisi pada run kedua (tanpa panggilan jaringan) karena script berhenti sebelum UI utama bila
+kunci kosong. Penanda `first_paint` diambil dari warmup.py (detik sejak proses mulai).
+
+    python benchmarks/coldstart.py --repeat 3 --out benchmarks/results/coldstart.json
+
+Setiap aplikasi diukur dua kali: RAG_STARTUP=lazy (bawaan) dan RAG_STARTUP=eager.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ("streamlit", "openai", "chromadb", "sentence_transformers", "tiktoken", "numpy", "pypdf",
+                   "PyPDF2", "docx", "chromaconn", "embedcache", "ingest", "npvector")
+DEFAULT_APPS = ("cobalagi.py", "uploadchroma.py")
+
+_IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+try:
+    import {module}
+except ImportError:
+    print("null")
+else:
+    print(time.perf_counter() - started)
+"""
+
+_APP_SNIPPET = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+import warmup
+at = AppTest.from_file({app!r}, default_timeout={timeout})
+started = time.perf_counter()
+at.run()
+result = {{"first_run_ms": (time.perf_counter() - started) * 1000}}
+keys = [w for w in at.sidebar.text_input if "API Key" in w.label]
+if keys:
+    started = time.perf_counter()
+    keys[0].input("sk-coldstart").run()
+    result["run_with_key_ms"] = (time.perf_counter() - started) * 1000
+result.update({{f"{{name}}_ms": seconds * 1000 for name, seconds in warmup._marks.items()}})
+result["exceptions"] = [str(e.value) for e in at.exception]
+print(json.dumps(result))
+"""
+
+def _python(code, env=None):
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                         env=dict(os.environ, **(env or {})))
+    lines = out.stdout.strip().splitlines()
+    if out.returncode != 0 or not lines:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}")
+    return json.loads(lines[-1])
+
+def bench_imports(modules, repeat):
+    results = {}
+    for module in modules:
+        samples = [_python(_IMPORT_SNIPPET.format(root=ROOT, module=module)) for _ in range(repeat)]
+        if samples[0] is None:
+            print(f"  {module:<22} tidak terpasang", flush=True)
+            continue
+        results[module] = {"min_ms": min(samples) * 1000, "median_ms": sorted(samples)[len(samples) // 2] * 1000}
+        print(f"  {module:<22} {results[module]['median_ms']:>8.0f} ms", flush=True)
+    return results
+
+def bench_apps(apps, repeat, timeout):
+    results = {}
+    for app in apps:
+        for mode in ("lazy", "eager"):
+            runs = []
+            for _ in range(repeat):
+                try:
+                    runs.append(_python(_APP_SNIPPET.format(root=ROOT, app=os.path.join(ROOT, app), timeout=timeout),
+                                        env={"RAG_STARTUP": mode}))
+                except RuntimeError as e:
+                    print(f"  {app} ({mode}) gagal: {e}", flush=True)
+                    break
+            if not runs: continue
+            # Median per metrik dari beberapa proses baru
+            summary = {}
+            for key in {k for r in runs for k, v in r.items() if isinstance(v, (int, float))}:
+                values = sorted(r[key] for r in runs if key in r)
+                summary[key] = values[len(values) // 2]
+            summary["exceptions"] = runs[-1].get("exceptions", [])
+            results[f"{app}:{mode}"] = summary
+            print(f"  {app:<18} {mode:<6} run pertama {summary.get('first_run_ms', 0):>7.0f} ms · "
+                  f"first paint {summary.get('first_paint_ms', float('nan')):>7.0f} ms sejak proses mulai"
+                  + (f" · dengan kunci {summary['run_with_key_ms']:.0f} ms" if "run_with_key_ms" in summary else ""), flush=True)
+    return results
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark cold start (impor modul dan run pertama aplikasi).")
+    p.add_argument("--modules", default=",".join(DEFAULT_MODULES))
+    p.add_argument("--apps", default=",".join(DEFAULT_APPS))
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--timeout", type=float, default=300.0, help="Batas detik per run AppTest")
+    p.add_argument("--out", help="File JSON hasil (default benchmarks/results/coldstart-<waktu>.json)")
+    args = p.parse_args(argv)
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", "coldstart-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+
+    print("== Impor modul (interpreter baru) ==", flush=True)
+    imports = bench_imports([m for m in args.modules.split(",") if m], args.repeat)
+    print("== Run pertama aplikasi ==", flush=True)
+    try:
+        import streamlit.testing.v1  # noqa: F401 (hanya cek ketersediaan)
+        apps = bench_apps([a for a in args.apps.split(",") if a], args.repeat, args.timeout)
+    except ImportError:
+        print("  streamlit tidak terpasang; dilewati.", flush=True)
+        apps = {}
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "runs": [{"docs": "startup", "imports": imports, "apps": apps}],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Hasil ditulis ke {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Bandingkan dua hasil benchmarks/run.py: python benchmarks/compare.py lama.json baru.json [--threshold 10]"""
+import sys
+import json
+import argparse
+
+# Metrik yang dibandingkan: akhiran kunci -> True bila makin besar makin baik
+_METRICS = {"_ms": False, "_per_sec": True, "peak_rss_mb": False}
+
+def flatten(obj, prefix=""):
+    out = {}
+    for key, value in obj.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            out.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = value
+    return out
+
+def direction(path):
+    for suffix, higher_is_better in _METRICS.items():
+        if path.endswith(suffix): return higher_is_better
+    return None
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--threshold", type=float, default=10.0, help="Persen perubahan yang dianggap regresi")
+    args = p.parse_args(argv)
+    with open(args.baseline, encoding="utf-8") as fh: base = json.load(fh)
+    with open(args.current, encoding="utf-8") as fh: cur = json.load(fh)
+    print(f"{base.get('commit')} ({base.get('created')}) -> {cur.get('commit')} ({cur.get('created')})")
+
+    base_runs = {r["docs"]: flatten(r) for r in base["runs"]}
+    regressions = 0
+    for run in cur["runs"]:
+        old = base_runs.get(run["docs"])
+        if old is None: continue
+        print(f"\n== {run['docs']} dokumen ==")
+        for path, value in flatten(run).items():
+            higher_is_better = direction(path)
+            if higher_is_better is None or path not in old or not old[path]: continue
+            change = (value - old[path]) / old[path] * 100
+            worse = change < -args.threshold if higher_is_better else change > args.threshold
+            regressions += worse
+            print(f"{'!!' if worse else '  '} {path:<45} {old[path]:>12.2f} -> {value:>12.2f} ({change:+.1f}%)")
+    print(f"\n{regressions} metrik memburuk lebih dari {args.threshold:.0f}%.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
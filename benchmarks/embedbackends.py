@@ -0,0 +1,103 @@
+"""Benchmark embedding CPU: SentenceTransformer PyTorch fp32 vs ONNX fp32 vs ONNX int8 (onnxembed.py).
+
+Chunk diambil dari korpus sintetis (fakes.make_corpus, dipotong seperti ingestion). Untuk tiap
+backend diukur teks/detik pada beberapa ukuran batch dan jumlah thread, serta drift cosine dan
+overlap tetangga terdekat terhadap PyTorch fp32. Model ONNX diekspor ke --model-dir bila belum ada.
+
+    python benchmarks/embedbackends.py --chunks 512 --threads 1,4 --batch-sizes 8,16,32,64
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import onnxembed
+from ingest import iter_chunks
+from fakes import make_corpus
+from run import git_commit
+
+def make_texts(n_chunks, seed):
+    workdir = tempfile.mkdtemp(prefix="embedbench-")
+    try:
+        texts = []
+        for _, path, _ in make_corpus(workdir, max(1, n_chunks // 8), doc_kb=8, seed=seed):
+            with open(path, encoding="utf-8") as fh:
+                texts += [chunk for chunk, _ in iter_chunks(fh.read())]
+        return texts[:n_chunks]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def throughput(encode, texts, repeat):
+    encode(texts[:8])  # pemanasan (alokasi, JIT graf)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(texts)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark embedding PyTorch fp32 vs ONNX int8 (CPU).")
+    p.add_argument("--chunks", type=int, default=512)
+    p.add_argument("--threads", default=f"1,{os.cpu_count() or 1}", help="intra_op threads, dipisah koma")
+    p.add_argument("--batch-sizes", default="8,16,32,64")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--model-dir", default=onnxembed.DEFAULT_DIR)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="File JSON hasil (default benchmarks/results/embedbackends-<waktu>.json)")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", "embedbackends-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    texts = make_texts(args.chunks, args.seed)
+    print(f"{len(texts)} chunk", flush=True)
+    if not os.path.exists(os.path.join(args.model_dir, onnxembed.CONFIG_FILE)):
+        print("Mengekspor model ONNX...", flush=True)
+        onnxembed.export(out_dir=args.model_dir)
+    reference = SentenceTransformer(onnxembed.SENTENCE_TRANSFORMERS_MODEL, device="cpu")
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "runs": [],
+    }
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    for threads in [int(t) for t in args.threads.split(",") if t.strip()]:
+        print(f"== {threads} thread ==", flush=True)
+        torch.set_num_threads(threads)
+        run = {"docs": threads}
+        for batch_size in batch_sizes:
+            tps = throughput(lambda t: reference.encode(t, batch_size=batch_size), texts, args.repeat)
+            run[f"torch_fp32:b{batch_size}"] = {"texts_per_sec": tps}
+            print(f"  torch_fp32 b={batch_size:<3} {tps:>8.1f} teks/dtk", flush=True)
+        for name, model_file in (("onnx_fp32", "model.onnx"), ("onnx_int8", "model-int8.onnx")):
+            if not os.path.exists(os.path.join(args.model_dir, model_file)): continue
+            embedder = onnxembed.OnnxEmbedder(args.model_dir, threads=threads, model_file=model_file)
+            drift = onnxembed.drift_report(embedder.encode, reference.encode, texts)
+            for batch_size in batch_sizes:
+                tps = throughput(lambda t: embedder.encode(t, batch_size=batch_size), texts, args.repeat)
+                run[f"{name}:b{batch_size}"] = {"texts_per_sec": tps, **drift}
+                print(f"  {name:<10} b={batch_size:<3} {tps:>8.1f} teks/dtk · cosine rata-rata {drift['mean_cosine']:.5f} "
+                      f"(min {drift['min_cosine']:.5f}) · overlap@5 {drift['neighbour_overlap_at_5']:.3f}", flush=True)
+        report["runs"].append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Hasil ditulis ke {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark embedserver.py di bawah konkurensi: throughput dan p50/p95/p99 per permintaan.
+
+Beberapa thread client (mensimulasikan sesi Streamlit) mengirim query satu teks secara berurutan
+lewat EmbeddingClient ke server lokal. Dibandingkan tanpa micro-batching (max_batch=1, setiap
+permintaan satu forward pass) dan dengan beberapa nilai max_wait_ms.
+
+Encoder bawaan `fake` mensimulasikan biaya forward pass (`--overhead-ms` per panggilan +
+`--per-text-ms` per teks, via sleep yang melepas GIL seperti torch) dengan vektor HashEmbedding;
+`--encoder st` memakai SentenceTransformer sungguhan.
+
+    python benchmarks/embedconcurrency.py --concurrency 1,8,20,50 --out benchmarks/results/embed.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedserver import serve, EmbeddingClient
+from fakes import HashEmbeddingFunction
+from run import summarize, git_commit
+
+def make_encoder(args):
+    if args.encoder == "st":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+        return lambda texts: model.encode(texts, batch_size=max(len(texts), 1))
+    fake = HashEmbeddingFunction()
+    def encode(texts):
+        time.sleep((args.overhead_ms + args.per_text_ms * len(texts)) / 1000.0)
+        return fake(texts)
+    return encode
+
+def bench(encode, concurrency, requests_per_client, max_batch, max_wait_ms):
+    server = serve(encode, port=0, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = EmbeddingClient(f"http://127.0.0.1:{server.server_address[1]}")
+    client.embed(["pemanasan"])  # koneksi dan model siap sebelum diukur
+    latencies, errors, lock = [], [], threading.Lock()
+
+    def worker(w):
+        mine = []
+        for i in range(requests_per_client):
+            started = time.perf_counter()
+            try:
+                client.embed([f"pertanyaan {w}-{i} tentang perizinan usaha dan penanaman modal"])
+                mine.append(time.perf_counter() - started)
+            except Exception as e:
+                with lock: errors.append(str(e))
+        with lock: latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - started
+    stats = server.batcher.stats()
+    server.shutdown()
+    server.server_close()
+    return {
+        "latency": summarize(latencies),
+        "requests_per_sec": len(latencies) / wall if wall else 0.0,
+        "mean_batch_texts": stats["mean_batch_texts"],
+        "batches": stats["batches"],
+        "errors": len(errors),
+    }
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark embedserver (micro-batching) di bawah konkurensi.")
+    p.add_argument("--concurrency", default="1,8,20,50", help="Jumlah client bersamaan, dipisah koma")
+    p.add_argument("--requests", type=int, default=50, help="Permintaan per client")
+    p.add_argument("--max-wait-ms", default="2,5,10", help="Nilai max_wait_ms yang dibandingkan")
+    p.add_argument("--max-batch", type=int, default=64)
+    p.add_argument("--encoder", choices=["fake", "st"], default="fake")
+    p.add_argument("--model", default="all-MiniLM-L6-v2")
+    p.add_argument("--overhead-ms", type=float, default=8.0, help="Encoder fake: biaya tetap per forward pass")
+    p.add_argument("--per-text-ms", type=float, default=0.4, help="Encoder fake: biaya per teks")
+    p.add_argument("--out", help="File JSON hasil (default benchmarks/results/embed-<waktu>.json)")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", "embed-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    encode = make_encoder(args)
+    configs = [("tanpa_batch", 1, 0.0)] + [(f"wait_{w}ms", args.max_batch, float(w)) for w in args.max_wait_ms.split(",") if w.strip()]
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "runs": [],
+    }
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        print(f"== {concurrency} client bersamaan ==", flush=True)
+        run = {"docs": concurrency}
+        for name, max_batch, max_wait in configs:
+            r = run[name] = bench(encode, concurrency, args.requests, max_batch, max_wait)
+            print(f"  {name:<12} {r['requests_per_sec']:>8.1f} req/dtk · p50 {r['latency']['p50_ms']:.1f} / "
+                  f"p95 {r['latency']['p95_ms']:.1f} / p99 {r['latency']['p99_ms']:.1f} ms · "
+                  f"rata-rata batch {r['mean_batch_texts']:.1f} teks" + (f" · {r['errors']} error" if r["errors"] else ""), flush=True)
+        report["runs"].append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Hasil ditulis ke {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Uji dispatcher embedding OpenAI (openaiembed.py) terhadap endpoint tiruan yang memberlakukan
+batas per request dan TPM/RPM (fakes.FakeEmbeddingServer), dibandingkan perilaku lama.
+
+- `per_file`: seperti OpenAIEmbeddingFunction bawaan Chroma, semua chunk satu file dalam satu
+  request (retry SDK bawaan); file besar ditolak 400, lonjakan kena 429.
+- `dispatcher`: OpenAIEmbeddingDispatcher dengan bucket token/request sisi client.
+
+Urutan vektor diverifikasi terhadap HashEmbeddingFunction yang sama dengan server.
+
+    python benchmarks/embedratelimit.py --docs 40 --tpm 60000 --rpm 500
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from openai import OpenAI
+
+from ingest import iter_chunks, count_tokens
+from openaiembed import OpenAIEmbeddingDispatcher
+from fakes import FakeEmbeddingServer, make_corpus
+from run import git_commit
+
+def load_files(n_docs, doc_kb, big_kb, seed):
+    workdir = tempfile.mkdtemp(prefix="embedrate-")
+    try:
+        docs = make_corpus(workdir, n_docs, doc_kb=doc_kb, seed=seed)
+        if big_kb:  # satu file besar yang melewati batas token per request bila dikirim sekaligus
+            docs += make_corpus(os.path.join(workdir, "besar"), 1, doc_kb=big_kb, seed=seed + 1)
+        files = []
+        for name, path, _ in docs:
+            with open(path, encoding="utf-8") as fh:
+                files.append((name, [chunk for chunk, _ in iter_chunks(fh.read())]))
+        return files
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def check_order(server, chunks, vectors):
+    expected = np.asarray(server.embed(chunks), dtype=np.float32)
+    return bool(np.allclose(expected, np.asarray(vectors, dtype=np.float32), atol=1e-5))
+
+def run_per_file(server, files):
+    client = OpenAI(api_key="bench", base_url=server.base_url)
+    failed, ordered = [], True
+    started = time.perf_counter()
+    for name, chunks in files:
+        try:
+            response = client.embeddings.create(model="bench", input=chunks)
+            vectors = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+            ordered &= check_order(server, chunks, vectors)
+        except Exception as e:
+            failed.append(f"{name}: {type(e).__name__}")
+    return {"seconds": time.perf_counter() - started, "failed_files": failed, "ordered": ordered}
+
+def run_dispatcher(server, files, args):
+    dispatcher = OpenAIEmbeddingDispatcher("bench", "bench", base_url=server.base_url, tpm=args.tpm, rpm=args.rpm,
+                                           max_request_tokens=args.max_request_tokens, concurrency=args.concurrency)
+    failed, ordered = [], True
+    started = time.perf_counter()
+    for name, chunks in files:
+        try:
+            ordered &= check_order(server, chunks, dispatcher(chunks))
+        except Exception as e:
+            failed.append(f"{name}: {type(e).__name__}: {e}")
+    return {"seconds": time.perf_counter() - started, "failed_files": failed, "ordered": ordered, "client": dict(dispatcher.stats)}
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Uji dispatcher embedding OpenAI terhadap endpoint tiruan ber-rate-limit.")
+    p.add_argument("--docs", type=int, default=40)
+    p.add_argument("--doc-kb", type=int, default=8)
+    p.add_argument("--big-kb", type=int, default=400, help="Ukuran satu file besar tambahan (0 = tanpa)")
+    p.add_argument("--tpm", type=int, default=60000)
+    p.add_argument("--rpm", type=int, default=500)
+    p.add_argument("--server-max-request-tokens", type=int, default=30000, help="Batas token per request di server tiruan")
+    p.add_argument("--max-request-tokens", type=int, default=8000, help="Anggaran token per request dispatcher")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="File JSON hasil (default benchmarks/results/embedrate-<waktu>.json)")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", "embedrate-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    files = load_files(args.docs, args.doc_kb, args.big_kb, args.seed)
+    n_chunks = sum(len(c) for _, c in files)
+    n_tokens = sum(count_tokens(t) for _, c in files for t in c)
+    print(f"{len(files)} file · {n_chunks} chunk · {n_tokens} token · batas {args.tpm} TPM / {args.rpm} RPM", flush=True)
+    run = {"docs": len(files), "chunks": n_chunks, "tokens": n_tokens}
+    for name, fn in (("per_file", lambda s: run_per_file(s, files)), ("dispatcher", lambda s: run_dispatcher(s, files, args))):
+        with FakeEmbeddingServer(tpm=args.tpm, rpm=args.rpm, max_request_tokens=args.server_max_request_tokens) as server:
+            r = run[name] = fn(server)
+            r["server"] = dict(server.stats)
+        print(f"  {name:<10} {r['seconds']:>7.1f} dtk · {len(r['failed_files'])} file gagal · "
+              f"{r['server']['requests']} request ({r['server']['rate_limited']}× 429, {r['server']['rejected']}× 400) · "
+              f"urutan {'benar' if r['ordered'] else 'SALAH'}", flush=True)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "runs": [run],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Hasil ditulis ke {out}")
+
+if __name__ == "__main__":
+    main()
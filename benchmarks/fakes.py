@@ -0,0 +1,264 @@
+"""Pengganti offline untuk benchmark: embedding function deterministik, server chat dan embeddings OpenAI lokal, dan korpus sintetis."""
+import os
+import json
+import base64
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from bm25index import tokenize
+from ingest import count_tokens
+
+try:
+    from chromadb.api.types import EmbeddingFunction as _EmbeddingFunctionBase
+except Exception: _EmbeddingFunctionBase = object
+
+# ---------------- Embedding ----------------
+class HashEmbeddingFunction(_EmbeddingFunctionBase):
+    """Embedding deterministik dari feature hashing token (tanpa model/jaringan).
+
+    Teks dengan banyak token yang sama menghasilkan vektor yang mirip, sehingga hasil query
+    masuk akal, tetapi kualitasnya tidak mewakili model sungguhan. `delay_ms` per panggilan
+    bisa dipakai untuk mensimulasikan round-trip API embedding.
+    """
+
+    def __init__(self, dim=384, delay_ms=0.0):
+        self.dim = dim
+        self.delay = delay_ms / 1000.0
+        self.calls = 0
+        self.texts = 0
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for tok in tokenize(text):
+            h = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def __call__(self, input):
+        self.calls += 1
+        self.texts += len(input)
+        if self.delay: time.sleep(self.delay)
+        return [self._embed(text) for text in input]
+
+# ---------------- Chat completion ----------------
+class FakeChatServer:
+    """Server HTTP lokal yang meniru POST /v1/chat/completions (biasa dan streaming SSE).
+
+    Jawaban berisi `answer_tokens` kata; `ttft_ms` adalah jeda sebelum token pertama dan
+    `token_ms` jeda antar token. Dipakai dengan OpenAI(base_url=server.base_url, api_key="bench").
+    """
+
+    def __init__(self, ttft_ms=150.0, token_ms=5.0, answer_tokens=120):
+        self.ttft = ttft_ms / 1000.0
+        self.token_delay = token_ms / 1000.0
+        self.answer_tokens = answer_tokens
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args): pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                if body.get("stream"):
+                    server._stream(self, body)
+                else:
+                    server._complete(self, body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+    def _words(self):
+        return [("Berdasarkan [1]," if i == 0 else f"kata{i}") for i in range(self.answer_tokens)]
+
+    def _usage(self, body):
+        prompt = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        return {"prompt_tokens": prompt, "completion_tokens": self.answer_tokens, "total_tokens": prompt + self.answer_tokens}
+
+    def _complete(self, handler, body):
+        time.sleep(self.ttft + self.token_delay * self.answer_tokens)
+        payload = json.dumps({
+            "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": body.get("model", "bench"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(self._words())}, "finish_reason": "stop"}],
+            "usage": self._usage(body),
+        }).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _stream(self, handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+
+        def send(obj):
+            handler.wfile.write(f"data: {json.dumps(obj) if obj != '[DONE]' else obj}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+
+        base = {"id": "bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "bench")}
+        time.sleep(self.ttft)
+        for i, word in enumerate(self._words()):
+            if i: time.sleep(self.token_delay)
+            send(dict(base, choices=[{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}]))
+        send(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send(dict(base, choices=[], usage=self._usage(body)))
+        send("[DONE]")
+        handler.close_connection = True
+
+# ---------------- Embeddings ----------------
+class FakeEmbeddingServer:
+    """Server HTTP lokal yang meniru POST /v1/embeddings beserta batasnya.
+
+    Request ditolak 400 bila melewati batas per request (2048 input, 8191 token per input,
+    `max_request_tokens` total) dan 429 bila melewati `tpm`/`rpm` (bucket per menit, terisi
+    kontinu) dengan header retry-after-ms dan x-ratelimit-reset-tokens seperti OpenAI. Vektor dari
+    HashEmbeddingFunction (float atau base64 sesuai `encoding_format`); urutan `data` sengaja
+    dibalik agar client wajib memakai `index`. Dipakai dengan OpenAI(base_url=server.base_url).
+    """
+
+    def __init__(self, tpm=60000, rpm=500, max_request_tokens=300000, base_ms=40.0, per_1k_tokens_ms=2.0, dim=64):
+        self.tpm, self.rpm, self.max_request_tokens = tpm, rpm, max_request_tokens
+        self.base = base_ms / 1000.0
+        self.per_1k = per_1k_tokens_ms / 1000.0
+        self.embed = HashEmbeddingFunction(dim=dim)
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "rejected": 0, "tokens": 0}
+        self._budget = {"tokens": float(tpm), "requests": float(rpm), "updated": time.monotonic()}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args): pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, payload, headers = server._handle(body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for k, v in dict(headers, **{"Content-Type": "application/json", "Content-Length": str(len(data))}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    base_url = FakeChatServer.base_url
+    start = FakeChatServer.start
+    stop = FakeChatServer.stop
+    __enter__ = FakeChatServer.__enter__
+    __exit__ = FakeChatServer.__exit__
+
+    def _error(self, status, message, kind, headers=None):
+        with self._lock:
+            self.stats["rate_limited" if status == 429 else "rejected"] += 1
+        return status, {"error": {"message": message, "type": kind, "code": None}}, headers or {}
+
+    def _handle(self, body):
+        texts = body.get("input")
+        texts = [texts] if isinstance(texts, str) else list(texts or [])
+        counts = [count_tokens(t) for t in texts]
+        with self._lock:
+            self.stats["requests"] += 1
+        if len(texts) > 2048 or not texts:
+            return self._error(400, f"'input' berisi {len(texts)} item (maks. 2048)", "invalid_request_error")
+        if max(counts) > 8191 or sum(counts) > self.max_request_tokens:
+            return self._error(400, f"Request berisi {sum(counts)} token, melewati batas model", "invalid_request_error")
+        n = sum(counts)
+        with self._lock:
+            b = self._budget
+            now = time.monotonic()
+            b["tokens"] = min(self.tpm, b["tokens"] + (now - b["updated"]) * self.tpm / 60.0)
+            b["requests"] = min(self.rpm, b["requests"] + (now - b["updated"]) * self.rpm / 60.0)
+            b["updated"] = now
+            reset = max((n - b["tokens"]) * 60.0 / self.tpm, (1 - b["requests"]) * 60.0 / self.rpm, 0.0)
+            if not reset:
+                b["tokens"] -= n
+                b["requests"] -= 1
+        if reset:
+            return self._error(429, f"Rate limit reached: limit {self.tpm} TPM / {self.rpm} RPM", "tokens",
+                               {"retry-after-ms": str(int(reset * 1000) + 1), "x-ratelimit-reset-tokens": f"{reset:.3f}s"})
+        time.sleep(self.base + self.per_1k * n / 1000.0)
+        vectors = self.embed(texts)
+        if body.get("encoding_format") == "base64":
+            vectors = [base64.b64encode(np.asarray(v, dtype="<f4").tobytes()).decode("ascii") for v in vectors]
+        else:
+            vectors = [v.tolist() for v in vectors]
+        with self._lock:
+            self.stats["ok"] += 1
+            self.stats["tokens"] += n
+        data = [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)][::-1]
+        return 200, {"object": "list", "data": data, "model": body.get("model", "bench"),
+                     "usage": {"prompt_tokens": n, "total_tokens": n}}, {}
+
+# ---------------- Korpus ----------------
+_WORDS = (
+    "perjanjian pihak penanaman modal izin usaha kewajiban hak sanksi administratif pembayaran jangka waktu "
+    "pengakhiran sengketa arbitrase kerahasiaan ganti rugi keadaan kahar pemberitahuan lampiran jaminan "
+    "pajak saham investor perusahaan kegiatan lokasi lingkungan tenaga kerja laporan pengawasan "
+    "persetujuan pencabutan perubahan ketentuan peraturan pemerintah menteri badan koordinasi"
+).split()
+
+def make_corpus(root, n_docs, doc_kb=8, seed=42):
+    """Tulis `n_docs` dokumen .txt sintetis (±`doc_kb` KB) bergaya pasal kontrak/peraturan.
+
+    Setiap dokumen memuat satu kode rujukan unik; dikembalikan daftar (nama, path, kode) agar
+    query benchmark bisa mengukur apakah dokumen yang benar ikut terambil.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    docs = []
+    for d in range(n_docs):
+        code = f"ref{d:05d}x{rng.randrange(16**4):04x}"
+        parts, size, pasal = [], 0, 1
+        while size < doc_kb * 1024:
+            sentences = []
+            for _ in range(rng.randint(3, 7)):
+                words = rng.choices(_WORDS, k=rng.randint(8, 20))
+                if rng.random() < 0.2:
+                    words.append(f"nomor {rng.randint(1, 60)}/{rng.randint(1990, 2025)}")
+                sentences.append(" ".join(words).capitalize() + ".")
+            if pasal == 2:
+                sentences.append(f"Kode rujukan dokumen ini adalah {code}.")
+            section = f"Pasal {pasal}\n" + " ".join(sentences)
+            parts.append(section)
+            size += len(section) + 2
+            pasal += 1
+        name = f"dok_{d:05d}.txt"
+        path = os.path.join(root, name)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("\n\n".join(parts))
+        docs.append((name, path, code))
+    return docs
@@ -0,0 +1,265 @@
+"""Benchmark offline: ekstraksi, chunking, add, query, dan RAG end-to-end pada beberapa ukuran korpus.
+
+Semua berjalan lokal: chromadb.PersistentClient di folder sementara, HashEmbeddingFunction
+(deterministik) sebagai embedding, dan FakeChatServer sebagai endpoint chat OpenAI. Hasil
+(p50/p95/p99 dalam ms, throughput, peak RSS) ditulis ke JSON untuk dibandingkan antar run
+dengan benchmarks/compare.py.
+
+    python benchmarks/run.py --sizes 20,100,500 --out benchmarks/results/hasil.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import chromadb
+from openai import OpenAI
+
+from ingest import iter_file_text, iter_chunks, run_pipeline, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from bm25index import BM25Index, reciprocal_rank_fusion
+from contextpack import pack_context
+from llmstream import stream_chat
+from fakes import HashEmbeddingFunction, FakeChatServer, make_corpus
+
+# ---------------- Pengukuran ----------------
+def percentile(sorted_values, q):
+    """Persentil nearest-rank dari daftar yang sudah terurut."""
+    if not sorted_values: return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    if not ms: return {"n": 0}
+    return {
+        "n": len(ms),
+        "mean_ms": sum(ms) / len(ms),
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": ms[-1],
+    }
+
+def reset_peak_rss():
+    # Linux: menulis "5" ke clear_refs me-reset VmHWM sehingga peak bisa diukur per tahap
+    try:
+        with open("/proc/self/clear_refs", "w") as fh: fh.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"): return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def stage(fn, *args, **kwargs):
+    """Jalankan satu tahap benchmark dan tambahkan durasi serta peak RSS ke hasilnya."""
+    per_stage = reset_peak_rss()
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    result["seconds"] = time.perf_counter() - started
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["peak_rss_scope"] = "stage" if per_stage else "process"
+    return result
+
+class TimedCollection:
+    """Proxy koleksi Chroma yang mencatat durasi setiap collection.add (embedding + tulis)."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.add_seconds = []
+
+    def add(self, **kwargs):
+        started = time.perf_counter()
+        self.inner.add(**kwargs)
+        self.add_seconds.append(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+# ---------------- Tahap ----------------
+def bench_extract(docs):
+    latencies, nbytes, texts = [], 0, {}
+    for name, path, _ in docs:
+        started = time.perf_counter()
+        texts[name] = "".join(iter_file_text(path, name))
+        latencies.append(time.perf_counter() - started)
+        nbytes += os.path.getsize(path)
+    total = sum(latencies)
+    return {"per_file": summarize(latencies), "mb": nbytes / 1e6, "mb_per_sec": nbytes / 1e6 / total if total else 0.0}, texts
+
+def bench_chunk(texts, size, overlap):
+    latencies, n_chunks, nbytes = [], 0, 0
+    for text in texts.values():
+        started = time.perf_counter()
+        n_chunks += sum(1 for _ in iter_chunks(text, size=size, overlap=overlap))
+        latencies.append(time.perf_counter() - started)
+        nbytes += len(text.encode("utf-8"))
+    total = sum(latencies)
+    return {"per_doc": summarize(latencies), "chunks": n_chunks, "mb_per_sec": nbytes / 1e6 / total if total else 0.0}
+
+def bench_add(docs, collection, bm25_view, args):
+    timed = TimedCollection(collection)
+    stats = run_pipeline([(name, path) for name, path, _ in docs], timed, size=args.chunk_size,
+                         overlap=args.chunk_overlap, batch_size=args.batch_size, workers=args.workers,
+                         mirrors=[bm25_view])
+    return {
+        "per_batch": summarize(timed.add_seconds),
+        "chunks": stats["chunks"],
+        "chunks_per_sec": stats["chunks_per_sec"],
+        "files_per_sec": stats["files"] / stats["seconds"] if stats["seconds"] else 0.0,
+        "errors": len(stats["errors"]) + len(stats["write_errors"]),
+        "children_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+def make_queries(docs, n):
+    # Pertanyaan dengan kode rujukan unik: jawabannya diketahui ada di satu dokumen
+    step = max(1, len(docs) // n)
+    return [(f"Apa isi pasal yang menyebut kode rujukan {code}?", name) for name, _, code in docs[::step][:n]]
+
+def bench_query(collection, bm25, key, queries, k):
+    lat = {"vector": [], "bm25": [], "hybrid": []}
+    hits = {"vector": 0, "bm25": 0, "hybrid": 0}
+    for question, expected in queries:
+        started = time.perf_counter()
+        res = collection.query(query_texts=[question], n_results=k, include=["metadatas"])
+        lat["vector"].append(time.perf_counter() - started)
+        vector_sources = [m["source"] for m in res["metadatas"][0]]
+
+        started = time.perf_counter()
+        lexical = bm25.search(key, question, k)
+        lat["bm25"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        lexical_h = bm25.search(key, question, k)
+        res_h = collection.query(query_texts=[question], n_results=k, include=["metadatas"])
+        by_id = {cid: meta["source"] for cid, meta in zip(res_h["ids"][0], res_h["metadatas"][0])}
+        by_id.update((cid, meta["source"]) for cid, _, _, meta in lexical_h)
+        fused = reciprocal_rank_fusion(res_h["ids"][0], [r[0] for r in lexical_h], limit=k)
+        lat["hybrid"].append(time.perf_counter() - started)
+
+        hits["vector"] += expected in vector_sources
+        hits["bm25"] += expected in [meta["source"] for _, _, _, meta in lexical]
+        hits["hybrid"] += expected in [by_id[cid] for cid in fused]
+    n = len(queries) or 1
+    return {mode: {"latency": summarize(lat[mode]), f"hit_at_{k}": hits[mode] / n} for mode in lat}
+
+def bench_rag(collection, client, queries, k, context_tokens, model):
+    total, ttft, retrieval = [], [], []
+    for question, _ in queries:
+        started = time.perf_counter()
+        res = collection.query(query_texts=[question], n_results=k, include=["documents", "metadatas"])
+        _, context, _ = pack_context(list(zip(res["documents"][0], res["metadatas"][0])), budget_tokens=context_tokens)
+        retrieval.append(time.perf_counter() - started)
+        stats = {}
+        messages = [
+            {"role": "system", "content": "Jawab hanya dari konteks dan sertakan sitasi [n]."},
+            {"role": "user", "content": f"Pertanyaan: {question}\n\nKonteks:\n{context}"},
+        ]
+        for _ in stream_chat(client.chat.completions.create, stats, model=model, messages=messages, temperature=0.2):
+            pass
+        total.append(time.perf_counter() - started)
+        ttft.append(retrieval[-1] + (stats["ttft"] or stats["total"]))
+    return {"retrieval": summarize(retrieval), "time_to_first_token": summarize(ttft), "total": summarize(total)}
+
+# ---------------- Runner ----------------
+def bench_size(n_docs, args, chat_client):
+    workdir = tempfile.mkdtemp(prefix=f"ragbench-{n_docs}-")
+    try:
+        docs = make_corpus(os.path.join(workdir, "docs"), n_docs, doc_kb=args.doc_kb, seed=args.seed)
+        client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+        embed = HashEmbeddingFunction(delay_ms=args.embed_delay_ms)
+        collection = client.get_or_create_collection(name="bench", embedding_function=embed, metadata={"hnsw:space": "cosine"})
+        bm25 = BM25Index(os.path.join(workdir, "bm25.sqlite"))
+        key = f"bench:{n_docs}"
+        queries = make_queries(docs, args.queries)
+
+        texts = {}
+        def extract():
+            result, extracted = bench_extract(docs)
+            texts.update(extracted)
+            return result
+        result = {"docs": n_docs, "extract": stage(extract)}
+        result["chunk"] = stage(bench_chunk, texts, args.chunk_size, args.chunk_overlap)
+        texts.clear()
+        result["add"] = stage(bench_add, docs, collection, bm25.for_collection(key), args)
+        result["add"]["embed_calls"] = embed.calls
+        result["query"] = stage(bench_query, collection, bm25, key, queries, args.k)
+        result["rag"] = stage(bench_rag, collection, chat_client, queries[:args.rag_queries], args.k, args.context_tokens, args.model)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark RAG offline (tanpa jaringan).")
+    p.add_argument("--sizes", default="20,100,500", help="Ukuran korpus (jumlah dokumen), dipisah koma")
+    p.add_argument("--doc-kb", type=int, default=8)
+    p.add_argument("--chunk-size", type=int, default=900)
+    p.add_argument("--chunk-overlap", type=int, default=150)
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    p.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    p.add_argument("--queries", type=int, default=50)
+    p.add_argument("--rag-queries", type=int, default=20)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--context-tokens", type=int, default=3000)
+    p.add_argument("--embed-delay-ms", type=float, default=0.0, help="Jeda per panggilan embedding (simulasi API)")
+    p.add_argument("--ttft-ms", type=float, default=150.0)
+    p.add_argument("--token-ms", type=float, default=5.0)
+    p.add_argument("--model", default="gpt-4o-mini")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="File JSON hasil (default benchmarks/results/<waktu>.json)")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "runs": [],
+    }
+    with FakeChatServer(ttft_ms=args.ttft_ms, token_ms=args.token_ms) as server:
+        chat_client = OpenAI(base_url=server.base_url, api_key="bench", max_retries=0)
+        for n_docs in sizes:
+            print(f"== {n_docs} dokumen ==", flush=True)
+            run = bench_size(n_docs, args, chat_client)
+            report["runs"].append(run)
+            print(
+                f"  extract {run['extract']['mb_per_sec']:.1f} MB/s · chunk {run['chunk']['mb_per_sec']:.1f} MB/s · "
+                f"add {run['add']['chunks_per_sec']:.0f} chunk/dtk · query p95 {run['query']['vector']['latency']['p95_ms']:.1f} ms"
+                f" (hit@{args.k} vektor {run['query']['vector'][f'hit_at_{args.k}']:.2f} / bm25 {run['query']['bm25'][f'hit_at_{args.k}']:.2f}"
+                f" / hybrid {run['query']['hybrid'][f'hit_at_{args.k}']:.2f}) · RAG p95 {run['rag']['total']['p95_ms']:.0f} ms",
+                flush=True,
+            )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Hasil ditulis ke {out}")
+
+if __name__ == "__main__":
+    main()
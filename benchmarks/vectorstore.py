@@ -0,0 +1,140 @@
+"""Benchmark backend vektor lokal: Chroma PersistentClient vs npvector (float32 / float16).
+
+Vektor sintetis berkluster (dimensi sama dengan all-MiniLM-L6-v2) ditulis ke tiap backend di
+folder sementara, lalu diukur: throughput add, waktu buka dingin (client baru + query pertama),
+latensi query tunggal dan batch, recall@k terhadap pencarian exact, serta ukuran di disk.
+Hasil JSON bisa dibandingkan antar run dengan benchmarks/compare.py.
+
+    python benchmarks/vectorstore.py --sizes 10000,100000 --out benchmarks/results/vector.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import chromadb
+
+from npvector import NumpyVectorClient
+from run import summarize, git_commit
+
+def make_vectors(n, dim, n_queries, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 200), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, n, n_queries)] + 0.3 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    return vectors, queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def exact_top_k(vectors, queries, k):
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+def dir_size_mb(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files) / 1e6
+
+def open_backend(backend, path):
+    if backend == "chroma":
+        client = chromadb.PersistentClient(path=path)
+        return client.get_or_create_collection(name="bench", embedding_function=None, metadata={"hnsw:space": "cosine"})
+    return NumpyVectorClient(path, dtype=backend.split("_")[1]).get_or_create_collection("bench")
+
+def bench_backend(backend, vectors, queries, truth, args, workdir):
+    path = os.path.join(workdir, backend)
+    collection = open_backend(backend, path)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    add_seconds = []
+    for start in range(0, len(vectors), args.batch_size):
+        end = start + args.batch_size
+        started = time.perf_counter()
+        collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                       documents=[f"chunk {i}" for i in range(start, min(end, len(vectors)))],
+                       metadatas=[{"source": f"doc{i // 50}.pdf", "chunk": i % 50} for i in range(start, min(end, len(vectors)))])
+        add_seconds.append(time.perf_counter() - started)
+    del collection
+
+    # Buka dingin: client baru di proses yang sama (cache OS tetap hangat) + satu query
+    started = time.perf_counter()
+    collection = open_backend(backend, path)
+    collection.query(query_embeddings=queries[:1].tolist(), n_results=args.k, include=["metadatas"])
+    open_seconds = time.perf_counter() - started
+
+    single, found = [], []
+    for q in queries:
+        started = time.perf_counter()
+        res = collection.query(query_embeddings=[q.tolist()], n_results=args.k, include=["documents", "metadatas"])
+        single.append(time.perf_counter() - started)
+        found.append([int(cid[1:]) for cid in res["ids"][0]])
+    recall = np.mean([len(set(f) & set(t.tolist())) / args.k for f, t in zip(found, truth)])
+
+    batched = []
+    for start in range(0, len(queries), args.query_batch):
+        part = queries[start:start + args.query_batch]
+        started = time.perf_counter()
+        collection.query(query_embeddings=part.tolist(), n_results=args.k, include=["documents", "metadatas"])
+        batched.append((time.perf_counter() - started) / len(part))
+
+    total_add = sum(add_seconds)
+    return {
+        "add": {"per_batch": summarize(add_seconds), "vectors_per_sec": len(vectors) / total_add if total_add else 0.0},
+        "open_and_first_query_ms": open_seconds * 1000,
+        "query": summarize(single),
+        "query_batched_per_query": summarize(batched),
+        f"recall_at_{args.k}": float(recall),
+        "disk_mb": dir_size_mb(path),
+    }
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark Chroma vs npvector (offline).")
+    p.add_argument("--sizes", default="10000,100000", help="Jumlah vektor, dipisah koma")
+    p.add_argument("--backends", default="chroma,numpy_float32,numpy_float16")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--query-batch", type=int, default=32)
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="File JSON hasil (default benchmarks/results/vector-<waktu>.json)")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", "vector-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "runs": [],
+    }
+    for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"== {n} vektor ==", flush=True)
+        vectors, queries = make_vectors(n, args.dim, args.queries, args.seed)
+        truth = exact_top_k(vectors, queries, args.k)
+        run = {"docs": n}
+        workdir = tempfile.mkdtemp(prefix=f"vecbench-{n}-")
+        try:
+            for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+                r = run[backend] = bench_backend(backend, vectors, queries, truth, args, workdir)
+                print(f"  {backend:<14} add {r['add']['vectors_per_sec']:>9.0f} vektor/dtk · buka {r['open_and_first_query_ms']:>7.1f} ms · "
+                      f"query p50 {r['query']['p50_ms']:.2f} / p95 {r['query']['p95_ms']:.2f} ms · "
+                      f"batch {r['query_batched_per_query']['mean_ms']:.2f} ms/query · recall@{args.k} {r[f'recall_at_{args.k}']:.3f} · "
+                      f"{r['disk_mb']:.1f} MB", flush=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        report["runs"].append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Hasil ditulis ke {out}")
+
+if __name__ == "__main__":
+    main()
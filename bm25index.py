@@ -0,0 +1,182 @@
+"""Indeks terbalik BM25 lokal (sqlite) yang diperbarui bersama Chroma, plus fusi peringkat RRF."""
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+DEFAULT_PATH = os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "bm25.sqlite")
+RRF_K = 60
+
+# Token: kata/angka, termasuk nomor majemuk seperti "24/2018", "3.2.1", "pp-12" yang umum
+# di peraturan dan kontrak. Komponen nomor majemuk juga diindeks agar "2018" tetap cocok.
+_TOKEN = re.compile(r"[0-9a-z]+(?:[./-][0-9a-z]+)*")
+_STOPWORDS = frozenset(
+    "yang dan di ke dari untuk dengan pada ini itu atau dalam adalah tidak akan oleh sebagai "
+    "juga telah dapat bahwa serta the of and to in a is for on".split()
+)
+
+def tokenize(text):
+    terms = []
+    for tok in _TOKEN.findall(text.lower()):
+        if tok in _STOPWORDS: continue
+        terms.append(tok)
+        if not tok.isalnum():
+            terms.extend(p for p in re.split(r"[./-]", tok) if p and p not in _STOPWORDS)
+    return terms
+
+class BM25Index:
+    """Indeks BM25 per koleksi: tabel `docs` (teks + metadata) dan `postings` (term, id, tf).
+
+    Menyimpan teks chunk sehingga mode lexical-only tidak perlu memanggil Chroma maupun
+    embedding. Aman dipakai dari beberapa thread.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, k1=1.5, b=0.75):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.k1, self.b = k1, b
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS docs (collection TEXT NOT NULL, id TEXT NOT NULL, source TEXT,"
+            " chunk INTEGER, length INTEGER NOT NULL, text TEXT NOT NULL, PRIMARY KEY (collection, id));"
+            "CREATE TABLE IF NOT EXISTS postings (collection TEXT NOT NULL, term TEXT NOT NULL, id TEXT NOT NULL,"
+            " tf INTEGER NOT NULL, PRIMARY KEY (collection, term, id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_by_id ON postings(collection, id);"
+            "CREATE TABLE IF NOT EXISTS stats (collection TEXT PRIMARY KEY, n_docs INTEGER NOT NULL,"
+            " total_len INTEGER NOT NULL);"
+        )
+
+    def for_collection(self, collection_key):
+        """View dengan antarmuka add/update/delete seperti koleksi Chroma (lihat ingest.BatchWriter)."""
+        return _CollectionView(self, collection_key)
+
+    def add(self, collection_key, ids, documents, metadatas):
+        with self._lock:
+            self._delete_locked(collection_key, ids)
+            n_docs, total_len = 0, 0
+            for cid, doc, meta in zip(ids, documents, metadatas):
+                terms = Counter(tokenize(doc))
+                length = sum(terms.values())
+                meta = meta or {}
+                self._db.execute(
+                    "INSERT INTO docs(collection, id, source, chunk, length, text) VALUES (?, ?, ?, ?, ?, ?)",
+                    (collection_key, cid, meta.get("source"), meta.get("chunk"), length, doc),
+                )
+                self._db.executemany(
+                    "INSERT INTO postings(collection, term, id, tf) VALUES (?, ?, ?, ?)",
+                    [(collection_key, term, cid, tf) for term, tf in terms.items()],
+                )
+                n_docs += 1
+                total_len += length
+            self._bump_stats(collection_key, n_docs, total_len)
+            self._db.commit()
+
+    def update(self, collection_key, ids, metadatas):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE docs SET source=?, chunk=? WHERE collection=? AND id=?",
+                [((m or {}).get("source"), (m or {}).get("chunk"), collection_key, cid) for cid, m in zip(ids, metadatas)],
+            )
+            self._db.commit()
+
+    def delete(self, collection_key, ids):
+        with self._lock:
+            self._delete_locked(collection_key, ids)
+            self._db.commit()
+
+    def delete_source(self, collection_key, source):
+        with self._lock:
+            ids = [r[0] for r in self._db.execute(
+                "SELECT id FROM docs WHERE collection=? AND source=?", (collection_key, source))]
+            self._delete_locked(collection_key, ids)
+            self._db.commit()
+
+    def clear(self, collection_key):
+        with self._lock:
+            for table in ("docs", "postings", "stats"):
+                self._db.execute(f"DELETE FROM {table} WHERE collection=?", (collection_key,))
+            self._db.commit()
+
+    def _delete_locked(self, collection_key, ids):
+        removed, removed_len = 0, 0
+        for cid in ids:
+            row = self._db.execute("SELECT length FROM docs WHERE collection=? AND id=?", (collection_key, cid)).fetchone()
+            if row is None: continue
+            self._db.execute("DELETE FROM docs WHERE collection=? AND id=?", (collection_key, cid))
+            self._db.execute("DELETE FROM postings WHERE collection=? AND id=?", (collection_key, cid))
+            removed += 1
+            removed_len += row[0]
+        if removed:
+            self._bump_stats(collection_key, -removed, -removed_len)
+
+    def _bump_stats(self, collection_key, n_docs, total_len):
+        self._db.execute(
+            "INSERT INTO stats(collection, n_docs, total_len) VALUES (?, ?, ?)"
+            " ON CONFLICT(collection) DO UPDATE SET n_docs=n_docs+excluded.n_docs, total_len=total_len+excluded.total_len",
+            (collection_key, n_docs, total_len),
+        )
+
+    def count(self, collection_key):
+        with self._lock:
+            row = self._db.execute("SELECT n_docs FROM stats WHERE collection=?", (collection_key,)).fetchone()
+        return row[0] if row else 0
+
+    def search(self, collection_key, query, k=5):
+        """Top-k BM25: list of (id, skor, teks, metadata)."""
+        terms = set(tokenize(query))
+        with self._lock:
+            row = self._db.execute("SELECT n_docs, total_len FROM stats WHERE collection=?", (collection_key,)).fetchone()
+            if not row or not row[0] or not terms: return []
+            n_docs, avg_len = row[0], row[1] / row[0]
+            scores = Counter()
+            for term in terms:
+                postings = self._db.execute(
+                    "SELECT p.id, p.tf, d.length FROM postings p JOIN docs d ON d.collection=p.collection AND d.id=p.id"
+                    " WHERE p.collection=? AND p.term=?", (collection_key, term),
+                ).fetchall()
+                if not postings: continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for cid, tf, length in postings:
+                    scores[cid] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_len))
+            top = scores.most_common(k)
+            results = []
+            for cid, score in top:
+                source, chunk, text = self._db.execute(
+                    "SELECT source, chunk, text FROM docs WHERE collection=? AND id=?", (collection_key, cid)).fetchone()
+                results.append((cid, score, text, {"source": source, "chunk": chunk}))
+        return results
+
+    def rebuild(self, collection_key, collection, page_size=1000):
+        """Isi ulang indeks dari koleksi Chroma (mis. untuk chunk yang diunggah sebelum indeks ada)."""
+        self.clear(collection_key)
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]: break
+            self.add(collection_key, page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+        return self.count(collection_key)
+
+class _CollectionView:
+    def __init__(self, index, collection_key):
+        self.index, self.collection_key = index, collection_key
+
+    def add(self, ids, documents, metadatas):
+        self.index.add(self.collection_key, ids, documents, metadatas)
+
+    def update(self, ids, metadatas):
+        self.index.update(self.collection_key, ids, metadatas)
+
+    def delete(self, ids):
+        self.index.delete(self.collection_key, ids)
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K, limit=None):
+    """Gabungkan beberapa daftar ID terurut dengan RRF: skor = sum(1 / (k + peringkat))."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking, start=1):
+            scores[cid] += 1.0 / (k + rank)
+    return [cid for cid, _ in scores.most_common(limit)]
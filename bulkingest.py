@@ -0,0 +1,178 @@
+"""Ingestion massal tanpa Streamlit: telusuri folder, chunk paralel, tulis ke Chroma, bisa dilanjutkan.
+
+Contoh:
+    python bulkingest.py ./arsip --mode local --persist-dir ./chroma_data --collection docs --embed st
+    CHROMA_API_KEY=... OPENAI_API_KEY=... python bulkingest.py ./arsip --tenant T --database D
+
+Setiap file yang selesai ditulis (atau kosong/gagal) dicatat di journal JSONL milik koleksi tujuan. Menjalankan ulang
+perintah yang sama melewati file yang sudah selesai dan ukuran/mtime-nya tidak berubah, sehingga
+run yang terputus (Ctrl+C, crash, koneksi putus) dilanjutkan dari posisi terakhir.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+from ingest import run_pipeline, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from chromaconn import (
+    CHROMA_CLOUD, CHROMA_LOCAL, CHROMA_NUMPY, EMBED_OPENAI, EMBED_SENTENCE_TRANSFORMERS, EMBED_ONNX,
+    make_chroma_client, make_embedding_function, open_collection, collection_key,
+)
+from embedcache import EmbeddingCache
+from sourcecatalog import SourceCatalog
+from bm25index import BM25Index
+
+EXTENSIONS = (".pdf", ".docx", ".txt", ".md")
+DEFAULT_ROUND_SIZE = 500
+
+def walk_files(root):
+    """(nama sumber = path relatif posix, path absolut) untuk semua dokumen di bawah `root`, terurut."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for fn in sorted(filenames):
+            if fn.lower().endswith(EXTENSIONS):
+                path = os.path.join(dirpath, fn)
+                found.append((os.path.relpath(path, root).replace(os.sep, "/"), path))
+    return found
+
+class Journal:
+    """Journal checkpoint JSONL: satu baris per file yang selesai; baris terakhir per path berlaku."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # baris terakhir bisa terpotong bila proses mati saat menulis
+                    self.entries[rec["path"]] = rec
+        self._lock = threading.Lock()
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def is_done(self, source, stat):
+        rec = self.entries.get(source)
+        return bool(rec) and rec["status"] in ("done", "empty") and rec["size"] == stat.st_size and rec["mtime"] == stat.st_mtime
+
+    def record(self, source, stat, status, chunks=0, error=None):
+        rec = {"path": source, "size": stat.st_size, "mtime": stat.st_mtime, "status": status, "chunks": chunks}
+        if error: rec["error"] = error
+        with self._lock:
+            self.entries[source] = rec
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Ingestion massal dokumen ke Chroma (bisa dilanjutkan).")
+    p.add_argument("root", help="Folder dokumen (.pdf, .docx, .txt, .md), ditelusuri rekursif")
+    p.add_argument("--collection", default="docs")
+    p.add_argument("--mode", choices=["cloud", "local", "numpy"], default="cloud")
+    p.add_argument("--persist-dir", default="./chroma_data")
+    p.add_argument("--tenant", default=os.getenv("CHROMA_TENANT", ""))
+    p.add_argument("--database", default=os.getenv("CHROMA_DATABASE", ""))
+    p.add_argument("--embed", choices=["openai", "st", "onnx"], default="openai",
+                   help="onnx = all-MiniLM-L6-v2 int8 via onnxruntime (lihat onnxembed.py)")
+    p.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    p.add_argument("--chunk-size", type=int, default=900)
+    p.add_argument("--chunk-overlap", type=int, default=150)
+    p.add_argument("--round-size", type=int, default=DEFAULT_ROUND_SIZE,
+                   help="Jumlah file per putaran pipeline (membatasi antrean di memori)")
+    p.add_argument("--journal", help="Path journal checkpoint (default .rag_cache/bulkingest-<collection>.jsonl)")
+    p.add_argument("--no-cache", action="store_true", help="Jangan pakai cache embedding lokal")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    mode = {"cloud": CHROMA_CLOUD, "local": CHROMA_LOCAL, "numpy": CHROMA_NUMPY}[args.mode]
+    embed_choice = {"openai": EMBED_OPENAI, "st": EMBED_SENTENCE_TRANSFORMERS, "onnx": EMBED_ONNX}[args.embed]
+    try:
+        client = make_chroma_client(mode, tenant=args.tenant, database=args.database,
+                                    api_key=os.getenv("CHROMA_API_KEY", ""), persist_dir=args.persist_dir)
+        emb_func = make_embedding_function(embed_choice, os.getenv("OPENAI_API_KEY", ""),
+                                           cache=None if args.no_cache else EmbeddingCache())
+    except Exception as e:
+        print(f"Gagal menyiapkan Chroma/embedding: {e}", file=sys.stderr)
+        return 2
+    collection = open_collection(client, args.collection, emb_func)
+    key = collection_key(mode, args.collection, tenant=args.tenant, database=args.database, persist_dir=args.persist_dir)
+    catalog = SourceCatalog()
+    mirror = BM25Index().for_collection(key)
+
+    # Journal per koleksi tujuan (mode + tenant/database atau persist dir + nama), bukan nama saja
+    journal = Journal(args.journal or os.path.join(
+        os.getenv("RAG_CACHE_DIR", ".rag_cache"),
+        f"bulkingest-{args.collection}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]}.jsonl"))
+    files, stats_by_source, resumed = [], {}, 0
+    for source, path in walk_files(args.root):
+        stat = os.stat(path)
+        if journal.is_done(source, stat):
+            resumed += 1
+            continue
+        files.append((source, path))
+        stats_by_source[source] = stat
+    print(f"{len(files)} file akan diproses ({resumed} sudah selesai di run sebelumnya).")
+
+    def on_source(source, info):
+        # Dipanggil dari thread writer setelah chunk sumber ini tersimpan di Chroma
+        catalog.upsert(key, source, info["chunks"], info["bytes"], info["content_hash"])
+        journal.record(source, stats_by_source[source], "done", info["chunks"])
+
+    done = [0]
+    def on_file(source, n_chunks, error):
+        done[0] += 1
+        if error is not None:
+            journal.record(source, stats_by_source[source], "failed", error=str(error))
+        elif not n_chunks:
+            journal.record(source, stats_by_source[source], "empty")
+        status = f"GAGAL: {error}" if error is not None else f"{n_chunks} chunk"
+        print(f"[{done[0]}/{len(files)}] {source}: {status}", flush=True)
+
+    totals = {"files": 0, "chunks": 0, "tokens": 0, "skipped": 0, "deleted": 0}
+    errors, write_errors = [], []
+    started = time.perf_counter()
+    interrupted = False
+    try:
+        for i in range(0, len(files), max(1, args.round_size)):
+            stats = run_pipeline(files[i:i + args.round_size], collection, size=args.chunk_size,
+                                 overlap=args.chunk_overlap, batch_size=args.batch_size, workers=args.workers,
+                                 on_file=on_file, on_source=on_source, mirrors=[mirror])
+            for k in totals: totals[k] += stats[k]
+            errors += stats["errors"]
+            write_errors += stats["write_errors"]
+            # Sumber yang batch-nya gagal tidak pernah dicatat "done" (on_source tidak dipanggil);
+            # "failed" memastikan run berikutnya memprosesnya lagi
+            for source in stats["failed_sources"]:
+                journal.record(source, stats_by_source[source], "failed", error="gagal ditulis ke koleksi")
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        journal.close()
+    elapsed = time.perf_counter() - started
+
+    if interrupted:
+        print("\nDihentikan. Jalankan ulang perintah yang sama untuk melanjutkan.")
+    for src, msg in write_errors:
+        print(f"Gagal menulis ({src}): {msg}", file=sys.stderr)
+    rate = lambda n: n / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Selesai dalam {elapsed:.1f} dtk: {totals['files']} file ({rate(totals['files']):.2f} file/dtk), "
+        f"{totals['chunks']} chunk baru ({rate(totals['chunks']):.1f} chunk/dtk), "
+        f"{totals['tokens']} token embedding ({rate(totals['tokens']):.0f} token/dtk); "
+        f"{totals['skipped']} chunk tidak berubah, {totals['deleted']} dihapus, "
+        f"{len(errors)} file gagal, {len(write_errors)} batch gagal ditulis."
+    )
+    return 130 if interrupted else (1 if errors or write_errors else 0)
+
+if __name__ == "__main__":
+    sys.exit(main())
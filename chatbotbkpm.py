@@ -1,10 +1,22 @@
 import streamlit as st
 import openai
-import requests
 import os
+import time
 import io
+import asyncio
+import hashlib
 import PyPDF2
 
+from contractreview import (
+    SYSTEM_PROMPT, REVIEW_MODEL, PROMPT_VERSION, SINGLE_CALL_MAX_TOKENS, DEFAULT_SECTION_TOKENS, DEFAULT_CONCURRENCY,
+    count_tokens, map_contract, reduce_messages,
+    split_clauses, clause_hash, clause_label, clause_cache_key, diff_clauses, review_clauses, incremental_reduce_messages,
+)
+from reviewcache import ReviewCache, review_key
+from llmstream import stream_chat, format_timing
+from n8noutbox import WebhookOutbox, PENDING, SENDING, SENT, FAILED
+import tracing
+
 # --- Fungsi Bantuan ---
 
 def extract_text_from_pdf(file_bytes):
@@ -18,21 +30,105 @@ def extract_text_from_pdf(file_bytes):
         st.error(f"Gagal mengekstrak teks dari PDF: {e}")
         return None
 
+def stream_review(messages, api_key):
+    """Menampilkan jawaban OpenAI token demi token; teks sementara dihapus setelah selesai
+    karena hasil akhir ditampilkan di bagian 'Hasil Tinjauan AI'."""
+    openai.api_key = api_key # Mengatur kunci API sebelum melakukan panggilan
+    stats = {}
+    live_box = st.empty()
+    with live_box.container():
+        result = st.write_stream(stream_chat(openai.chat.completions.create, stats, model=REVIEW_MODEL, messages=messages))
+    live_box.empty()
+    st.session_state.review_timing = stats
+    return result
+
 def review_contract(contract_text, api_key):
     """Mengirim teks kontrak ke OpenAI API untuk ditinjau."""
     if not contract_text or not contract_text.strip():
         st.warning("Tidak ada teks yang dapat dianalisis dari file yang diunggah.")
         return None
     try:
-        openai.api_key = api_key # Mengatur kunci API sebelum melakukan panggilan
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Anda adalah asisten hukum ahli yang berspesialisasi dalam peninjauan kontrak. Tinjau dokumen berikut secara komprehensif, identifikasi potensi risiko, klausul yang tidak jelas, dan area yang mungkin memerlukan negosiasi lebih lanjut. Berikan ringkasan, poin-poin penting, dan saran dalam format yang jelas dan mudah dibaca."},
-                {"role": "user", "content": contract_text}
-            ]
-        )
-        return response.choices[0].message.content
+        return stream_review([
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": contract_text}
+        ], api_key)
+    except openai.AuthenticationError:
+        st.error("Kunci API OpenAI tidak valid atau salah. Harap periksa kembali di sidebar.")
+        return None
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat berkomunikasi dengan OpenAI: {e}")
+        return None
+
+def review_contract_map_reduce(contract_text, api_key, section_tokens, concurrency):
+    """Meninjau kontrak panjang per bagian secara paralel, lalu menggabungkan temuannya."""
+    if not contract_text or not contract_text.strip():
+        st.warning("Tidak ada teks yang dapat dianalisis dari file yang diunggah.")
+        return None
+    progress = st.progress(0.0, text="Meninjau bagian kontrak...")
+
+    def on_section(index, done, total):
+        progress.progress(done / total, text=f"Bagian {index + 1} selesai ({done}/{total})")
+
+    try:
+        with tracing.span("review.map", concurrency=concurrency) as sp:
+            findings = asyncio.run(map_contract(
+                contract_text, api_key, section_tokens=section_tokens, concurrency=concurrency, on_section=on_section
+            ))
+            sp.set(sections=len(findings))
+        progress.progress(1.0, text=f"{len(findings)} bagian selesai ditinjau, menggabungkan temuan...")
+        return stream_review(reduce_messages(findings), api_key)
+    except openai.AuthenticationError:
+        st.error("Kunci API OpenAI tidak valid atau salah. Harap periksa kembali di sidebar.")
+        return None
+    except Exception as e:
+        st.error(f"Terjadi kesalahan saat berkomunikasi dengan OpenAI: {e}")
+        return None
+
+@st.cache_resource
+def get_review_cache():
+    """Cache tinjauan on-disk lintas sesi: kontrak yang sama persis tidak ditinjau ulang."""
+    return ReviewCache()
+
+@st.cache_resource
+def get_outbox():
+    """Outbox n8n dan worker pengirimnya, satu per proses (dipakai bersama semua sesi)."""
+    return WebhookOutbox().start()
+
+def review_contract_incremental(contract_text, contract_name, content_hash, api_key, group_tokens, concurrency):
+    """Tinjauan per klausul: hanya klausul yang belum pernah dianalisis (mis. pasal yang diubah pada
+    amandemen) dikirim ke model, lalu laporan lengkap disusun ulang dari semua analisis klausul."""
+    if not contract_text or not contract_text.strip():
+        st.warning("Tidak ada teks yang dapat dianalisis dari file yang diunggah.")
+        return None
+    review_cache = get_review_cache()
+    clauses = split_clauses(contract_text)
+    hashes = [clause_hash(c) for c in clauses]
+    keys = [clause_cache_key(h, REVIEW_MODEL) for h in hashes]
+    found = review_cache.get_clauses(keys)
+    prior = review_cache.find_prior_version(contract_name, content_hash, hashes)
+    diff = diff_clauses(prior["clause_hashes"], hashes) if prior else None
+    removed_labels = [prior["labels"][i] for i in diff["removed"]] if prior else []
+    # Klausul identik (hash sama) cukup dianalisis sekali
+    pending = sorted({keys[i]: i for i in reversed(range(len(clauses))) if keys[i] not in found}.values())
+
+    summary = f"{len(clauses)} klausul · {len(clauses) - len(pending)} dari cache · {len(pending)} dianalisis"
+    if prior:
+        summary += (f" · dibandingkan dengan '{prior['name']}': {len(diff['changed'])} diubah, "
+                    f"{len(diff['added'])} ditambah, {len(diff['removed'])} dihapus")
+    st.info(summary)
+    progress = st.progress(0.0, text="Meninjau klausul yang berubah...")
+
+    def on_group(done, total):
+        progress.progress(done / total, text=f"Kelompok klausul {done}/{total} selesai")
+
+    try:
+        new = asyncio.run(review_clauses(clauses, pending, api_key, REVIEW_MODEL, concurrency, group_tokens, on_group)) if pending else {}
+        review_cache.put_clauses({keys[i]: analysis for i, analysis in new.items()})
+        found.update((keys[i], analysis) for i, analysis in new.items())
+        analyses = {i: found[k] for i, k in enumerate(keys) if k in found}
+        review_cache.save_version(contract_name, content_hash, hashes, [clause_label(c) for c in clauses])
+        progress.progress(1.0, text="Menyusun laporan lengkap...")
+        return stream_review(incremental_reduce_messages(clauses, analyses, diff, removed_labels), api_key)
     except openai.AuthenticationError:
         st.error("Kunci API OpenAI tidak valid atau salah. Harap periksa kembali di sidebar.")
         return None
@@ -41,19 +137,63 @@ def review_contract(contract_text, api_key):
         return None
 
 def send_to_n8n(decision, contract_name, review_summary, webhook_url):
-    """Mengirim keputusan dan data relevan ke webhook n8n."""
+    """Mencatat keputusan ke outbox; pengiriman ke webhook n8n dilakukan worker di latar belakang.
+
+    Mengembalikan ID outbox (status pengiriman dipantau lewat `get_outbox().status`), atau None.
+    """
     try:
         payload = {
             "decision": decision,
             "contract_name": contract_name,
             "review_summary": review_summary
         }
-        response = requests.post(webhook_url, json=payload)
-        response.raise_for_status()
-        return True
-    except requests.exceptions.RequestException as e:
-        st.error(f"Gagal mengirim data ke n8n: Pastikan URL Webhook benar dan dapat diakses. Error: {e}")
-        return False
+        with tracing.span("n8n.enqueue", decision=decision):
+            outbox_id = get_outbox().enqueue(webhook_url, payload)
+        st.session_state.n8n_deliveries.append({"id": outbox_id, "decision": decision, "contract_name": contract_name})
+        return outbox_id
+    except Exception as e:
+        st.error(f"Gagal mencatat keputusan ke outbox n8n: {e}")
+        return None
+
+_DELIVERY_LABELS = {PENDING: "⏳ Menunggu", SENDING: "📤 Mengirim", SENT: "✅ Terkirim", FAILED: "❌ Gagal"}
+
+def _undelivered(statuses):
+    """Jumlah pengiriman sesi ini yang masih menunggu/dikirim (belum punya hasil akhir)."""
+    return sum(1 for info in statuses.values() if info.get("status") in (PENDING, SENDING))
+
+def _render_delivery_status(polling=False):
+    deliveries = st.session_state.n8n_deliveries
+    outbox = get_outbox()
+    statuses = outbox.status(d["id"] for d in deliveries)
+    if polling and not _undelivered(statuses):
+        st.rerun()  # semua sudah terkirim/gagal: render ulang penuh agar panel berhenti polling
+    st.subheader("Status Pengiriman ke n8n")
+    for d in reversed(deliveries):
+        info = statuses.get(d["id"], {})
+        label = _DELIVERY_LABELS.get(info.get("status"), "?")
+        detail = f"{label} · {d['contract_name']} ({d['decision']})"
+        if info.get("status") == PENDING and info.get("attempts"):
+            detail += f" · percobaan {info['attempts']}, ulang dalam {max(0, info['next_attempt'] - time.time()):.0f} dtk"
+        col_text, col_button = st.columns([5, 1])
+        col_text.write(detail)
+        if info.get("last_error") and info.get("status") != SENT:
+            col_text.caption(f"Error terakhir: {info['last_error']}")
+        if info.get("status") == FAILED and col_button.button("🔁 Kirim ulang", key=f"retry_{d['id']}"):
+            outbox.retry(d["id"])
+            st.rerun()  # render ulang penuh supaya panel kembali polling
+
+def delivery_status_panel():
+    """Status pengiriman keputusan sesi ini ke n8n.
+
+    Panel hanya di-polling (fragment `run_every`) selama masih ada pengiriman yang belum selesai;
+    bila semuanya terkirim/gagal panel dirender statis tanpa timer.
+    """
+    deliveries = st.session_state.n8n_deliveries
+    if not deliveries: return
+    if not hasattr(st, "fragment"):
+        return _render_delivery_status()
+    polling = bool(_undelivered(get_outbox().status(d["id"] for d in deliveries)))
+    st.fragment(run_every=3 if polling else None)(_render_delivery_status)(polling)
 
 # --- Inisialisasi Status Sesi (Session State) ---
 # Diperlukan untuk menyimpan nilai antar interaksi pengguna
@@ -69,6 +209,12 @@ if 'file_name' not in st.session_state:
     st.session_state.file_name = None
 if 'processing' not in st.session_state:
     st.session_state.processing = False
+if 'review_timing' not in st.session_state:
+    st.session_state.review_timing = None
+if 'review_cached_at' not in st.session_state:
+    st.session_state.review_cached_at = None
+if 'n8n_deliveries' not in st.session_state:
+    st.session_state.n8n_deliveries = []
 
 
 # --- Antarmuka Pengguna Streamlit ---
@@ -103,6 +249,20 @@ if st.sidebar.button("Simpan Konfigurasi"):
         st.sidebar.error("Harap masukkan Kunci API dan URL Webhook yang valid.")
         st.session_state.config_set = False
 
+st.sidebar.header("🧩 Mode Tinjauan")
+review_mode = st.sidebar.radio(
+    "Mode peninjauan",
+    ["Otomatis", "Satu panggilan", "Map-reduce", "Per pasal (inkremental)"],
+    help=f"Otomatis memakai map-reduce untuk kontrak di atas {SINGLE_CALL_MAX_TOKENS:,} token. "
+         "Per pasal hanya meninjau klausul yang berubah dibanding versi yang pernah ditinjau (cocok untuk amandemen)."
+)
+section_tokens = st.sidebar.slider("Token per bagian (map-reduce)", 1000, 16000, DEFAULT_SECTION_TOKENS, step=500)
+review_concurrency = st.sidebar.slider("Bagian ditinjau bersamaan", 1, 16, DEFAULT_CONCURRENCY)
+
+st.sidebar.header("🐞 Debug")
+debug_panel = st.sidebar.checkbox("Panel latensi per tahap", value=tracing.is_enabled())
+tracing.start_metrics_server()  # hanya bila RAG_METRICS_PORT diset
+
 # ==================== APLIKASI UTAMA ====================
 st.title("📄 Tinjauan Dokumen Kontrak Komprehensif dengan AI")
 
@@ -116,45 +276,93 @@ st.markdown("Unggah dokumen kontrak Anda (.pdf, .txt, .md) untuk mendapatkan ana
 uploaded_file = st.file_uploader("Pilih file dokumen (.pdf, .txt, .md)", type=['pdf', 'txt', 'md'])
 
 if uploaded_file is not None:
+    force_review = st.checkbox("🔁 Paksa tinjau ulang (abaikan cache)",
+                               help="Tinjauan kontrak yang sama persis (isi file, model, versi prompt, dan mode) diambil dari cache.")
     if st.button("Tinjau Dokumen", disabled=st.session_state.processing):
-        with st.spinner("Membaca dan menganalisis kontrak... Harap tunggu sebentar."):
+        with st.spinner("Membaca dan menganalisis kontrak... Harap tunggu sebentar."), tracing.trace("review", force=debug_panel) as tr:
             st.session_state.processing = True
             contract_text = None
             try:
                 file_extension = os.path.splitext(uploaded_file.name)[1].lower()
                 contract_bytes = uploaded_file.read()
 
-                if file_extension == ".pdf":
-                    contract_text = extract_text_from_pdf(contract_bytes)
-                else:
-                    contract_text = contract_bytes.decode("utf-8")
+                # Cache dicek dari hash byte file, sebelum ekstraksi teks maupun panggilan OpenAI
+                review_cache = get_review_cache()
+                variant = review_mode if review_mode == "Satu panggilan" else f"{review_mode}|{section_tokens}"
+                content_hash = hashlib.sha256(contract_bytes).hexdigest()
+                cache_key = review_key(content_hash, REVIEW_MODEL, PROMPT_VERSION, variant)
+                with tracing.span("review_cache.lookup") as sp:
+                    cached = None if force_review else review_cache.get(cache_key)
+                    sp.set(hit=cached is not None)
 
-                if contract_text:
+                if cached:
+                    st.session_state.review_result, meta, st.session_state.review_cached_at = cached
+                    st.session_state.review_timing = meta.get("timing")
                     st.session_state.file_name = uploaded_file.name
-                    # Kirim kunci API yang disimpan di session state ke fungsi
-                    st.session_state.review_result = review_contract(
-                        contract_text,
-                        st.session_state.openai_api_key
-                    )
                 else:
-                    st.session_state.review_result = None
+                    st.session_state.review_cached_at = None
+                    with tracing.span("read_file", bytes=len(contract_bytes)):
+                        if file_extension == ".pdf":
+                            contract_text = extract_text_from_pdf(contract_bytes)
+                        else:
+                            contract_text = contract_bytes.decode("utf-8")
+
+                    if contract_text:
+                        st.session_state.file_name = uploaded_file.name
+                        use_map_reduce = review_mode == "Map-reduce" or (
+                            review_mode == "Otomatis" and count_tokens(contract_text) > SINGLE_CALL_MAX_TOKENS
+                        )
+                        # Kirim kunci API yang disimpan di session state ke fungsi
+                        if review_mode == "Per pasal (inkremental)":
+                            st.session_state.review_result = review_contract_incremental(
+                                contract_text,
+                                uploaded_file.name,
+                                content_hash,
+                                st.session_state.openai_api_key,
+                                section_tokens,
+                                review_concurrency
+                            )
+                        elif use_map_reduce:
+                            st.session_state.review_result = review_contract_map_reduce(
+                                contract_text,
+                                st.session_state.openai_api_key,
+                                section_tokens,
+                                review_concurrency
+                            )
+                        else:
+                            st.session_state.review_result = review_contract(
+                                contract_text,
+                                st.session_state.openai_api_key
+                            )
+                        timing = st.session_state.review_timing or {}
+                        if st.session_state.review_result and not timing.get("cancelled"):
+                            review_cache.put(cache_key, st.session_state.review_result,
+                                             {"file_name": uploaded_file.name, "map_reduce": use_map_reduce, "timing": timing})
+                    else:
+                        st.session_state.review_result = None
 
             except Exception as e:
                 st.error(f"Gagal memproses file: {e}")
                 st.session_state.review_result = None
             finally:
                 st.session_state.processing = False
+        st.session_state.last_trace = tr
 
 if st.session_state.review_result:
     st.subheader("Hasil Tinjauan AI")
     st.markdown(st.session_state.review_result)
+    if st.session_state.review_cached_at:
+        st.caption(f"⚡ Dari cache tinjauan (ditinjau {time.strftime('%Y-%m-%d %H:%M', time.localtime(st.session_state.review_cached_at))})"
+                   " · centang 'Paksa tinjau ulang' untuk meninjau lagi")
+    elif st.session_state.review_timing:
+        st.caption(format_timing(st.session_state.review_timing))
 
     st.subheader("Tindakan")
     col1, col2 = st.columns(2)
 
     with col1:
         if st.button("✅ Setujui Dokumen", type="primary"):
-            with st.spinner("Mengirim persetujuan..."):
+            with tracing.trace("n8n", force=debug_panel) as tr:
                 success = send_to_n8n(
                     "disetujui",
                     st.session_state.file_name,
@@ -162,13 +370,14 @@ if st.session_state.review_result:
                     st.session_state.n8n_webhook_url # Kirim URL webhook
                 )
                 if success:
-                    st.success(f"Dokumen '{st.session_state.file_name}' telah disetujui dan notifikasi telah dikirim.")
+                    st.success(f"Dokumen '{st.session_state.file_name}' telah disetujui; notifikasi dikirim ke n8n di latar belakang.")
                     st.session_state.review_result = None
                     st.session_state.file_name = None
+            st.session_state.last_trace = tr
 
     with col2:
         if st.button("❌ Tolak Dokumen"):
-            with st.spinner("Mengirim penolakan..."):
+            with tracing.trace("n8n", force=debug_panel) as tr:
                 success = send_to_n8n(
                     "ditolak",
                     st.session_state.file_name,
@@ -176,6 +385,28 @@ if st.session_state.review_result:
                     st.session_state.n8n_webhook_url # Kirim URL webhook
                 )
                 if success:
-                    st.success(f"Dokumen '{st.session_state.file_name}' telah ditolak dan notifikasi telah dikirim.")
+                    st.success(f"Dokumen '{st.session_state.file_name}' telah ditolak; notifikasi dikirim ke n8n di latar belakang.")
                     st.session_state.review_result = None
                     st.session_state.file_name = None
+            st.session_state.last_trace = tr
+
+delivery_status_panel()
+
+review_stats = get_review_cache().stats()
+st.sidebar.caption(
+    f"Cache tinjauan: {review_stats['entries']} kontrak · {review_stats['clauses']} klausul · "
+    f"{(review_stats['bytes'] + review_stats['clause_bytes']) / 1e6:.1f} MB · "
+    f"{review_stats['hits']} hit / {review_stats['misses']} miss"
+)
+
+if debug_panel:
+    last = st.session_state.get("last_trace")
+    if last is not None and last.total is not None:
+        st.sidebar.caption(f"Permintaan terakhir ({last.kind}): {last.total * 1000:.0f} ms")
+        st.sidebar.dataframe(last.rows(), use_container_width=True)
+    else:
+        st.sidebar.caption("Belum ada permintaan yang direkam.")
+    with st.sidebar.expander("Agregat proses"):
+        st.dataframe(tracing.REGISTRY.summary(), use_container_width=True)
+    st.sidebar.download_button("⬇️ Metrik (Prometheus)", tracing.prometheus_text(), file_name="metrics.prom")
+    st.sidebar.download_button("⬇️ Metrik (JSONL)", tracing.metrics_jsonl(), file_name="metrics.jsonl")
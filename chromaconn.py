@@ -0,0 +1,76 @@
+"""Pembuatan client Chroma dan embedding function tanpa Streamlit (dipakai UI maupun CLI).
+
+Mode `CHROMA_NUMPY` memakai backend in-process npvector (API koleksi yang sama) sebagai pengganti
+PersistentClient untuk koleksi lokal kecil-menengah. chromadb baru diimpor saat client atau
+embedding function dibuat, sehingga mengimpor modul ini (untuk konstanta mode) tetap murah dan
+tidak menunda render pertama UI.
+"""
+import os
+
+import embedserver
+
+CHROMA_CLOUD = "Chroma Cloud"
+CHROMA_LOCAL = "Local (Persistent)"
+CHROMA_NUMPY = "Local (NumPy mmap)"
+EMBED_OPENAI = "OpenAIEmbeddings"
+EMBED_SENTENCE_TRANSFORMERS = "Sentence-Transformers (all-MiniLM-L6-v2)"
+EMBED_ONNX = "Sentence-Transformers ONNX int8 (all-MiniLM-L6-v2, CPU)"
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+SENTENCE_TRANSFORMERS_MODEL = "all-MiniLM-L6-v2"
+
+def make_chroma_client(mode, tenant=None, database=None, api_key=None, persist_dir=None):
+    """CloudClient atau PersistentClient yang sudah dicek dengan heartbeat. Error diteruskan ke pemanggil."""
+    if mode == CHROMA_NUMPY:
+        from npvector import NumpyVectorClient
+        client = NumpyVectorClient(persist_dir)
+    elif mode == CHROMA_CLOUD:
+        if not (tenant and database and api_key):
+            raise ValueError("Lengkapi Tenant, Database, dan Chroma API Key.")
+        import chromadb
+        client = chromadb.CloudClient(tenant=tenant, database=database, api_key=api_key)
+    else:
+        import chromadb
+        client = chromadb.PersistentClient(path=persist_dir)
+    client.heartbeat() # Cek koneksi
+    return client
+
+def make_embedding_function(choice, openai_api_key=None, cache=None):
+    """Embedding function sesuai pilihan UI; dibungkus EmbeddingCache bila `cache` diberikan."""
+    from chromadb.utils import embedding_functions
+    from embedcache import CachedEmbeddingFunction
+    if choice == EMBED_OPENAI:
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY diperlukan.")
+        # Dikemas per anggaran token dan dibatasi TPM/RPM sisi client, bukan satu request per panggilan
+        from openaiembed import OpenAIEmbeddingDispatcher
+        inner = OpenAIEmbeddingDispatcher(openai_api_key, OPENAI_EMBEDDING_MODEL)
+        model_name = f"openai:{OPENAI_EMBEDDING_MODEL}"
+    elif choice == EMBED_ONNX:
+        # Model yang sama dalam ONNX int8 (onnxembed.py); cache terpisah karena vektornya sedikit bergeser
+        import onnxembed
+        inner = onnxembed.load()
+        model_name = f"onnx-int8:{SENTENCE_TRANSFORMERS_MODEL}"
+    else:
+        if embedserver.SERVER_URL:
+            # Model dipegang embedserver.py (satu instance untuk semua proses); vektornya identik
+            # dengan model lokal, jadi cache dan koleksi yang ada tetap dipakai
+            inner = embedserver.connect(SENTENCE_TRANSFORMERS_MODEL)
+        else:
+            inner = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=SENTENCE_TRANSFORMERS_MODEL)
+        model_name = f"sentence-transformers:{SENTENCE_TRANSFORMERS_MODEL}"
+    return CachedEmbeddingFunction(inner, model_name, cache) if cache is not None else inner
+
+def collection_key(mode, collection_name, tenant=None, database=None, persist_dir=None):
+    """Identitas koleksi untuk katalog, indeks BM25, dan cache lokal (cloud vs persist dir)."""
+    if mode == CHROMA_CLOUD:
+        return f"cloud:{tenant}/{database}/{collection_name}"
+    prefix = "npvector" if mode == CHROMA_NUMPY else "local"
+    return f"{prefix}:{os.path.abspath(persist_dir)}/{collection_name}"
+
+def open_collection(client, name, embedding_function, registry=None, scope=""):
+    """get_or_create_collection dengan metrik cosine; bila `registry` (CollectionRegistry) diberikan,
+    handle di-cache per proses di bawah `scope` (mis. nama tugas client)."""
+    metadata = {"hnsw:space": "cosine"}
+    if registry is not None:
+        return registry.get(client, name, embedding_function, create=True, scope=scope, metadata=metadata)
+    return client.get_or_create_collection(name=name, embedding_function=embedding_function, metadata=metadata)
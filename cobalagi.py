@@ -1,16 +1,54 @@
 import streamlit as st
 import pypdf
-import chromadb
-from sentence_transformers import SentenceTransformer
 import openai
 import os
-import tiktoken
+import sys
+import time
+import asyncio
+
+from ingest import chunk_id, count_tokens, DEFAULT_BATCH_SIZE, MAX_BATCH_CHARS
+from embedcache import EmbeddingCache
+from collectionregistry import REGISTRY as COLLECTIONS
+import embedserver
+from llmstream import stream_chat, format_timing
+from contextpack import pack_context, DEFAULT_CONTEXT_TOKENS
+from batchqa import load_questions, query_batch, answer_batch, summarize, default_output_path, ResultWriter, DEFAULT_CONCURRENCY, DEFAULT_RPM
+import tracing
+import warmup
 
 # Import pengecualian spesifik dari OpenAI
 from openai import OpenAIError, APIError, AuthenticationError, RateLimitError
 
+# --- Pemuatan sumber daya berat ---
+# sentence_transformers dan chromadb diimpor di thread latar (lihat warmup.py) sehingga halaman
+# langsung tampil; keduanya baru ditunggu saat pertama kali dipakai. RAG_STARTUP=eager memuat
+# semuanya secara sinkron di sini seperti sebelumnya.
+def _load_sentence_transformer(runtime="torch"):
+    if runtime == "onnx": # int8 via onnxruntime, tanpa torch (onnxembed.py; diekspor sekali bila belum ada)
+        return warmup.timed_import("onnxembed").load()
+    if embedserver.SERVER_URL: # model dipegang embedserver.py bersama proses lain (RAG_EMBED_SERVER)
+        return embedserver.connect('all-MiniLM-L6-v2')
+    return warmup.timed_import("sentence_transformers").SentenceTransformer('all-MiniLM-L6-v2')
+
+def open_vector_client(backend):
+    if backend == "numpy":
+        return warmup.timed_import("npvector").NumpyVectorClient("./npvector_db")
+    # Penting: Pastikan folder ./chroma_db memiliki izin tulis
+    return warmup.timed_import("chromadb").PersistentClient(path="./chroma_db")
+
+# Backend NumPy (npvector.py) menyimpan vektor di file memory-mapped dengan API koleksi yang sama;
+# lebih cepat dibuka dan di-query untuk koleksi kecil-menengah.
+VECTOR_BACKENDS = {"ChromaDB (./chroma_db)": "chroma", "NumPy mmap (./npvector_db)": "numpy"}
+# ONNX int8: model yang sama (384 dimensi) dengan biaya CPU jauh lebih rendah saat ingestion
+EMBEDDING_RUNTIMES = {"PyTorch fp32": "torch", "ONNX int8 (CPU)": "onnx"}
+
 # --- Streamlit UI: Sidebar ---
 st.sidebar.title("Pengaturan")
+vector_backend = VECTOR_BACKENDS[st.sidebar.selectbox("Backend vektor", list(VECTOR_BACKENDS))]
+embed_runtime = EMBEDDING_RUNTIMES[st.sidebar.selectbox("Runtime embedding", list(EMBEDDING_RUNTIMES))]
+warmup.start(f"embedding_model:{embed_runtime}", _load_sentence_transformer, embed_runtime)
+warmup.start(f"chroma:{vector_backend}", open_vector_client, vector_backend)
+warmup.start("tiktoken", count_tokens, "")
 
 # Input API Key di Sidebar
 openai_api_key = st.sidebar.text_input(
@@ -37,81 +75,164 @@ else:
 
 # --- Inisialisasi Model dan ChromaDB (setelah API Key diatur) ---
 
-# Inisialisasi model embedding
-@st.cache_resource
+# Inisialisasi model embedding (menunggu warm-up bila belum selesai)
 def load_embedding_model():
-    return SentenceTransformer('all-MiniLM-L6-v2')
+    return warmup.result(f"embedding_model:{embed_runtime}", _load_sentence_transformer, embed_runtime)
 
-model = load_embedding_model()
+# Vektor int8 sedikit berbeda, jadi cache embedding-nya terpisah dari fp32
+EMBEDDING_MODEL_NAME = "sentence-transformers:all-MiniLM-L6-v2" if embed_runtime == "torch" else "onnx-int8:all-MiniLM-L6-v2"
 
-# Inisialisasi ChromaDB client
+# Cache embedding on-disk, dipakai bersama dengan uploadchroma.py
 @st.cache_resource
+def get_embedding_cache():
+    return EmbeddingCache()
+
+embed_cache = get_embedding_cache()
+
+# Cache jawaban semantik lintas sesi (in-process); versi koleksi naik setiap ada upload.
+# Dibuat saat pertama dipakai agar numpy tidak ikut diimpor di awal skrip.
+@st.cache_resource
+def get_answer_cache():
+    return warmup.timed_import("answercache").SemanticAnswerCache()
+ANSWER_CACHE_SCOPE = f"gpt-4o-mini|all-MiniLM-L6-v2|{embed_runtime}|{vector_backend}|k=4"
+
+def encode_texts(texts):
+    with tracing.span("embed", model=EMBEDDING_MODEL_NAME, texts=len(texts)):
+        return embed_cache.embed(EMBEDDING_MODEL_NAME, texts, lambda missing: load_embedding_model().encode(missing).tolist())
+
+# Panel debug: durasi tiap tahap untuk permintaan terakhir (lihat tracing.py)
+st.sidebar.header("Debug")
+debug_panel = st.sidebar.checkbox("Panel latensi per tahap", value=tracing.is_enabled())
+tracing.start_metrics_server()  # hanya bila RAG_METRICS_PORT diset
+
+# Inisialisasi ChromaDB client (dibuka di latar; dipanggil saat koleksi pertama kali dibutuhkan)
 def get_chroma_client():
     try:
         # Mencoba membuat koneksi persisten ke ChromaDB
-        # Penting: Pastikan folder ./chroma_db memiliki izin tulis
-        return chromadb.PersistentClient(path="./chroma_db") 
+        return warmup.result(f"chroma:{vector_backend}", open_vector_client, vector_backend)
     except Exception as e:
         st.error(f"Gagal menginisialisasi ChromaDB PersistentClient: {e}")
         st.info("Pastikan Anda memiliki izin tulis di direktori saat ini dan tidak ada proses lain yang mengunci folder 'chroma_db'.")
         st.stop() # Hentikan aplikasi jika ChromaDB tidak bisa diinisialisasi
-        
-client = get_chroma_client()
+
+# Handle koleksi dan daftar koleksi di-cache per proses (collectionregistry.py): rerun tidak lagi
+# memanggil list_collections/get_collection setiap kali; TTL pendek untuk perubahan dari proses lain.
+def collection_scope():
+    return f"chroma:{vector_backend}"
+
+def get_collection(name, create=False):
+    return COLLECTIONS.get(get_chroma_client(), name, create=create, scope=collection_scope())
 
 # --- Fungsi-fungsi Utama ---
 
 # Fungsi untuk memuat dan membagi teks dari PDF
-def load_and_split_pdf(uploaded_file):
+# Generator: halaman dibaca satu per satu dan paragraf langsung diteruskan, sehingga memori
+# tidak tumbuh seiring panjang dokumen. Paragraf yang melewati batas halaman tetap utuh.
+def load_and_split_pdf(uploaded_file, max_paragraph_chars=20000):
+    # PdfReader membaca objek upload (file-like, seekable) langsung, tanpa salinan ke memori/disk
     reader = pypdf.PdfReader(uploaded_file)
-    text = ""
+    carry, read_seconds = "", 0.0
     for page in reader.pages:
-        text += page.extract_text() or ""
-    
-    # Simple chunking by paragraph/sentence for now
-    chunks = [t.strip() for t in text.split('\n\n') if t.strip()]
-    return chunks
+        started = time.perf_counter()
+        page_text = page.extract_text() or ""
+        read_seconds += time.perf_counter() - started
+        parts = (carry + page_text).split('\n\n')
+        carry = parts.pop()
+        # Teks tanpa pemisah paragraf: potong per max_paragraph_chars agar buffer dan chunk terbatas
+        while len(carry) > max_paragraph_chars:
+            parts.append(carry[:max_paragraph_chars])
+            carry = carry[max_paragraph_chars:]
+        for t in parts:
+            if t.strip():
+                yield t.strip()
+    if carry.strip():
+        yield carry.strip()
+    tracing.record("read_file", read_seconds, pages=len(reader.pages))
 
 # Fungsi untuk menambahkan dokumen ke ChromaDB
-def add_documents_to_chroma(collection_name, texts):
-    collection = client.get_or_create_collection(name=collection_name)
-    
-    embeddings = model.encode(texts).tolist()
-    
-    # Generate unique IDs based on collection name and index
-    current_ids_in_collection = collection.get()['ids']
-    new_ids = []
+# `texts` boleh berupa generator; chunk di-embed dan ditulis per batch (dibatasi jumlah chunk
+# dan MAX_BATCH_CHARS), sehingga puncak memori ditentukan ukuran batch, bukan ukuran dokumen.
+def add_documents_to_chroma(collection_name, texts, source=None, batch_size=DEFAULT_BATCH_SIZE, max_batch_chars=MAX_BATCH_CHARS):
+    collection = get_collection(collection_name, create=True)
+    source = source or collection_name
+    added, already_present, seen = 0, 0, set()
+
+    def write_batch(ids, docs, metadatas):
+        # Hanya cek ID yang akan ditulis (O(chunk baru)), bukan seluruh koleksi
+        with tracing.span("collection.get", chunks=len(ids)):
+            existing_ids = set(collection.get(ids=ids, include=[])['ids'])
+        new_rows = [row for row in zip(ids, docs, metadatas) if row[0] not in existing_ids]
+        if new_rows:
+            new_ids, new_docs, new_metadatas = (list(col) for col in zip(*new_rows))
+            embeddings = encode_texts(new_docs)
+            with tracing.span("collection.add", chunks=len(new_ids)):
+                collection.add(
+                    embeddings=embeddings,
+                    documents=new_docs,
+                    metadatas=new_metadatas,
+                    ids=new_ids
+                )
+            # Setiap batch yang tertulis langsung membatalkan jawaban cache koleksi ini, walau batch
+            # berikutnya gagal
+            get_answer_cache().invalidate(collection_name)
+        return len(new_rows), len(existing_ids)
+
+    # ID deterministik dari sumber + hash konten, tanpa membaca isi koleksi.
+    # Chunk yang sama persis dari sumber yang sama cukup disimpan sekali.
+    ids, docs, metadatas, batch_chars = [], [], [], 0
     for i, text_chunk in enumerate(texts):
-        potential_id = f"{collection_name}_doc_{i}"
-        counter = 0
-        while potential_id in current_ids_in_collection:
-            counter += 1
-            potential_id = f"{collection_name}_doc_{i}_{counter}"
-        new_ids.append(potential_id)
-
-    collection.add(
-        embeddings=embeddings,
-        documents=texts,
-        ids=new_ids
-    )
-    st.success(f"Berhasil mengunggah {len(texts)} chunks ke koleksi '{collection_name}'")
+        chunk_key = chunk_id(source, text_chunk)
+        if chunk_key in seen:
+            continue
+        seen.add(chunk_key)
+        ids.append(chunk_key)
+        docs.append(text_chunk)
+        metadatas.append({"source": source, "chunk": i})
+        batch_chars += len(text_chunk)
+        if len(ids) >= batch_size or batch_chars >= max_batch_chars:
+            n_new, n_existing = write_batch(ids, docs, metadatas)
+            added, already_present = added + n_new, already_present + n_existing
+            ids, docs, metadatas, batch_chars = [], [], [], 0
+    if ids:
+        n_new, n_existing = write_batch(ids, docs, metadatas)
+        added, already_present = added + n_new, already_present + n_existing
+
+    if added:
+        st.success(f"Berhasil mengunggah {added} chunks ke koleksi '{collection_name}' ({already_present} sudah ada)")
+    elif already_present:
+        st.info(f"Semua {already_present} chunks sudah ada di koleksi '{collection_name}'.")
+    return added + already_present
 
 # Fungsi untuk melakukan pencarian di ChromaDB
-def retrieve_documents(query, collection_name, n_results=4):
+def retrieve_documents(query, collection_name, n_results=4, query_embedding=None):
     try:
-        collection = client.get_collection(name=collection_name)
-        query_embedding = model.encode([query]).tolist()
-        results = collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
-        return results['documents'][0] if results and 'documents' in results and results['documents'] else []
+        collection = get_collection(collection_name)
+        if query_embedding is None:
+            query_embedding = encode_texts([query])[0]
+        with tracing.span("collection.query", k=n_results):
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=["documents", "metadatas"]
+            )
+        if not results or not results.get('documents'):
+            return []
+        # Pasangan (dokumen, metadata) agar chunk bertetangga bisa digabung saat menyusun prompt
+        docs = results['documents'][0]
+        metadatas = (results.get('metadatas') or [[]])[0] or [{}] * len(docs)
+        return list(zip(docs, metadatas))
     except Exception as e:
+        COLLECTIONS.invalidate(collection_scope(), collection_name) # mis. koleksi dihapus proses lain
         st.error(f"Error saat mengambil dokumen dari ChromaDB: {e}")
         return []
 
 # Fungsi untuk membuat prompt RAG
-def create_rag_prompt(query, context_docs):
-    context = "\n\n".join(context_docs)
+# Konteks dikemas: chunk bertetangga digabung, duplikat dibuang, dan dibatasi anggaran token.
+# Mengembalikan (prompt, stats) dengan stats berisi jumlah token konteks sebelum/sesudah pengemasan.
+def create_rag_prompt(query, context_docs, budget_tokens=DEFAULT_CONTEXT_TOKENS):
+    with tracing.span("build_prompt") as sp:
+        _, context, pack_stats = pack_context(context_docs, budget_tokens)
+        sp.set(tokens=pack_stats["tokens_after"])
     prompt = f"""Anda adalah asisten AI yang membantu menjawab pertanyaan berdasarkan dokumen yang diberikan.
     Jawab pertanyaan pengguna hanya berdasarkan informasi yang ditemukan dalam konteks berikut.
     Jika Anda tidak dapat menemukan jawabannya dalam konteks yang diberikan, katakan saja bahwa Anda tidak tahu.
@@ -122,26 +243,32 @@ def create_rag_prompt(query, context_docs):
     Pertanyaan: {query}
     Jawaban:
     """
-    return prompt
+    return prompt, pack_stats
 
 # Fungsi untuk berinteraksi dengan OpenAI GPT
-def generate_response(prompt):
+# Jawaban di-stream ke halaman token demi token; `timing` (dict, opsional) diisi TTFT & durasi total
+def generate_response(prompt, timing=None):
     global client_openai # Pastikan kita mengakses client_openai global
     if not client_openai:
         st.error("OpenAI client belum diinisialisasi. Harap masukkan API Key.")
         return None
     
+    timing = {} if timing is None else timing
     try:
-        response = client_openai.chat.completions.create( # Menggunakan .chat.completions.create
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Anda adalah asisten yang membantu."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        return response.choices[0].message.content # Akses konten
+        live_box = st.empty() # Teks sementara; jawaban final tampil di Riwayat Chat
+        with live_box.container():
+            answer = st.write_stream(stream_chat(
+                client_openai.chat.completions.create, timing,
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "Anda adalah asisten yang membantu."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=500
+            ))
+        live_box.empty()
+        return answer
     except AuthenticationError:
         st.error("OpenAI Authentication Error: API Key Anda mungkin salah atau kedaluwarsa.")
         return None
@@ -160,6 +287,7 @@ def generate_response(prompt):
 
 # --- Streamlit UI: Main Content ---
 st.title("Chat dengan Dokumen PDF Anda (RAG)")
+warmup.mark("first_paint")
 
 # Bagian Unggah PDF
 st.header("1. Unggah Dokumen PDF Anda")
@@ -170,25 +298,24 @@ if uploaded_file and st.button("Proses PDF dan Tambahkan ke ChromaDB"):
     if not new_collection_name:
         st.error("Nama koleksi tidak boleh kosong.")
     else:
-        with st.spinner("Memproses PDF dan membuat embedding..."):
+        with st.spinner("Memproses PDF dan membuat embedding..."), tracing.trace("upload", force=debug_panel) as tr:
             try:
                 chunks = load_and_split_pdf(uploaded_file)
-                if chunks:
-                    add_documents_to_chroma(new_collection_name, chunks)
+                if add_documents_to_chroma(new_collection_name, chunks, source=uploaded_file.name):
                     st.session_state.current_collection = new_collection_name # Set koleksi aktif
                 else:
                     st.warning("PDF kosong atau tidak dapat diekstraksi teks.")
             except Exception as e:
                 st.error(f"Terjadi kesalahan saat memproses PDF: {e}")
+        st.session_state.last_trace = tr
 
 st.divider()
 
 # Bagian Daftar Koleksi yang Sudah Ada
 st.sidebar.header("Koleksi ChromaDB yang Ada")
 try:
-    existing_collections = client.list_collections()
-    if existing_collections:
-        collection_names = [col.name for col in existing_collections]
+    collection_names = COLLECTIONS.names(get_chroma_client(), collection_scope())
+    if collection_names:
         st.sidebar.write("Pilih koleksi untuk chatting:")
         
         # Buat dropdown untuk memilih koleksi
@@ -222,6 +349,10 @@ st.divider()
 # Bagian Chatting
 st.header("2. Ajukan Pertanyaan")
 
+st.sidebar.header("Cache Jawaban")
+answer_cache_threshold = st.sidebar.slider("Ambang kemiripan (cosine)", 0.80, 1.00, 0.95, step=0.01)
+answer_cache_ttl = st.sidebar.number_input("TTL cache jawaban (detik)", 60, 86400, 3600, step=60)
+
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 # Ensure current_collection is always initialized even if it's None
@@ -239,20 +370,34 @@ if user_query and st.button("Kirim Pertanyaan"):
     if st.session_state.current_collection:
         st.session_state.chat_history.append({"role": "user", "content": user_query})
         
-        with st.spinner("Mencari jawaban..."):
+        with st.spinner("Mencari jawaban..."), tracing.trace("chat", force=debug_panel) as tr:
             try:
-                # 1. Retrieve
-                retrieved_docs = retrieve_documents(user_query, st.session_state.current_collection)
+                started = time.perf_counter()
+                query_embedding = encode_texts([user_query])[0]
+                with tracing.span("answer_cache.lookup") as sp:
+                    cached, cache_version = get_answer_cache().lookup(st.session_state.current_collection, ANSWER_CACHE_SCOPE,
+                                                                      query_embedding, answer_cache_threshold, answer_cache_ttl)
+                    sp.set(hit=cached is not None)
+                # 1. Retrieve (dilewati bila pertanyaan serupa sudah pernah dijawab)
+                retrieved_docs = [] if cached else retrieve_documents(
+                    user_query, st.session_state.current_collection, query_embedding=query_embedding
+                )
                 
-                if retrieved_docs:
+                if cached:
+                    cached_answer, similarity = cached
+                    st.session_state.chat_history.append({"role": "ai", "content": cached_answer, "cached": similarity})
+                elif retrieved_docs:
                     # 2. Augment (Create RAG prompt)
-                    rag_prompt = create_rag_prompt(user_query, retrieved_docs)
+                    rag_prompt, pack_stats = create_rag_prompt(user_query, retrieved_docs)
                     
                     # 3. Generate
-                    ai_response = generate_response(rag_prompt)
+                    timing = {"context_tokens": (pack_stats["tokens_before"], pack_stats["tokens_after"])}
+                    ai_response = generate_response(rag_prompt, timing)
                     
                     if ai_response:
-                        st.session_state.chat_history.append({"role": "ai", "content": ai_response})
+                        get_answer_cache().store(st.session_state.current_collection, ANSWER_CACHE_SCOPE, query_embedding,
+                                                 ai_response, time.perf_counter() - started, cache_version)
+                        st.session_state.chat_history.append({"role": "ai", "content": ai_response, "timing": timing})
                     else:
                         st.session_state.chat_history.append({"role": "ai", "content": "Maaf, saya tidak dapat menghasilkan respons."})
                 else:
@@ -260,9 +405,70 @@ if user_query and st.button("Kirim Pertanyaan"):
             except Exception as e:
                 st.error(f"Terjadi kesalahan saat melakukan RAG: {e}")
                 st.session_state.chat_history.append({"role": "ai", "content": f"Maaf, terjadi kesalahan: {e}"})
+        st.session_state.last_trace = tr
     else:
         st.warning("Harap unggah dan proses PDF atau pilih koleksi yang sudah ada.")
 
+# Tanya-jawab massal: satu query Chroma untuk semua pertanyaan, jawaban LLM konkuren (lihat batchqa.py)
+with st.expander("📋 Tanya-jawab massal dari file pertanyaan"):
+    question_file = st.file_uploader("File pertanyaan (.txt satu per baris, .csv, .jsonl)", type=["txt", "csv", "jsonl"])
+    batch_concurrency = st.slider("Panggilan LLM bersamaan", 1, 32, DEFAULT_CONCURRENCY)
+    batch_rpm = st.number_input("Batas panggilan per menit", 10, 10000, DEFAULT_RPM, step=10)
+    batch_format = st.radio("Format hasil", ["jsonl", "csv"], horizontal=True)
+    if question_file and st.button("Jalankan batch"):
+        if not st.session_state.current_collection:
+            st.warning("Harap unggah dan proses PDF atau pilih koleksi yang sudah ada untuk menjalankan batch.")
+        else:
+            skipped, load_error = [], None
+            try:
+                questions = load_questions(question_file.getvalue(), question_file.name, skipped)
+            except Exception as e:  # mis. CSV rusak
+                questions, load_error = [], e
+            if skipped:
+                st.warning(f"{len(skipped)} baris dilewati:\n\n" + "\n".join(f"- {m}" for m in skipped[:20]))
+            if load_error is not None:
+                st.error(f"File pertanyaan tidak dapat dibaca: {load_error}")
+            else:
+                with st.spinner(f"Menjawab {len(questions)} pertanyaan..."), tracing.trace("batch", force=debug_panel) as tr:
+                    try:
+                        started = time.perf_counter()
+                        collection = get_collection(st.session_state.current_collection)
+                        hits = query_batch(collection, 4, query_embeddings=encode_texts(questions)) if questions else []
+                        retrieval_seconds = time.perf_counter() - started
+                        jobs = []
+                        for i, (q, (_, docs, metadatas)) in enumerate(zip(questions, hits)):
+                            job = {"index": i, "question": q}
+                            if docs:
+                                rag_prompt, _ = create_rag_prompt(q, list(zip(docs, metadatas)))
+                                job["messages"] = [{"role": "system", "content": "Anda adalah asisten yang membantu."},
+                                                   {"role": "user", "content": rag_prompt}]
+                                job["sources"] = sorted({(m or {}).get("source", "?") for m in metadatas})
+                            jobs.append(job)
+                        out_path = default_output_path(st.session_state.current_collection, batch_format)
+                        progress, done = st.progress(0.0), {"n": 0}
+                        with ResultWriter(out_path) as writer:
+                            def on_result(row):
+                                writer.write(row)
+                                done["n"] += 1
+                                progress.progress(done["n"] / len(jobs), text=f"{done['n']}/{len(jobs)} pertanyaan selesai")
+                            rows = asyncio.run(answer_batch(jobs, openai_api_key, "gpt-4o-mini", batch_concurrency, batch_rpm,
+                                                            on_result, temperature=0.7, max_tokens=500))
+                        st.session_state.batch_result = (summarize(rows, time.perf_counter() - started, retrieval_seconds), rows, out_path)
+                    except Exception as e:
+                        st.error(f"Terjadi kesalahan saat menjalankan batch: {e}")
+                st.session_state.last_trace = tr
+    if st.session_state.get("batch_result"):
+        summary, rows, out_path = st.session_state.batch_result
+        st.caption(
+            f"{summary['questions']} pertanyaan ({summary['errors']} gagal) dalam {summary['wall_seconds']} dtk · "
+            f"{summary['questions_per_sec']:.2f} pertanyaan/dtk · retrieval {summary['retrieval_ms']:.0f} ms · "
+            f"latensi p50 {(summary['latency_p50_ms'] or 0) / 1000:.1f} dtk, p95 {(summary['latency_p95_ms'] or 0) / 1000:.1f} dtk"
+        )
+        st.dataframe(rows, use_container_width=True)
+        if os.path.exists(out_path):
+            with open(out_path, "rb") as fh:
+                st.download_button("Unduh hasil", fh.read(), file_name=os.path.basename(out_path))
+
 # Tampilkan riwayat chat
 st.header("Riwayat Chat")
 for chat in st.session_state.chat_history:
@@ -270,6 +476,11 @@ for chat in st.session_state.chat_history:
         st.markdown(f"**Anda:** {chat['content']}")
     else:
         st.markdown(f"**AI:** {chat['content']}")
+        if chat.get("timing"):
+            before, after = chat["timing"].get("context_tokens", (0, 0))
+            st.caption(f"{format_timing(chat['timing'])} · konteks {before} → {after} token")
+        elif chat.get("cached"):
+            st.caption(f"⚡ Dari cache jawaban (kemiripan {chat['cached']:.3f})")
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### Tentang Aplikasi")
@@ -296,3 +507,31 @@ st.sidebar.markdown(
     Menggunakan `all-MiniLM-L6-v2` dari `sentence-transformers` untuk membuat embedding.
     """
 )
+cache_stats = embed_cache.stats()
+st.sidebar.caption(
+    f"Cache embedding: hit rate {cache_stats['hit_rate']:.0%} "
+    f"({cache_stats['hits']} hit / {cache_stats['misses']} miss), {cache_stats['entries']} vektor"
+)
+if "answercache" in sys.modules:  # belum dipakai sama sekali: belum ada statistik
+    answer_stats = get_answer_cache().stats()
+    st.sidebar.caption(
+        f"Cache jawaban: {answer_stats['hits']} hit / {answer_stats['misses']} miss, "
+        f"{answer_stats['entries']} entri, hemat {answer_stats['saved_seconds']:.1f} dtk"
+    )
+
+warmup.mark("script_end")
+
+if debug_panel:
+    last = st.session_state.get("last_trace")
+    if last is not None and last.total is not None:
+        st.sidebar.caption(f"Permintaan terakhir ({last.kind}): {last.total * 1000:.0f} ms")
+        st.sidebar.dataframe(last.rows(), use_container_width=True)
+    else:
+        st.sidebar.caption("Belum ada permintaan yang direkam.")
+    with st.sidebar.expander("Agregat proses"):
+        st.dataframe(tracing.REGISTRY.summary(), use_container_width=True)
+    with st.sidebar.expander("Startup (cold start & warm-up)"):
+        st.dataframe(warmup.report(), use_container_width=True)
+        st.caption("Registry koleksi: " + " · ".join(f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}" for k, v in COLLECTIONS.stats().items()))
+    st.sidebar.download_button("⬇️ Metrik (Prometheus)", tracing.prometheus_text(), file_name="metrics.prom")
+    st.sidebar.download_button("⬇️ Metrik (JSONL)", tracing.metrics_jsonl(), file_name="metrics.jsonl")
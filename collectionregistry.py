@@ -0,0 +1,82 @@
+"""Registry koleksi per proses: handle koleksi dan daftar nama koleksi di-cache antar rerun Streamlit.
+
+Tanpa registry, setiap rerun (tiap ketikan/klik) memanggil `list_collections()` dan setiap aksi
+memanggil `get_collection`/`get_or_create_collection`, yang pada Chroma Cloud berarti beberapa
+round-trip per interaksi. Entri di-invalidate eksplisit saat koleksi dibuat/dihapus dari proses
+ini, dan kedaluwarsa setelah `ttl` detik agar perubahan dari replika lain tetap terlihat.
+"""
+import os
+import time
+import threading
+
+DEFAULT_TTL = float(os.getenv("RAG_COLLECTION_TTL", "30"))
+
+class CollectionRegistry:
+    """Cache (scope, nama) -> handle dan scope -> daftar nama. `scope` membedakan client/backend
+    (mis. "chroma:Chroma Cloud:tenant/db"), sehingga satu registry bisa dipakai beberapa client."""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._handles = {}  # (scope, nama) -> (handle, embedding_function, waktu)
+        self._names = {}    # scope -> (daftar nama, waktu)
+        self._lock = threading.Lock()
+
+    def _fresh(self, fetched):
+        return time.monotonic() - fetched < self.ttl
+
+    def get(self, client, name, embedding_function=None, create=False, scope="", **kwargs):
+        """Handle koleksi dari cache; bila tidak ada/kedaluwarsa diambil dari client (`create=True`
+        memakai get_or_create_collection, `kwargs` mis. metadata ikut diteruskan). Error client
+        (mis. koleksi tidak ada) diteruskan ke pemanggil."""
+        key = (scope, name)
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry and entry[1] is embedding_function and self._fresh(entry[2]):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        if embedding_function is not None: kwargs["embedding_function"] = embedding_function
+        fetch = client.get_or_create_collection if create else client.get_collection
+        handle = fetch(name=name, **kwargs)
+        with self._lock:
+            self._handles[key] = (handle, embedding_function, time.monotonic())
+            names = self._names.get(scope)
+            if create and names and name not in names[0]:
+                self._names.pop(scope)  # koleksi baru: daftar nama perlu diambil ulang
+        return handle
+
+    def names(self, client, scope=""):
+        """Daftar nama koleksi (terurut), di-cache selama `ttl` detik."""
+        with self._lock:
+            entry = self._names.get(scope)
+            if entry and self._fresh(entry[1]):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Chroma < 0.6 mengembalikan objek Collection, versi baru (dan npvector lama) bisa berupa nama
+        names = sorted(c if isinstance(c, str) else c.name for c in client.list_collections())
+        with self._lock:
+            self._names[scope] = (names, time.monotonic())
+        return names
+
+    def delete(self, client, name, scope=""):
+        client.delete_collection(name=name)
+        self.invalidate(scope, name)
+
+    def invalidate(self, scope="", name=None):
+        """Buang handle `name` (atau semua handle di `scope` bila None) beserta daftar nama scope itu."""
+        with self._lock:
+            self._names.pop(scope, None)
+            for key in [k for k in self._handles if k[0] == scope and (name is None or k[1] == name)]:
+                del self._handles[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            handles = len(self._handles)
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "handles": handles}
+
+# Satu registry per proses, dipakai bersama semua sesi Streamlit
+REGISTRY = CollectionRegistry()
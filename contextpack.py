@@ -0,0 +1,89 @@
+"""Pengemasan konteks RAG: gabung chunk bertetangga, buang overlap, dan muat ke anggaran token."""
+from ingest import count_tokens, truncate_tokens
+
+DEFAULT_CONTEXT_TOKENS = 3000
+_MIN_TRUNCATED_TOKENS = 64  # sisa anggaran lebih kecil dari ini tidak layak diisi potongan blok
+# Overlap chunk ingestion maks. 400 karakter (slider), jendela token bisa sedikit melebihinya
+MAX_OVERLAP_CHARS = 1000
+MIN_OVERLAP_CHARS = 20  # kecocokan lebih pendek dianggap kebetulan ("dana" + "adalah"), bukan overlap
+
+def _merge_overlap(left, right, max_overlap=MAX_OVERLAP_CHARS, min_overlap=MIN_OVERLAP_CHARS):
+    """Sambungkan dua chunk berurutan tanpa mengulang bagian yang overlap (suffix kiri == prefix kanan,
+    minimal `min_overlap` karakter); tanpa overlap keduanya dipisah baris baru."""
+    for n in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:n]):
+            return left + right[n:]
+    return left + "\n" + right
+
+def _merge_run(docs):
+    text = docs[0]
+    for doc in docs[1:]:
+        text = _merge_overlap(text, doc)
+    return text
+
+def chunk_label(chunks):
+    if chunks[0] is None: return "?"
+    return f"{chunks[0]}" if len(chunks) == 1 else f"{chunks[0]}–{chunks[-1]}"
+
+def format_block(n, block):
+    return f"[{n}] Source: {block['source']} (chunk {chunk_label(block['chunks'])}) — {block['text'].strip()}"
+
+def pack_context(results, budget_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Kemas hasil retrieval (list (dokumen, metadata) terurut relevansi) menjadi blok konteks.
+
+    Chunk dari sumber yang sama dengan nomor chunk berurutan digabung dan overlap-nya dibuang,
+    chunk duplikat dihapus, lalu blok dimasukkan sesuai peringkat terbaiknya sampai anggaran token
+    habis (blok terakhir dipotong bila perlu). Nomor sitasi [n] mengikuti urutan blok hasil.
+
+    Mengembalikan (blocks, context, stats); tiap blok berisi source, chunks, text, dan tokens; stats
+    berisi tokens_before (konteks verbatim seperti sebelumnya) dan tokens_after.
+    """
+    tokens_before = count_tokens("\n\n".join(
+        f"[{i}] Source: {(m or {}).get('source', '?')} (chunk {(m or {}).get('chunk', '?')}) — {d.strip()}"
+        for i, (d, m) in enumerate(results, start=1)
+    ))
+
+    # Kelompokkan per sumber, simpan peringkat terbaik tiap chunk, buang duplikat persis
+    by_source, seen = {}, set()
+    for rank, (doc, meta) in enumerate(results):
+        meta = meta or {}
+        if doc in seen: continue
+        seen.add(doc)
+        by_source.setdefault(meta.get("source", "?"), []).append((meta.get("chunk"), rank, doc))
+
+    blocks = []
+    for source, items in by_source.items():
+        indexed = sorted((i for i in items if isinstance(i[0], int)), key=lambda i: i[0])
+        runs = []
+        for item in indexed:
+            if runs and item[0] == runs[-1][-1][0] + 1:
+                runs[-1].append(item)
+            else:
+                runs.append([item])
+        runs.extend([i] for i in items if not isinstance(i[0], int))
+        for run in runs:
+            blocks.append({
+                "source": source,
+                "chunks": [i[0] for i in run],
+                "rank": min(i[1] for i in run),
+                "text": _merge_run([i[2] for i in run]),
+            })
+    blocks.sort(key=lambda b: b["rank"])
+
+    packed, used = [], 0
+    for block in blocks:
+        block["tokens"] = count_tokens(format_block(len(packed) + 1, block))
+        remaining = budget_tokens - used
+        if block["tokens"] > remaining:
+            if remaining >= _MIN_TRUNCATED_TOKENS:
+                overhead = block["tokens"] - count_tokens(block["text"].strip())
+                block["text"] = truncate_tokens(block["text"].strip(), max(1, remaining - overhead))
+                block["tokens"] = count_tokens(format_block(len(packed) + 1, block))
+                packed.append(block)
+                used += block["tokens"]
+            break
+        packed.append(block)
+        used += block["tokens"]
+
+    context = "\n\n".join(format_block(n, b) for n, b in enumerate(packed, start=1))
+    return packed, context, {"tokens_before": tokens_before, "tokens_after": count_tokens(context)}
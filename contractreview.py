@@ -0,0 +1,229 @@
+"""Tinjauan kontrak map-reduce: kontrak dipecah per pasal, ditinjau paralel, lalu digabung."""
+import re
+import json
+import time
+import difflib
+import hashlib
+import asyncio
+
+import openai
+
+import tracing
+from ingest import count_tokens, iter_chunks
+
+REVIEW_MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "Anda adalah asisten hukum ahli yang berspesialisasi dalam peninjauan kontrak. Tinjau dokumen berikut secara komprehensif, identifikasi potensi risiko, klausul yang tidak jelas, dan area yang mungkin memerlukan negosiasi lebih lanjut. Berikan ringkasan, poin-poin penting, dan saran dalam format yang jelas dan mudah dibaca."
+MAP_PROMPT = "Anda adalah asisten hukum ahli yang berspesialisasi dalam peninjauan kontrak. Anda menerima SATU BAGIAN dari sebuah kontrak yang lebih panjang. Untuk bagian ini saja, catat secara ringkas: isi pokok tiap pasal, potensi risiko, klausul yang tidak jelas, dan hal yang perlu dinegosiasikan. Selalu sebutkan nomor/judul pasal yang dirujuk. Jangan membuat kesimpulan tentang bagian lain."
+REDUCE_PROMPT = "Anda adalah asisten hukum ahli yang berspesialisasi dalam peninjauan kontrak. Anda menerima temuan per bagian dari satu kontrak yang ditinjau terpisah. Gabungkan menjadi satu tinjauan komprehensif: ringkasan kontrak, poin-poin penting, potensi risiko, klausul yang tidak jelas, dan saran negosiasi. Hilangkan duplikasi, pertahankan rujukan pasal, dan sajikan dalam format yang jelas dan mudah dibaca."
+
+CLAUSE_PROMPT = "Anda adalah asisten hukum ahli yang berspesialisasi dalam peninjauan kontrak. Anda menerima beberapa klausul dari satu kontrak, masing-masing diawali penanda [K<nomor>]. Untuk SETIAP klausul secara terpisah, catat secara ringkas: isi pokok, potensi risiko, klausul yang tidak jelas, dan hal yang perlu dinegosiasikan. Balas HANYA dengan objek JSON yang memetakan penanda ke analisisnya, misalnya {\"K1\": \"...\", \"K2\": \"...\"}."
+AMENDMENT_NOTE = "Bila ada catatan perubahan dari versi sebelumnya, awali tinjauan dengan bagian 'Perubahan dari Versi Sebelumnya' yang membahas pasal yang diubah, ditambah, atau dihapus."
+
+# Versi prompt untuk kunci cache tinjauan: berubah otomatis bila salah satu prompt diubah
+PROMPT_VERSION = hashlib.sha256("\x00".join((SYSTEM_PROMPT, MAP_PROMPT, REDUCE_PROMPT, CLAUSE_PROMPT, AMENDMENT_NOTE))
+                                .encode("utf-8")).hexdigest()[:12]
+CLAUSE_PROMPT_VERSION = hashlib.sha256(CLAUSE_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+# Di atas batas ini (token), mode otomatis memakai map-reduce
+SINGLE_CALL_MAX_TOKENS = 12000
+DEFAULT_SECTION_TOKENS = 4000
+DEFAULT_CONCURRENCY = 4
+CLAUSES_PER_CALL = 12  # klausul yang berubah dikirim berkelompok agar jumlah panggilan tetap kecil
+REDUCE_MAX_TOKENS = 32000  # anggaran input reduce inkremental; klausul tak berubah di luar anggaran hanya judulnya
+
+# Awal pasal/klausul: "Pasal 5", "PASAL V", "Article 3", "BAB II", atau penomoran "1." / "2.1"
+_CLAUSE_HEADING = re.compile(
+    r"^\s*(?:(?:pasal|article|bab|bagian|section|clause)\s+[0-9ivxlcdm]+\b|\d+(?:\.\d+)*[.)]\s+\S)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+def split_clauses(text):
+    """Pecah kontrak pada judul pasal; teks sebelum pasal pertama menjadi klausul pembuka."""
+    starts = [m.start() for m in _CLAUSE_HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    return [text[a:b].strip() for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+def pack_sections(clauses, max_tokens=DEFAULT_SECTION_TOKENS):
+    """Gabungkan klausul berurutan menjadi bagian <= max_tokens tanpa memotong klausul,
+    kecuali satu klausul memang lebih panjang dari anggaran (dipotong per jendela token)."""
+    sections, current, current_tokens = [], [], 0
+    for clause in clauses:
+        n = count_tokens(clause)
+        if n > max_tokens:
+            if current:
+                sections.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            sections.extend(chunk for chunk, _ in iter_chunks(clause, size=max_tokens * 4, overlap=0))
+            continue
+        if current and current_tokens + n > max_tokens:
+            sections.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(clause)
+        current_tokens += n
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+async def _review_section(client, semaphore, model, index, total, section):
+    async with semaphore:
+        started = time.perf_counter()
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": MAP_PROMPT},
+                {"role": "user", "content": f"Bagian {index + 1} dari {total}:\n\n{section}"},
+            ],
+        )
+        usage = getattr(response, "usage", None)
+        tracing.record("llm.map", time.perf_counter() - started, model=model, section=index + 1,
+                       prompt_tokens=getattr(usage, "prompt_tokens", None),
+                       completion_tokens=getattr(usage, "completion_tokens", None))
+    return index, response.choices[0].message.content
+
+async def map_sections(sections, api_key, model=REVIEW_MODEL, concurrency=DEFAULT_CONCURRENCY, on_section=None):
+    """Tinjau semua bagian secara konkuren (maks. `concurrency` panggilan berjalan bersamaan).
+
+    `on_section(index, selesai, total)` dipanggil di thread event loop setiap satu bagian selesai.
+    Mengembalikan temuan dengan urutan sama seperti `sections`.
+    """
+    client = openai.AsyncOpenAI(api_key=api_key)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    findings = [None] * len(sections)
+    tasks = [asyncio.ensure_future(_review_section(client, semaphore, model, i, len(sections), s))
+             for i, s in enumerate(sections)]
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            index, finding = await task
+            findings[index] = finding
+            if on_section: on_section(index, done, len(sections))
+    finally:
+        for task in tasks: task.cancel()  # bila satu bagian gagal, hentikan sisanya
+        await client.close()
+    return findings
+
+def reduce_messages(findings):
+    merged = "\n\n".join(f"### Temuan bagian {i}\n{f}" for i, f in enumerate(findings, start=1))
+    return [
+        {"role": "system", "content": REDUCE_PROMPT},
+        {"role": "user", "content": merged},
+    ]
+
+async def map_contract(contract_text, api_key, model=REVIEW_MODEL, section_tokens=DEFAULT_SECTION_TOKENS,
+                       concurrency=DEFAULT_CONCURRENCY, on_section=None):
+    """Tahap map: pecah kontrak per pasal lalu tinjau tiap bagian. Tahap reduce dijalankan pemanggil
+    dengan `reduce_messages(findings)` (biasanya secara streaming)."""
+    sections = pack_sections(split_clauses(contract_text), section_tokens)
+    return await map_sections(sections, api_key, model, concurrency, on_section)
+
+# ---------------- Tinjauan inkremental per klausul ----------------
+def clause_hash(clause):
+    """Hash klausul yang tidak peka spasi/baris baru (ekstraksi PDF sering menggeser pemenggalan)."""
+    return hashlib.sha256(" ".join(clause.split()).encode("utf-8")).hexdigest()
+
+def clause_label(clause, width=80):
+    line = clause.strip().split("\n", 1)[0].strip()
+    return line if len(line) <= width else line[:width - 1] + "…"
+
+def clause_cache_key(hash_, model=REVIEW_MODEL):
+    return hashlib.sha256(f"{hash_}\x00{model}\x00{CLAUSE_PROMPT_VERSION}".encode("utf-8")).hexdigest()
+
+def diff_clauses(old_hashes, new_hashes):
+    """Bandingkan urutan hash klausul dua versi: indeks (versi baru) yang diubah/ditambah dan
+    indeks (versi lama) yang dihapus."""
+    changed, added, removed = [], [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(a=old_hashes, b=new_hashes, autojunk=False).get_opcodes():
+        if tag == "replace":
+            n = min(i2 - i1, j2 - j1)
+            changed.extend(range(j1, j1 + n))
+            added.extend(range(j1 + n, j2))
+            removed.extend(range(i1 + n, i2))
+        elif tag == "insert":
+            added.extend(range(j1, j2))
+        elif tag == "delete":
+            removed.extend(range(i1, i2))
+    return {"changed": changed, "added": added, "removed": removed}
+
+def group_clauses(items, max_tokens=DEFAULT_SECTION_TOKENS, max_clauses=CLAUSES_PER_CALL):
+    """Kelompokkan (indeks, klausul) berurutan menjadi kelompok <= max_tokens dan <= max_clauses."""
+    groups, current, current_tokens = [], [], 0
+    for idx, clause in items:
+        n = count_tokens(clause)
+        if current and (current_tokens + n > max_tokens or len(current) >= max_clauses):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append((idx, clause))
+        current_tokens += n
+    if current:
+        groups.append(current)
+    return groups
+
+async def _review_clause_group(client, semaphore, model, group):
+    async with semaphore:
+        started = time.perf_counter()
+        response = await client.chat.completions.create(
+            model=model,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": CLAUSE_PROMPT},
+                {"role": "user", "content": "\n\n".join(f"[K{n}] {clause}" for n, (_, clause) in enumerate(group, start=1))},
+            ],
+        )
+        usage = getattr(response, "usage", None)
+        tracing.record("llm.clauses", time.perf_counter() - started, model=model, clauses=len(group),
+                       prompt_tokens=getattr(usage, "prompt_tokens", None),
+                       completion_tokens=getattr(usage, "completion_tokens", None))
+    try:
+        data = json.loads(response.choices[0].message.content or "{}")
+    except ValueError:
+        data = {}
+    # Klausul yang tidak dijawab model tidak disimpan, sehingga dicoba lagi pada tinjauan berikutnya
+    return {idx: str(data[f"K{n}"]).strip() for n, (idx, _) in enumerate(group, start=1) if str(data.get(f"K{n}", "")).strip()}
+
+async def review_clauses(clauses, pending, api_key, model=REVIEW_MODEL, concurrency=DEFAULT_CONCURRENCY,
+                         group_tokens=DEFAULT_SECTION_TOKENS, on_group=None):
+    """Analisis klausul dengan indeks di `pending` (berkelompok, konkuren). `on_group(selesai, total)`
+    dipanggil setiap satu kelompok selesai. Mengembalikan dict indeks -> analisis."""
+    groups = group_clauses([(i, clauses[i]) for i in pending], group_tokens)
+    if not groups: return {}
+    client = openai.AsyncOpenAI(api_key=api_key)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    analyses = {}
+    tasks = [asyncio.ensure_future(_review_clause_group(client, semaphore, model, g)) for g in groups]
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            analyses.update(await task)
+            if on_group: on_group(done, len(groups))
+    finally:
+        for task in tasks: task.cancel()
+        await client.close()
+    return analyses
+
+def incremental_reduce_messages(clauses, analyses, diff=None, removed_labels=(), max_tokens=REDUCE_MAX_TOKENS):
+    """Susun ulang laporan lengkap dari analisis semua klausul (baru maupun dari cache).
+
+    Analisis klausul yang diubah/ditambah selalu disertakan; analisis klausul lain masuk berurutan
+    selama total masih di bawah `max_tokens`, sisanya hanya dicantumkan judulnya."""
+    changed, added = set((diff or {}).get("changed", ())), set((diff or {}).get("added", ()))
+    parts = []
+    if diff is not None:
+        note = f"Catatan perubahan dari versi sebelumnya: {len(changed)} klausul diubah, {len(added)} ditambah, {len(removed_labels)} dihapus."
+        if removed_labels:
+            note += "\nKlausul yang dihapus: " + "; ".join(removed_labels)
+        parts.append(note)
+    headings = [f"### {clause_label(c)}" + (" [DIUBAH]" if i in changed else " [BARU]" if i in added else "")
+                for i, c in enumerate(clauses)]
+    entries = [f"{h}\n{analyses.get(i, '(belum dianalisis)')}" for i, h in enumerate(headings)]
+    budget = max_tokens - sum(count_tokens(p) for p in parts)
+    budget -= sum(count_tokens(entries[i]) for i in range(len(clauses)) if i in changed or i in added)
+    for i, entry in enumerate(entries):
+        if i not in changed and i not in added:
+            if count_tokens(entry) > budget:
+                entry = f"{headings[i]}\n(tidak berubah; analisis dihilangkan karena batas panjang)"
+            budget -= count_tokens(entry)
+        parts.append(entry)
+    return [
+        {"role": "system", "content": f"{REDUCE_PROMPT} {AMENDMENT_NOTE}"},
+        {"role": "user", "content": "\n\n".join(parts)},
+    ]
@@ -0,0 +1,131 @@
+"""Cache embedding on-disk (sqlite + vektor float32 terkemas) yang dipakai bersama semua jalur embedding."""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+import tracing
+
+DEFAULT_PATH = os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "embeddings.sqlite")
+DEFAULT_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+def _key(model_name, text):
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """Cache content-addressed: kunci = sha256(nama model + teks), nilai = float32 terkemas.
+
+    Ukuran dibatasi `max_bytes`; bila terlampaui, entri yang paling lama tidak dipakai dibuang.
+    Aman dipakai dari beberapa thread (satu koneksi sqlite dengan lock).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, model TEXT NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_name, texts):
+        """Mengembalikan list vektor (atau None bila belum ada) dengan urutan sama seperti `texts`."""
+        keys = [_key(model_name, t) for t in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start+500]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._db.executemany("UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k in found])
+                self._db.commit()
+        out = []
+        for k in keys:
+            blob = found.get(k)
+            out.append(array("f", blob).tolist() if blob is not None else None)
+        return out
+
+    def put_many(self, model_name, texts, vectors):
+        now = time.time()
+        with self._lock:
+            for t, v in zip(texts, vectors):
+                blob = array("f", map(float, v)).tobytes()
+                cur = self._db.execute(
+                    "INSERT OR IGNORE INTO embeddings(key, model, vec, last_used) VALUES (?, ?, ?, ?)",
+                    (_key(model_name, t), model_name, blob, now),
+                )
+                self._bytes += len(blob) if cur.rowcount else 0
+            if self._bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self._db.commit()
+
+    def _evict(self, target):
+        # Buang entri yang paling lama tidak dipakai sampai ukuran turun ke `target`
+        while self._bytes > target:
+            rows = self._db.execute("SELECT key, LENGTH(vec) FROM embeddings ORDER BY last_used LIMIT 1000").fetchall()
+            if not rows: break
+            self._db.executemany("DELETE FROM embeddings WHERE key=?", [(k,) for k, _ in rows])
+            self._bytes -= sum(n for _, n in rows)
+
+    def embed(self, model_name, texts, compute):
+        """Ambil dari cache; hanya teks yang belum ada (unik) yang dikirim ke `compute(list_teks)`."""
+        texts = list(texts)
+        vectors = self.get_many(model_name, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        self.hits += len(texts) - sum(v is None for v in vectors)
+        self.misses += len(missing)
+        if missing:
+            computed = [list(map(float, v)) for v in compute(missing)]
+            self.put_many(model_name, missing, computed)
+            by_text = dict(zip(missing, computed))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "bytes": self._bytes,
+        }
+
+class _CachedEmbeddingMixin:
+    """Pembungkus embedding function Chroma (SentenceTransformer/OpenAI) dengan EmbeddingCache."""
+
+    def __init__(self, inner, model_name, cache):
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache
+
+    def __call__(self, input):
+        with tracing.span("embed", model=self.model_name, texts=len(input)):
+            return self.cache.embed(self.model_name, input, self.inner)
+
+def __getattr__(name):
+    # CachedEmbeddingFunction mewarisi EmbeddingFunction Chroma. Kelasnya dibuat saat pertama kali
+    # diakses agar `import embedcache` (EmbeddingCache saja) tidak ikut mengimpor chromadb.
+    if name != "CachedEmbeddingFunction": raise AttributeError(name)
+    try:
+        from chromadb.api.types import EmbeddingFunction as base
+    except Exception: base = object
+    cls = type("CachedEmbeddingFunction", (_CachedEmbeddingMixin, base), {"__module__": __name__})
+    globals()[name] = cls
+    return cls
@@ -0,0 +1,240 @@
+"""Server embedding lokal bersama: satu instance model untuk semua proses Streamlit.
+
+Setiap worker Streamlit sebelumnya memuat salinan all-MiniLM-L6-v2 sendiri dan meng-encode query
+satu per satu. Server ini memegang satu model dan menggabungkan permintaan yang datang bersamaan
+menjadi micro-batch: permintaan pertama menunggu paling lama `max_wait_ms` agar permintaan lain
+ikut dalam satu forward pass (dibatasi `max_batch` teks). Saat sepi (batch sebelumnya hanya satu
+permintaan) tidak ada jeda tunggu, sehingga latensi pengguna tunggal tidak bertambah.
+
+    python embedserver.py --port 8765 --max-batch 64 --max-wait-ms 5
+    RAG_EMBED_SERVER=http://127.0.0.1:8765 streamlit run cobalagi.py
+
+Aplikasi memakai `EmbeddingClient` (lewat chromaconn.make_embedding_function dan loader model
+cobalagi.py) bila RAG_EMBED_SERVER diset; tanpa variabel itu perilaku lama (model di proses
+sendiri) tetap berlaku. Vektor identik dengan SentenceTransformer lokal (tanpa normalisasi),
+sehingga koleksi dan cache embedding yang sudah ada tetap dipakai.
+"""
+import os
+import json
+import time
+import queue
+import socket
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+
+SERVER_URL = os.getenv("RAG_EMBED_SERVER", "")
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_MAX_BATCH = int(os.getenv("EMBED_SERVER_MAX_BATCH", "64"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("EMBED_SERVER_MAX_WAIT_MS", "5"))
+
+class _Pending:
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectors = self.error = None
+        self.queued = time.perf_counter()
+        self.done = threading.Event()
+
+class MicroBatcher:
+    """Antrian permintaan embedding yang diproses satu thread dalam micro-batch.
+
+    `encode(list_teks)` dipanggil dengan gabungan teks (unik) dari semua permintaan yang masuk
+    selama jendela tunggu; hasilnya dibagi kembali ke tiap permintaan sesuai urutan.
+    """
+
+    def __init__(self, encode, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, window=2000):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = self.batches = self.texts = 0
+        self.encode_seconds = 0.0
+        self._last_requests = 0
+        self._latencies = deque(maxlen=window)  # detik per permintaan (antri + encode), jendela terakhir
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._loop, name="embed-batcher", daemon=True).start()
+
+    def submit(self, texts):
+        """Vektor untuk `texts` (memblokir sampai batch-nya selesai). Error encode diteruskan."""
+        if not texts: return []
+        item = _Pending(list(texts))
+        self._queue.put(item)
+        item.done.wait()
+        if item.error is not None: raise item.error
+        return item.vectors
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        n = len(batch[0].texts)
+        # Beban rendah (batch terakhir hanya satu permintaan): jangan menunggu, ambil yang sudah antri saja
+        deadline = time.perf_counter() + (self.max_wait if self._last_requests > 1 else 0.0)
+        while n < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            n += len(item.texts)
+        self._last_requests = len(batch)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            unique = list(dict.fromkeys(t for item in batch for t in item.texts))
+            started = time.perf_counter()
+            try:
+                by_text = dict(zip(unique, [list(map(float, v)) for v in self.encode(unique)]))
+                for item in batch:
+                    item.vectors = [by_text[t] for t in item.texts]
+            except Exception as e:
+                for item in batch: item.error = e
+            seconds = time.perf_counter() - started
+            tracing.record("embed.batch", seconds, requests=len(batch), texts=len(unique))
+            now = time.perf_counter()
+            with self._lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.texts += len(unique)
+                self.encode_seconds += seconds
+                self._latencies.extend(now - item.queued for item in batch)
+            for item in batch: item.done.set()
+
+    def stats(self):
+        with self._lock:
+            ms = sorted(s * 1000 for s in self._latencies)
+            requests, batches, texts, encode_seconds = self.requests, self.batches, self.texts, self.encode_seconds
+        pick = lambda q: ms[min(len(ms) - 1, int(len(ms) * q / 100))] if ms else None
+        return {
+            "requests": requests,
+            "batches": batches,
+            "texts": texts,
+            "mean_batch_texts": texts / batches if batches else 0.0,
+            "encode_seconds": encode_seconds,
+            "p50_ms": pick(50),
+            "p99_ms": pick(99),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+def make_handler(batcher, model_name):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: client memakai ulang koneksi per thread
+
+        def log_message(self, *args): pass
+
+        def setup(self):
+            super().setup()
+            # Header dan body ditulis terpisah; tanpa TCP_NODELAY, Nagle + delayed ACK menambah ~40 ms
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.startswith("/health") or self.path.startswith("/stats"):
+                self._reply(200, {"model": model_name, **batcher.stats()})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.startswith("/embed"):
+                return self._reply(404, {"error": "not found"})
+            try:
+                texts = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}").get("texts")
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    return self._reply(400, {"error": "'texts' harus berupa list string"})
+                self._reply(200, {"model": model_name, "embeddings": batcher.submit(texts)})
+            except ValueError as e:
+                self._reply(400, {"error": str(e)})
+            except Exception as e:
+                self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+    return Handler
+
+def serve(encode, model_name=DEFAULT_MODEL, host="127.0.0.1", port=8765, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    """Buat server (belum dijalankan) di atas `encode(list_teks)`; port 0 = port bebas acak.
+    Batcher tersedia sebagai `server.batcher`."""
+    batcher = MicroBatcher(encode, max_batch, max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, model_name))
+    server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+class EmbeddingClient:
+    """Client embedserver. Bisa dipakai sebagai embedding function Chroma (`client(texts)`) maupun
+    pengganti SentenceTransformer (`client.encode(texts)` -> numpy array). Satu sesi HTTP per thread."""
+
+    def __init__(self, url=None, timeout=30.0):
+        self.url = (url or SERVER_URL).rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def health(self):
+        r = self._session().get(f"{self.url}/health", timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def embed(self, texts):
+        texts = list(texts)
+        if not texts: return []
+        r = self._session().post(f"{self.url}/embed", json={"texts": texts}, timeout=self.timeout)
+        if r.status_code != 200:
+            raise RuntimeError(f"embedserver {r.status_code}: {r.text[:200]}")
+        return r.json()["embeddings"]
+
+    def __call__(self, input):
+        return self.embed(input)
+
+    def encode(self, texts):
+        import numpy as np
+        return np.asarray(self.embed(texts), dtype=np.float32)
+
+def connect(expected_model=DEFAULT_MODEL, url=None):
+    """EmbeddingClient yang sudah dicek: server hidup dan memuat model yang sama dengan aplikasi."""
+    client = EmbeddingClient(url)
+    model = client.health().get("model")
+    if model != expected_model:
+        raise ValueError(f"embedserver di {client.url} memuat '{model}', aplikasi butuh '{expected_model}'")
+    return client
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Server embedding lokal dengan micro-batching.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--model", default=DEFAULT_MODEL)
+    p.add_argument("--backend", choices=["torch", "onnx"], default="torch", help="onnx = int8 via onnxembed.py")
+    p.add_argument("--device", default=None, help="cpu / cuda (default: pilihan sentence-transformers)")
+    p.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Batas teks per forward pass")
+    p.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="Jeda maks menunggu permintaan lain")
+    args = p.parse_args()
+    if args.backend == "onnx":
+        import onnxembed
+        encode = onnxembed.load().encode
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model, device=args.device)
+        encode = lambda texts: model.encode(texts, batch_size=max(len(texts), 1))
+    server = serve(encode, args.model, args.host, args.port, args.max_batch, args.max_wait_ms)
+    print(f"embedserver ({args.model}) mendengarkan di http://{args.host}:{args.port} "
+          f"(max_batch={args.max_batch}, max_wait={args.max_wait_ms} ms)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,512 @@
+"""Helper ingestion dokumen (ekstraksi, chunking, batching) tanpa dependensi Streamlit."""
+import io
+import os
+import json
+import shutil
+import tempfile
+import time
+import hashlib
+import functools
+import queue
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import docx
+except Exception: docx = None
+try:
+    import PyPDF2
+except Exception: PyPDF2 = None
+
+import tracing
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+# Batas memori: upload di atas SPOOL_MAX_BYTES ditulis ke file sementara, dan satu batch
+# embedding/add tidak melebihi MAX_BATCH_CHARS karakter.
+SPOOL_MAX_BYTES = int(os.getenv("INGEST_SPOOL_MB", "16")) * 1024 * 1024
+MAX_BATCH_CHARS = int(os.getenv("INGEST_MAX_BATCH_CHARS", "2000000"))
+# Chunk satu sumber yang sedang diproses disimpan di memori sampai batas ini, selebihnya di file sementara
+CHUNK_SPOOL_BYTES = int(os.getenv("INGEST_CHUNK_SPOOL_MB", "16")) * 1024 * 1024
+_STREAM_GUARD_TOKENS = 16  # token terakhir buffer bisa berubah saat teks berikutnya datang
+_PIECE_CHARS = 1 << 16
+
+# ---------------- Ekstraksi & Chunking ----------------
+@functools.lru_cache(maxsize=None)
+def get_encoder(name="cl100k_base"):
+    """Encoder tiktoken dibuat sekali per proses lalu dipakai ulang; None bila tiktoken tidak ada.
+    tiktoken baru diimpor saat pertama kali dibutuhkan, bukan saat modul ini diimpor."""
+    try:
+        import tiktoken
+    except Exception:
+        return None
+    return tiktoken.get_encoding(name)
+
+def count_tokens(text):
+    """Jumlah token cl100k_base (perkiraan ±4 karakter per token bila tiktoken tidak ada)."""
+    enc = get_encoder()
+    if enc is None: return max(1, len(text) // 4) if text else 0
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_tokens(text, max_tokens):
+    """Potong teks ke paling banyak `max_tokens` token."""
+    enc = get_encoder()
+    if enc is None: return text[:max_tokens * 4]
+    toks = enc.encode(text, disallowed_special=())
+    return text if len(toks) <= max_tokens else enc.decode(toks[:max_tokens])
+
+def iter_chunks(text, size=900, overlap=150):
+    """Generator (chunk, jumlah_token) dengan jendela berbasis token.
+
+    Teks di-encode sekali; batas jendela dipetakan ke offset karakter sehingga chunk diambil
+    dengan slicing teks, tanpa `decode` per jendela. Tanpa tiktoken, jatuh ke slicing karakter
+    dan jumlah token diperkirakan (±4 karakter per token).
+    """
+    if not text: return
+    enc = get_encoder()
+    if enc is None:
+        i = 0
+        while i < len(text):
+            chunk = text[i:i+size]
+            yield chunk, max(1, len(chunk) // 4)
+            if i + size >= len(text): break
+            i += max(1, size - overlap)
+        return
+    toks = enc.encode(text, disallowed_special=())
+    decoded, offsets = enc.decode_with_offsets(toks)
+    n, tok_size, tok_overlap = len(toks), max(50, size // 4), max(0, overlap // 4)
+    step = max(1, tok_size - tok_overlap)
+    for i in range(0, n, step):
+        j = min(i + tok_size, n)
+        yield decoded[offsets[i]:offsets[j] if j < n else len(decoded)], j - i
+        if j == n: break
+
+def iter_chunks_stream(pieces, size=900, overlap=150):
+    """Seperti `iter_chunks`, tetapi menerima potongan teks (mis. per halaman) secara bertahap.
+
+    Hanya sisa jendela yang belum lengkap yang disimpan, sehingga memori dibatasi oleh ukuran
+    potongan terbesar, bukan ukuran dokumen.
+    """
+    enc = get_encoder()
+    if enc is None:
+        pending, step = "", max(1, size - overlap)
+        for piece in pieces:
+            pending += piece
+            while len(pending) >= size + step:
+                yield pending[:size], max(1, size // 4)
+                pending = pending[step:]
+        yield from iter_chunks(pending, size=size, overlap=overlap)
+        return
+    tok_size, tok_overlap = max(50, size // 4), max(0, overlap // 4)
+    step = max(1, tok_size - tok_overlap)
+    pending = ""
+    for piece in pieces:
+        pending += piece
+        toks = enc.encode(pending, disallowed_special=())
+        if len(toks) < tok_size + _STREAM_GUARD_TOKENS: continue
+        decoded, offsets = enc.decode_with_offsets(toks)
+        i = 0
+        while i + tok_size <= len(toks) - _STREAM_GUARD_TOKENS:
+            yield decoded[offsets[i]:offsets[i+tok_size]], tok_size
+            i += step
+        pending = decoded[offsets[i]:]
+    yield from iter_chunks(pending, size=size, overlap=overlap)
+
+def chunk_text(text, size=900, overlap=150):
+    return [chunk for chunk, _ in iter_chunks(text, size=size, overlap=overlap)]
+
+def chunk_throughput(text, size=900, overlap=150, repeat=3):
+    """Ukur throughput chunker (MB/s, diambil putaran tercepat) untuk satu dokumen."""
+    best, n_chunks = float("inf"), 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        n_chunks = sum(1 for _ in iter_chunks(text, size=size, overlap=overlap))
+        best = min(best, time.perf_counter() - started)
+    mb = len(text.encode("utf-8")) / 1e6
+    return {"mb": mb, "chunks": n_chunks, "seconds": best, "mb_per_sec": mb / best if best > 0 else 0.0}
+
+def read_bytes(name, data) -> str:
+    name = name.lower()
+    if name.endswith((".txt", ".md")): return data.decode("utf-8", errors="ignore")
+    if name.endswith(".pdf"):
+        if PyPDF2 is None: raise RuntimeError("PyPDF2 belum terpasang.")
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        return "\n\n".join([p.extract_text() or "" for p in reader.pages])
+    if name.endswith(".docx"):
+        if docx is None: raise RuntimeError("python-docx belum terpasang.")
+        return "\n".join([p.text for p in docx.Document(io.BytesIO(data)).paragraphs])
+    return data.decode("utf-8", errors="ignore")
+
+def read_file(uploaded_file) -> str:
+    return read_bytes(uploaded_file.name, uploaded_file.read())
+
+def iter_file_text(path, name=None):
+    """Generator potongan teks dari file di disk: per halaman (PDF), per kelompok paragraf (DOCX),
+    atau per blok (teks). Hasil yang digabung sama dengan `read_bytes`."""
+    name = (name or path).lower()
+    if name.endswith(".pdf"):
+        if PyPDF2 is None: raise RuntimeError("PyPDF2 belum terpasang.")
+        with open(path, "rb") as fh:
+            for i, page in enumerate(PyPDF2.PdfReader(fh).pages):
+                yield ("\n\n" if i else "") + (page.extract_text() or "")
+        return
+    if name.endswith(".docx"):
+        if docx is None: raise RuntimeError("python-docx belum terpasang.")
+        buf = []
+        for i, p in enumerate(docx.Document(path).paragraphs):
+            buf.append(("\n" if i else "") + p.text)
+            if sum(map(len, buf)) >= _PIECE_CHARS:
+                yield "".join(buf)
+                buf = []
+        if buf: yield "".join(buf)
+        return
+    with open(path, encoding="utf-8", errors="ignore") as fh:
+        while True:
+            block = fh.read(_PIECE_CHARS)
+            if not block: return
+            yield block
+
+def spool_upload(fileobj, suffix="", dir=None):
+    """Salin upload ke file sementara per blok dan kembalikan path-nya (pemanggil yang menghapus).
+
+    Worker membaca dari disk sehingga isi file tidak disalin ulang lewat pickle ke tiap proses.
+    """
+    fileobj.seek(0)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1 << 20)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def spool_in_memory(fileobj, max_memory=SPOOL_MAX_BYTES):
+    """File-like yang tetap di memori bila kecil dan tumpah ke disk di atas `max_memory`."""
+    fileobj.seek(0)
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    shutil.copyfileobj(fileobj, spooled, 1 << 20)
+    spooled.seek(0)
+    return spooled
+
+def file_digest(path):
+    h, n = hashlib.sha256(), 0
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+            n += len(block)
+    return n, h.hexdigest()
+
+def _timed_pieces(pieces, spent):
+    # Akumulasi waktu yang dihabiskan di dalam generator ekstraksi (terpisah dari chunking)
+    pieces = iter(pieces)
+    while True:
+        started = time.perf_counter()
+        try:
+            piece = next(pieces)
+        except StopIteration:
+            spent[0] += time.perf_counter() - started
+            return
+        spent[0] += time.perf_counter() - started
+        yield piece
+
+class ChunkSpool:
+    """Daftar (chunk, jumlah_token) satu sumber: di memori sampai `max_bytes` karakter, selebihnya
+    ditumpahkan ke file JSON lines sementara. Bisa di-pickle (dari worker hanya path yang dikirim
+    ke proses induk bila sudah tumpah) dan diiterasi ulang; `discard()` menghapus file sementaranya."""
+
+    def __init__(self, max_bytes=CHUNK_SPOOL_BYTES):
+        self.max_bytes = max_bytes
+        self.chunks, self.path, self.count = [], None, 0
+        self._chars, self._fh = 0, None
+
+    def append(self, chunk, n_tokens):
+        self.count += 1
+        if self._fh is None:
+            self.chunks.append((chunk, n_tokens))
+            self._chars += len(chunk)
+            if self._chars <= self.max_bytes: return
+            fd, self.path = tempfile.mkstemp(prefix="rag-chunks-", suffix=".jsonl")
+            self._fh = os.fdopen(fd, "w", encoding="utf-8")
+            pending, self.chunks = self.chunks, []
+        else:
+            pending = [(chunk, n_tokens)]
+        for item in pending:
+            self._fh.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def discard(self):
+        self.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __getstate__(self):
+        self.close()
+        return dict(self.__dict__, _fh=None)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        if self.path is None:
+            yield from self.chunks
+            return
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                chunk, n_tokens = json.loads(line)
+                yield chunk, n_tokens
+
+def extract_and_chunk(name, path, size=900, overlap=150, max_chunk_bytes=CHUNK_SPOOL_BYTES):
+    """Dijalankan di proses worker: baca file per halaman dan pecah menjadi (chunk, jumlah_token).
+
+    Mengembalikan (chunks, info): chunks berupa ChunkSpool (di memori paling banyak
+    `max_chunk_bytes` karakter, sisanya di file sementara), info berisi ukuran byte, hash konten
+    file, serta durasi ekstraksi (read_seconds) dan chunking (chunk_seconds) untuk tracing.
+    """
+    nbytes, content_hash = file_digest(path)
+    started, read = time.perf_counter(), [0.0]
+    chunks = ChunkSpool(max_chunk_bytes)
+    try:
+        for chunk, n_tokens in iter_chunks_stream(_timed_pieces(iter_file_text(path, name), read), size=size, overlap=overlap):
+            chunks.append(chunk, n_tokens)
+    except BaseException:
+        chunks.discard()
+        raise
+    chunks.close()
+    total = time.perf_counter() - started
+    return chunks, {"bytes": nbytes, "content_hash": content_hash,
+                    "read_seconds": read[0], "chunk_seconds": total - read[0]}
+
+def chunk_id(source, text):
+    """ID deterministik dari sumber + hash konten chunk, sehingga upload ulang tidak menduplikasi."""
+    return hashlib.sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+# ---------------- Tahap penulisan (embedding + collection.add) ----------------
+class BatchWriter(threading.Thread):
+    """Mengumpulkan chunk dari banyak file ke batch berukuran terbatas lalu memanggil collection.add.
+
+    Berjalan di thread terpisah agar embedding dan round-trip jaringan tumpang tindih
+    dengan ekstraksi di process pool. Tidak boleh memanggil API Streamlit.
+
+    Setiap sumber disinkronkan secara inkremental: chunk yang ID-nya sudah ada dilewati
+    (tidak di-embed ulang), dan chunk lama yang hilang dari versi baru dihapus setelah
+    chunk barunya berhasil ditulis. `on_source(source, info)` dipanggil (dari thread writer)
+    setelah semua perubahan untuk satu sumber tersimpan, mis. untuk memperbarui katalog.
+    `mirrors` adalah indeks lokal dengan antarmuka add/update/delete seperti koleksi (mis.
+    BM25Index.for_collection) yang menerima perubahan yang sama setelah Chroma berhasil ditulis.
+    Sumber yang salah satu batch-nya gagal masuk `failed_sources`: chunk lamanya tidak dihapus dan
+    `on_source` tidak dipanggil, sehingga versi lama tetap utuh dan sumber bisa diproses ulang.
+    """
+    _DONE = object()
+
+    def __init__(self, collection, batch_size=DEFAULT_BATCH_SIZE, max_batch_chars=MAX_BATCH_CHARS, max_pending=8,
+                 on_source=None, mirrors=()):
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.on_source = on_source
+        self.mirrors = list(mirrors)
+        self.batch_size = max(1, batch_size)
+        self.max_batch_chars = max_batch_chars
+        self.inbox = queue.Queue(maxsize=max_pending)
+        self.added = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.batches = 0
+        self.tokens = 0  # token embedding dari chunk yang benar-benar ditambahkan
+        self.errors = []  # (sources, pesan error)
+        self.failed_sources = set()
+        self._docs, self._ids, self._metas, self._chars = [], [], [], 0
+        self._deletes = []  # (source, ids chunk lama)
+        self._moves = []    # (source, ids, metadata baru) untuk chunk yang hanya berpindah posisi
+        self._done_sources = []
+        self._context = contextvars.copy_context()  # span di thread writer ikut trace pemanggil
+
+    def submit(self, source, chunks, info=None):
+        self.inbox.put((source, chunks, info or {}))
+
+    def close(self):
+        self.inbox.put(self._DONE)
+        self.join()
+
+    def run(self):
+        self._context.run(self._run)
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is self._DONE:
+                self._flush()
+                return
+            source, chunks, info = item
+            try:
+                self._write_source(source, chunks, info)
+            except Exception as e:
+                self._fail([source], e)
+            finally:
+                if isinstance(chunks, ChunkSpool): chunks.discard()
+
+    def _write_source(self, source, chunks, info):
+        with tracing.span("collection.get", source=source):
+            existing = self.collection.get(where={"source": source}, include=["metadatas"])
+        existing_chunk = {i: (m or {}).get("chunk") for i, m in zip(existing["ids"], existing["metadatas"] or [])}
+        seen, moved = set(), {}
+        for i, (chunk, n_tokens) in enumerate(chunks):
+            cid = chunk_id(source, chunk)
+            if cid in seen: continue  # chunk identik dalam satu sumber cukup disimpan sekali
+            seen.add(cid)
+            if cid in existing_chunk:
+                self.skipped += 1
+                if existing_chunk[cid] != i: moved[cid] = {"source": source, "chunk": i, "tokens": n_tokens}
+                continue
+            self._docs.append(chunk)
+            self._ids.append(cid)
+            self._metas.append({"source": source, "chunk": i, "tokens": n_tokens})
+            self._chars += len(chunk)
+            if len(self._docs) >= self.batch_size or self._chars >= self.max_batch_chars:
+                self._flush()
+        # Hanya metadata yang berubah (posisi chunk), tidak perlu embedding ulang; ditulis bersama
+        # penghapusan chunk lama, setelah chunk baru sumber ini tersimpan
+        if moved: self._moves.append((source, list(moved), list(moved.values())))
+        stale = [i for i in existing_chunk if i not in seen]
+        if stale: self._deletes.append((source, stale))
+        self._done_sources.append((source, dict(info, chunks=len(seen))))
+
+    def _fail(self, sources, error):
+        self.errors.append((sorted(sources), str(error)))
+        self.failed_sources.update(sources)
+
+    def _flush(self):
+        if not self._docs and not self._deletes and not self._moves and not self._done_sources: return
+        docs, ids, metas, deletes, moves = self._docs, self._ids, self._metas, self._deletes, self._moves
+        done_sources = self._done_sources
+        self._docs, self._ids, self._metas, self._chars = [], [], [], 0
+        self._deletes, self._moves, self._done_sources = [], [], []
+        if docs:
+            try:
+                with tracing.span("collection.add", chunks=len(docs)):
+                    self.collection.add(documents=docs, ids=ids, metadatas=metas)
+                self.added += len(docs)
+                self.tokens += sum(m["tokens"] for m in metas)
+                self.batches += 1
+                for mirror in self.mirrors:
+                    mirror.add(ids=ids, documents=docs, metadatas=metas)
+            except Exception as e:
+                self._fail({m["source"] for m in metas}, e)
+        # Metadata dipindah dan chunk lama dihapus hanya bila semua chunk baru sumber itu berhasil ditulis
+        for source, move_ids, move_metas in moves:
+            if source in self.failed_sources: continue
+            try:
+                self.collection.update(ids=move_ids, metadatas=move_metas)
+                for mirror in self.mirrors:
+                    mirror.update(ids=move_ids, metadatas=move_metas)
+            except Exception as e:
+                self._fail([source], e)
+        deletes = [(source, stale) for source, stale in deletes if source not in self.failed_sources]
+        stale_ids = [i for _, stale in deletes for i in stale]
+        if stale_ids:
+            try:
+                with tracing.span("collection.delete", chunks=len(stale_ids)):
+                    self.collection.delete(ids=stale_ids)
+                self.deleted += len(stale_ids)
+                for mirror in self.mirrors:
+                    mirror.delete(ids=stale_ids)
+            except Exception as e:
+                self._fail({source for source, _ in deletes}, e)
+        if self.on_source:
+            for source, info in done_sources:
+                if source in self.failed_sources: continue
+                try:
+                    self.on_source(source, info)
+                except Exception as e:
+                    self._fail([source], e)
+
+# ---------------- Pipeline ----------------
+def run_pipeline(files, collection, size=900, overlap=150, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, on_file=None, on_source=None, mirrors=(), max_chunk_bytes=CHUNK_SPOOL_BYTES):
+    """Ekstraksi + chunking paralel (process pool), lalu batch ke collection.add di thread writer.
+
+    `files` berisi pasangan (nama, path file di disk, lihat `spool_upload`). `on_file(nama, jumlah_chunk, error)` dipanggil dari
+    thread pemanggil setiap kali satu file selesai diekstrak, sehingga aman untuk memperbarui UI.
+    `on_source(nama, info)` dan `mirrors` diteruskan ke BatchWriter; `info` berisi chunks, bytes,
+    dan content_hash. Chunk tiap sumber yang sedang diproses dibatasi `max_chunk_bytes` karakter di
+    memori (sisanya lewat file sementara, lihat ChunkSpool), sehingga puncak memori tidak mengikuti
+    ukuran dokumen.
+    Mengembalikan dict statistik (files, chunks, tokens, skipped, deleted, batches, seconds, chunks_per_sec,
+    tokens_per_sec) plus daftar
+    `errors` (gagal ekstraksi, per file), `write_errors` (gagal collection.add, per batch), dan
+    `failed_sources` (sumber yang tidak tersimpan utuh; versi lamanya dibiarkan).
+    """
+    files = list(files)
+    started = time.perf_counter()
+    writer = BatchWriter(collection, batch_size=batch_size, on_source=on_source, mirrors=mirrors)
+    writer.start()
+    extracted, failed = 0, []
+
+    def handle(name, result, error):
+        nonlocal extracted
+        chunks, info = result or (None, None)
+        if info:
+            tracing.record("read_file", info["read_seconds"], file=name)
+            tracing.record("chunk_text", info["chunk_seconds"], file=name, chunks=len(chunks))
+        if error is None and chunks:
+            writer.submit(name, chunks, info)
+            extracted += len(chunks)
+        elif chunks is not None:
+            chunks.discard()
+        if error is not None:
+            failed.append((name, str(error)))
+        if on_file: on_file(name, len(chunks or []), error)
+
+    try:
+        if workers > 1 and len(files) > 1:
+            # spawn: fork dari proses Streamlit yang multi-thread rawan deadlock
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(files)), mp_context=ctx) as pool:
+                futures = {pool.submit(extract_and_chunk, name, path, size, overlap, max_chunk_bytes): name for name, path in files}
+                for fut in as_completed(futures):
+                    try:
+                        handle(futures[fut], fut.result(), None)
+                    except Exception as e:
+                        handle(futures[fut], None, e)
+        else:
+            for name, path in files:
+                try:
+                    handle(name, extract_and_chunk(name, path, size, overlap, max_chunk_bytes), None)
+                except Exception as e:
+                    handle(name, None, e)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "files": len(files),
+        "chunks": writer.added,
+        "tokens": writer.tokens,
+        "extracted": extracted,
+        "skipped": writer.skipped,
+        "deleted": writer.deleted,
+        "batches": writer.batches,
+        "seconds": elapsed,
+        "chunks_per_sec": writer.added / elapsed if elapsed > 0 else 0.0,
+        "tokens_per_sec": writer.tokens / elapsed if elapsed > 0 else 0.0,
+        "errors": failed,
+        "write_errors": [(", ".join(srcs), msg) for srcs, msg in writer.errors],
+        "failed_sources": sorted(writer.failed_sources),
+    }
+
+if __name__ == "__main__":
+    # Ukur throughput chunker: python ingest.py file1.pdf file2.txt ...
+    import sys
+    for path in sys.argv[1:]:
+        r = chunk_throughput("".join(iter_file_text(path)))
+        print(f"{path}: {r['mb']:.2f} MB -> {r['chunks']} chunks dalam {r['seconds']:.3f} dtk ({r['mb_per_sec']:.1f} MB/s)")
@@ -0,0 +1,44 @@
+"""Streaming chat completion OpenAI dengan pencatatan time-to-first-token dan durasi total."""
+import time
+
+import tracing
+
+def stream_chat(create, stats, **kwargs):
+    """Generator potongan teks dari `create(stream=True, **kwargs)` (mis. client.chat.completions.create).
+
+    `stats` (dict) diisi: ttft, total (detik), usage (bila dikirim server) dan cancelled, lalu
+    dicatat sebagai span `llm.chat` bila tracing aktif. Bila konsumen berhenti di tengah jalan
+    (mis. Streamlit rerun saat pengguna mengklik tombol lain), generator ditutup dan koneksi HTTP
+    ke OpenAI ikut ditutup sehingga token tidak terus ditagih.
+    """
+    started = time.perf_counter()
+    stats.update(ttft=None, total=None, usage=None, cancelled=False)
+    stream = create(stream=True, stream_options={"include_usage": True}, **kwargs)
+    completed = False
+    try:
+        for event in stream:
+            if getattr(event, "usage", None):
+                stats["usage"] = {"prompt_tokens": event.usage.prompt_tokens, "completion_tokens": event.usage.completion_tokens}
+            if not event.choices: continue
+            delta = event.choices[0].delta.content
+            if delta:
+                if stats["ttft"] is None: stats["ttft"] = time.perf_counter() - started
+                yield delta
+        completed = True
+    finally:
+        stats["total"] = time.perf_counter() - started
+        stats["cancelled"] = not completed
+        stream.close()
+        usage = stats["usage"] or {}
+        tracing.record("llm.chat", stats["total"], model=kwargs.get("model"),
+                       ttft_ms=round(stats["ttft"] * 1000, 1) if stats["ttft"] is not None else None,
+                       prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"),
+                       cancelled=stats["cancelled"])
+
+def format_timing(stats):
+    if not stats or stats.get("total") is None: return ""
+    ttft = f"{stats['ttft']:.2f} dtk" if stats.get("ttft") is not None else "-"
+    text = f"⏱️ Token pertama {ttft} · total {stats['total']:.2f} dtk"
+    if stats.get("usage"):
+        text += f" · {stats['usage']['prompt_tokens']} token prompt / {stats['usage']['completion_tokens']} token jawaban"
+    return text
@@ -0,0 +1,215 @@
+"""Outbox tahan lama (sqlite) untuk webhook n8n: keputusan disimpan dulu, lalu dikirim worker latar.
+
+Klik Setujui/Tolak hanya menulis satu baris ke sqlite sehingga UI tidak menunggu n8n. Worker
+memakai satu requests.Session (koneksi keep-alive dipakai ulang) dengan timeout, mengirim semua
+item yang jatuh tempo sekaligus per putaran, dan mengulang kegagalan dengan backoff eksponensial.
+Beberapa proses boleh berbagi satu file: item diklaim secara atomik (UPDATE bersyarat status) dan
+klaim berlaku selama `lease` detik; item 'sending' yang lease-nya habis (proses pengirim mati)
+dikembalikan ke antrean oleh proses mana pun.
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+DEFAULT_PATH = os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "n8n_outbox.sqlite")
+DEFAULT_TIMEOUT = (3.05, 15)  # (connect, read) detik
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BATCH_SIZE = 20
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+
+def backoff_delay(attempts, base=1.0, cap=300.0):
+    """Jeda sebelum percobaan berikutnya: eksponensial dengan jitter, dibatasi `cap` detik."""
+    return min(cap, base * 2 ** max(0, attempts - 1)) * random.uniform(0.5, 1.0)
+
+class WebhookOutbox:
+    """Antrean webhook di sqlite plus satu thread pengirim.
+
+    `batch_payloads=True` mengirim semua item jatuh tempo untuk URL yang sama sebagai satu POST
+    berisi array JSON (workflow n8n harus siap menerima array); bawaannya setiap keputusan tetap
+    dikirim sebagai POST tersendiri, tetapi lewat koneksi keep-alive yang sama dalam satu putaran.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 batch_size=DEFAULT_BATCH_SIZE, batch_payloads=False, base_delay=1.0, max_delay=300.0, lease=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.batch_payloads = batch_payloads
+        self.base_delay, self.max_delay = base_delay, max_delay
+        # Lease klaim: cukup untuk satu putaran terburuk (semua item batch kena timeout)
+        self.lease = lease if lease is not None else sum(timeout) * batch_size + 60
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, webhook_url TEXT NOT NULL,"
+            " payload TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL, sent_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, next_attempt)")
+        if "claimed_at" not in {r[1] for r in self._db.execute("PRAGMA table_info(outbox)")}:
+            self._db.execute("ALTER TABLE outbox ADD COLUMN claimed_at REAL")
+        self._db.commit()
+        self._requeue_expired()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # ---------------- API untuk UI ----------------
+    def enqueue(self, webhook_url, payload):
+        """Simpan satu keputusan (tahan lama) dan bangunkan worker; mengembalikan ID outbox."""
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO outbox(webhook_url, payload, status, next_attempt, created_at) VALUES (?, ?, ?, ?, ?)",
+                (webhook_url, json.dumps(payload, ensure_ascii=False), PENDING, now, now),
+            )
+            self._db.commit()
+        self._wake.set()
+        return cur.lastrowid
+
+    def status(self, ids):
+        """Status pengiriman per ID: dict id -> {status, attempts, last_error, next_attempt, sent_at}."""
+        ids = list(ids)
+        if not ids: return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, status, attempts, last_error, next_attempt, sent_at FROM outbox WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        return {r[0]: {"status": r[1], "attempts": r[2], "last_error": r[3], "next_attempt": r[4], "sent_at": r[5]} for r in rows}
+
+    def retry(self, outbox_id):
+        """Antrekan ulang item yang gagal permanen (mis. setelah URL webhook diperbaiki)."""
+        with self._lock:
+            self._db.execute("UPDATE outbox SET status=?, attempts=0, next_attempt=? WHERE id=? AND status=?",
+                             (PENDING, time.time(), outbox_id, FAILED))
+            self._db.commit()
+        self._wake.set()
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    # ---------------- Worker ----------------
+    def start(self):
+        """Jalankan thread pengirim (idempoten)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="n8n-outbox", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None: self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delivered = self.deliver_due()
+            except Exception:
+                delivered = 0  # sqlite/jaringan tak terduga: coba lagi di putaran berikutnya
+            if delivered: continue  # mungkin masih ada item jatuh tempo lain
+            self._wake.wait(self._seconds_until_next_due())
+            self._wake.clear()
+
+    def _seconds_until_next_due(self):
+        with self._lock:
+            row = self._db.execute("SELECT MIN(next_attempt) FROM outbox WHERE status=?", (PENDING,)).fetchone()
+        if not row or row[0] is None: return 60.0
+        return min(60.0, max(0.05, row[0] - time.time()))
+
+    def _requeue_expired(self):
+        """Item 'sending' yang lease-nya habis (pengirimnya mati) dikembalikan ke antrean."""
+        with self._lock:
+            self._db.execute("UPDATE outbox SET status=? WHERE status=? AND (claimed_at IS NULL OR claimed_at<?)",
+                             (PENDING, SENDING, time.time() - self.lease))
+            self._db.commit()
+
+    def _claim_due(self):
+        self._requeue_expired()
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, webhook_url, payload, attempts FROM outbox WHERE status=? AND next_attempt<=? ORDER BY id LIMIT ?",
+                (PENDING, now, self.batch_size),
+            ).fetchall()
+            # Klaim bersyarat: proses lain yang memilih baris yang sama mendapat rowcount 0
+            claimed = [r for r in rows if self._db.execute(
+                "UPDATE outbox SET status=?, claimed_at=? WHERE id=? AND status=?", (SENDING, now, r[0], PENDING)).rowcount]
+            self._db.commit()
+        return claimed
+
+    def deliver_due(self):
+        """Kirim semua item jatuh tempo (satu putaran); mengembalikan jumlah item yang diproses."""
+        rows = self._claim_due()
+        if not rows: return 0
+        by_url = {}
+        for row in rows:
+            by_url.setdefault(row[1], []).append(row)
+        for url, items in by_url.items():
+            if self.batch_payloads:
+                self._post(url, items)
+            else:
+                for item in items:
+                    self._post(url, [item])
+        return len(rows)
+
+    def _post(self, url, items):
+        ids = [r[0] for r in items]
+        retry_after, error = None, None
+        try:
+            body = [json.loads(r[2]) for r in items] if self.batch_payloads else json.loads(items[0][2])
+            with tracing.span("n8n.webhook", items=len(items)):
+                response = self.session.post(url, json=body, timeout=self.timeout,
+                                             headers={"X-Delivery-Id": ",".join(f"outbox-{i}" for i in ids)})
+            if response.ok:
+                self._mark_sent(ids)
+                return
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code == 429 and response.headers.get("Retry-After", "").isdigit():
+                retry_after = float(response.headers["Retry-After"])
+            permanent = 400 <= response.status_code < 500 and response.status_code not in (408, 409, 425, 429)
+        except requests.exceptions.RequestException as e:
+            error, permanent = str(e), False
+        except Exception as e:  # error tak terduga: jangan biarkan item tertahan di 'sending'
+            error, permanent = f"{type(e).__name__}: {e}", False
+        self._mark_failed(items, error, permanent, retry_after)
+
+    def _mark_sent(self, ids):
+        now = time.time()
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET status=?, sent_at=?, attempts=attempts+1, last_error=NULL WHERE id=? AND status=?",
+                                 [(SENT, now, i, SENDING) for i in ids])
+            self._db.commit()
+
+    def _mark_failed(self, items, error, permanent, retry_after=None):
+        now, updates = time.time(), []
+        for outbox_id, _, _, attempts in items:
+            attempts += 1
+            if permanent or attempts >= self.max_attempts:
+                updates.append((FAILED, attempts, now, error, outbox_id))
+            else:
+                delay = retry_after if retry_after is not None else backoff_delay(attempts, self.base_delay, self.max_delay)
+                updates.append((PENDING, attempts, now + delay, error, outbox_id))
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET status=?, attempts=?, next_attempt=?, last_error=? WHERE id=? AND status=?",
+                                 [u + (SENDING,) for u in updates])
+            self._db.commit()
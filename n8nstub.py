@@ -0,0 +1,58 @@
+"""Stub webhook n8n lokal untuk menguji outbox tanpa instance n8n.
+
+    python n8nstub.py --port 5678 --fail-rate 0.3 --delay-ms 1500
+
+Lalu isi URL webhook di chatbotbkpm.py dengan http://127.0.0.1:5678/webhook/tinjauan. Setiap POST
+dicetak beserta header X-Delivery-Id; `--fail-rate` membalas 503 secara acak dan `--delay-ms`
+memperlambat respons untuk mensimulasikan n8n yang lambat.
+"""
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_handler(fail_rate, delay, log):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, seperti n8n di belakang reverse proxy
+
+        def log_message(self, *args): pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if delay: time.sleep(delay)
+            failed = random.random() < fail_rate
+            status = 503 if failed else 200
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                payload = body.decode("utf-8", "replace")
+            log.append({"path": self.path, "delivery_id": self.headers.get("X-Delivery-Id"), "status": status, "payload": payload})
+            items = payload if isinstance(payload, list) else [payload]
+            print(f"{time.strftime('%H:%M:%S')} {self.path} {self.headers.get('X-Delivery-Id')} -> {status} "
+                  f"({len(items)} item: {', '.join(str((p or {}).get('decision')) for p in items if isinstance(p, dict))})", flush=True)
+            data = json.dumps({"message": "Workflow was started"} if not failed else {"message": "unavailable"}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+def serve(port=5678, fail_rate=0.0, delay_ms=0.0, log=None):
+    """Buat server stub (belum dijalankan); `log` (list) menampung setiap request yang diterima."""
+    return ThreadingHTTPServer(("127.0.0.1", port), make_handler(fail_rate, delay_ms / 1000.0, [] if log is None else log))
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Stub webhook n8n lokal.")
+    p.add_argument("--port", type=int, default=5678)
+    p.add_argument("--fail-rate", type=float, default=0.0, help="Peluang membalas 503 (0..1)")
+    p.add_argument("--delay-ms", type=float, default=0.0)
+    args = p.parse_args()
+    server = serve(args.port, args.fail_rate, args.delay_ms)
+    print(f"Stub n8n mendengarkan di http://127.0.0.1:{args.port}/webhook/<apa saja>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,392 @@
+"""Backend vektor lokal in-process: matriks embedding ter-normalisasi di file memory-mapped + sidecar sqlite.
+
+Untuk koleksi kecil-menengah (< ~1 juta chunk) overhead startup dan per-query Chroma lebih besar
+dari pencarian exact itu sendiri. Di sini vektor disimpan sebagai matriks float32/float16
+(`vectors.bin`, dibuka dengan np.memmap sehingga halaman dimuat OS sesuai kebutuhan), sedangkan
+ID, dokumen, dan metadata disimpan di `rows.sqlite`. Query menghitung cosine similarity secara
+vektorisasi per blok baris dan mengambil top-k dengan argpartition. float16 memangkas ukuran file
+dan RAM setengahnya, tetapi setiap blok harus dikonversi ke float32 sebelum perkalian sehingga
+query tunggal lebih lambat; biayanya teramortisasi bila banyak query dikirim sekaligus.
+
+Antarmuka meniru bagian API Chroma yang dipakai aplikasi (client: get_or_create_collection,
+get_collection, list_collections, delete_collection, heartbeat; koleksi: add, upsert, update,
+get, query, delete, count), sehingga bisa dipakai di tempat PersistentClient. Filter `where`
+hanya mendukung kesamaan sederhana ({"source": "a.pdf"}, `$eq`, `$and`).
+
+Beberapa proses (uploadchroma, cobalagi, bulkingest) boleh membuka folder yang sama: penulisan
+memegang flock eksklusif pada file `lock`, pembacaan flock bersama, dan sebelum setiap operasi
+alokasi baris serta memmap dimuat ulang bila sidecar diubah proses lain (`PRAGMA data_version`)
+atau file vektor bertambah. Baris yang dihapus hanya ditandai kosong dan dipakai ulang oleh `add`
+berikutnya, jadi tidak ada pemindahan vektor yang bisa membuat sidecar dan matriks tidak sinkron
+bila proses mati di tengah jalan. Tanpa fcntl (Windows) tidak ada penguncian antarproses.
+"""
+import os
+import json
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: fcntl = None
+
+import numpy as np
+
+DEFAULT_DTYPE = os.getenv("RAG_NPVECTOR_DTYPE", "float32")
+SEARCH_BLOCK_ROWS = 65536  # baris per blok perkalian matriks (membatasi memori sementara)
+_MIN_CAPACITY = 1024
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1: vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def _where_sql(where):
+    """Terjemahkan filter `where` gaya Chroma (kesamaan sederhana) ke klausa SQL atas kolom metadata."""
+    clauses, params = [], []
+    for key, value in where.items():
+        if key == "$and":
+            for part in value:
+                sql, part_params = _where_sql(part)
+                clauses.append(sql)
+                params += part_params
+            continue
+        if isinstance(value, dict):
+            if set(value) != {"$eq"}: raise ValueError(f"Operator filter tidak didukung: {value}")
+            value = value["$eq"]
+        clauses.append("json_extract(metadata, ?) = ?")
+        params += [f'$."{key}"', value]
+    return " AND ".join(clauses) or "1", params
+
+class NumpyCollection:
+    def __init__(self, path, name, embedding_function=None, metadata=None, dtype=DEFAULT_DTYPE):
+        os.makedirs(path, exist_ok=True)
+        self.name = name
+        self.path = path
+        self._embedding_function = embedding_function
+        self._lock = threading.RLock()
+        self._lock_fh = open(os.path.join(path, "lock"), "a+")
+        self._lock_depth = 0
+        self._data_version = None
+        self._db = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS rows (id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE,"
+            " document TEXT, metadata TEXT NOT NULL);"
+        )
+        self._file = os.path.join(path, "vectors.bin")
+        self._matrix = None
+        self.dtype, self.dim = np.dtype(dtype), None
+        with self._locked(exclusive=True):
+            info = dict(self._db.execute("SELECT key, value FROM info").fetchall())
+            if "dtype" not in info:
+                info = {"dtype": np.dtype(dtype).name, "metadata": json.dumps(metadata or {})}
+                self._db.executemany("INSERT INTO info(key, value) VALUES (?, ?)", info.items())
+                self._db.commit()
+            self.metadata = json.loads(info["metadata"])
+            self.dtype = np.dtype(info["dtype"])
+            self._data_version = None  # muat ulang dengan dtype koleksi yang sebenarnya
+            self._refresh()
+
+    # ---------------- Sinkronisasi antarproses ----------------
+    @contextmanager
+    def _locked(self, exclusive):
+        """Lock thread + flock (eksklusif untuk tulis, bersama untuk baca); state disegarkan dulu."""
+        with self._lock:
+            outer = self._lock_depth == 0
+            if outer and fcntl is not None:
+                fcntl.flock(self._lock_fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._lock_depth += 1
+            try:
+                if outer: self._refresh()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if outer and fcntl is not None:
+                    fcntl.flock(self._lock_fh, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Muat ulang alokasi baris bila sidecar di-commit koneksi lain, dan memmap bila file tumbuh."""
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version and (self.dim is None or self._file_rows() == self._capacity()):
+            return
+        self._data_version = version
+        dim = self._db.execute("SELECT value FROM info WHERE key='dim'").fetchone()
+        self.dim = int(dim[0]) if dim else None
+        self._matrix = None
+        if self.dim is not None:
+            self._open_matrix()
+        rows = np.fromiter((r for (r,) in self._db.execute("SELECT row FROM rows")), dtype=np.int64)
+        self._high = int(rows.max()) + 1 if rows.size else 0  # baris di atas ini belum pernah dipakai
+        self._alive = np.zeros(self._capacity(), dtype=bool)
+        self._alive[rows] = True
+        self._free = np.flatnonzero(~self._alive[:self._high]).tolist()
+
+    # ---------------- Penyimpanan ----------------
+    def _file_rows(self):
+        return os.path.getsize(self._file) // (self.dim * self.dtype.itemsize) if os.path.exists(self._file) else 0
+
+    def _capacity(self):
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    def _open_matrix(self):
+        capacity = self._file_rows()
+        self._matrix = np.memmap(self._file, dtype=self.dtype, mode="r+", shape=(capacity, self.dim)) if capacity else None
+
+    def _reserve(self, n_rows):
+        """Pastikan kapasitas file cukup untuk `n_rows` baris (tumbuh 2x agar resize jarang)."""
+        if n_rows <= self._capacity(): return
+        capacity = max(_MIN_CAPACITY, self._capacity() * 2, n_rows)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self._file, "ab") as fh:
+            fh.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._open_matrix()
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+    def _allocate(self, n):
+        rows = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        rows += range(self._high, self._high + n - len(rows))
+        self._high = max(self._high, rows[-1] + 1) if rows else self._high
+        return rows
+
+    def _embed(self, documents):
+        if self._embedding_function is None:
+            raise ValueError(f"Koleksi '{self.name}' tidak punya embedding function; kirim `embeddings`.")
+        return self._embedding_function(list(documents))
+
+    def _write_vectors(self, rows, embeddings):
+        vectors = _normalize(embeddings)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._db.execute("INSERT OR REPLACE INTO info(key, value) VALUES ('dim', ?)", (str(self.dim),))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimensi embedding {vectors.shape[1]} tidak sama dengan koleksi ({self.dim}).")
+        self._reserve(max(rows) + 1)
+        order = np.argsort(rows)
+        self._matrix[np.asarray(rows)[order]] = vectors[order].astype(self.dtype)
+        self._matrix.flush()  # vektor ditulis sebelum sidecar di-commit
+
+    # ---------------- Tulis ----------------
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        """Tambah baris baru; ID yang sudah ada dilewati (seperti Chroma)."""
+        ids = list(ids)
+        if not ids: return
+        if embeddings is None:
+            # Embed di luar lock eksklusif agar proses lain tidak tertahan selama model berjalan
+            with self._locked(exclusive=False):
+                existing = self._existing(ids)
+            todo = [i for i, cid in enumerate(ids) if cid not in existing]
+            if not todo: return
+            computed = dict(zip(todo, self._embed([documents[i] if documents is not None else None for i in todo])))
+            embeddings = [computed.get(i) for i in range(len(ids))]
+        with self._locked(exclusive=True):
+            seen = set(self._existing(ids))
+            keep = [i for i, cid in enumerate(ids) if embeddings[i] is not None and not (cid in seen or seen.add(cid))]
+            if not keep: return
+            docs = [documents[i] for i in keep] if documents is not None else [None] * len(keep)
+            metas = [(metadatas[i] if metadatas is not None else None) or {} for i in keep]
+            vectors = [embeddings[i] for i in keep]
+            rows = self._allocate(len(keep))
+            try:
+                self._write_vectors(rows, vectors)
+            except Exception:
+                self._free.extend(rows)
+                raise
+            self._db.executemany(
+                "INSERT INTO rows(id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [(ids[i], r, d, json.dumps(m, ensure_ascii=False)) for i, r, d, m in zip(keep, rows, docs, metas)],
+            )
+            self._db.commit()
+            self._alive[rows] = True
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        ids = list(ids)
+        with self._locked(exclusive=True):
+            existing = self._existing(ids)
+            old = [i for i, cid in enumerate(ids) if cid in existing]
+            new = [i for i, cid in enumerate(ids) if cid not in existing]
+            pick = lambda values, idx: [values[i] for i in idx] if values is not None else None
+            if old:
+                self.update([ids[i] for i in old], pick(embeddings, old), pick(metadatas, old), pick(documents, old))
+            if new:
+                self.add([ids[i] for i in new], pick(embeddings, new), pick(metadatas, new), pick(documents, new))
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        """Ubah metadata/dokumen/vektor baris yang ada; dokumen baru tanpa `embeddings` di-embed ulang."""
+        ids = list(ids)
+        with self._locked(exclusive=True):
+            existing = self._existing(ids)
+            idx = [i for i, cid in enumerate(ids) if cid in existing]
+            if not idx: return
+            if embeddings is None and documents is not None:
+                embeddings = self._embed(documents)
+            if embeddings is not None:
+                self._write_vectors([existing[ids[i]] for i in idx], [embeddings[i] for i in idx])
+            if documents is not None:
+                self._db.executemany("UPDATE rows SET document=? WHERE id=?", [(documents[i], ids[i]) for i in idx])
+            if metadatas is not None:
+                self._db.executemany("UPDATE rows SET metadata=? WHERE id=?",
+                                     [(json.dumps(metadatas[i] or {}, ensure_ascii=False), ids[i]) for i in idx])
+            self._db.commit()
+
+    def delete(self, ids=None, where=None):
+        with self._locked(exclusive=True):
+            rows = self._select(ids, where, ["row"])
+            if not rows: return
+            self._db.executemany("DELETE FROM rows WHERE row=?", [(r,) for (r,) in rows])
+            self._db.commit()
+            freed = [r for (r,) in rows]
+            self._alive[freed] = False
+            self._free.extend(freed)
+
+    # ---------------- Baca ----------------
+    def _existing(self, ids):
+        found = {}
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            found.update(self._db.execute(
+                f"SELECT id, row FROM rows WHERE id IN ({','.join('?' * len(part))})", part).fetchall())
+        return found
+
+    def _select(self, ids, where, columns, limit=None, offset=None):
+        sql, params = _where_sql(where or {})
+        if ids is not None:
+            ids = list(ids)
+            if not ids: return []
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params += ids
+        sql = f"SELECT {', '.join(columns)} FROM rows WHERE {sql} ORDER BY rowid"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        return self._db.execute(sql, params).fetchall()
+
+    def count(self):
+        with self._locked(exclusive=False):
+            return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        with self._locked(exclusive=False):
+            rows = self._select(ids, where, ["id", "row", "document", "metadata"], limit, offset)
+            vectors = self._matrix[[r[1] for r in rows]].astype(np.float32) if "embeddings" in include and rows else None
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[2] for r in rows] if "documents" in include else None,
+            "metadatas": [json.loads(r[3]) for r in rows] if "metadatas" in include else None,
+            "embeddings": vectors if "embeddings" in include else None,
+        }
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None,
+              include=("metadatas", "documents", "distances")):
+        """Top-k exact per query (jarak cosine = 1 - similarity), format hasil seperti Chroma."""
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        queries = _normalize(query_embeddings)
+        with self._locked(exclusive=False):
+            if where:
+                candidates = np.asarray([r for (r,) in self._select(None, where, ["row"])], dtype=np.int64)
+            else:
+                candidates = None
+            scores, rows = self._search(queries, n_results, candidates)
+            flat = sorted({int(r) for r in rows.ravel() if r >= 0})
+            by_row = {}
+            for start in range(0, len(flat), 500):
+                part = flat[start:start + 500]
+                by_row.update((r[0], r[1:]) for r in self._db.execute(
+                    f"SELECT row, id, document, metadata FROM rows WHERE row IN ({','.join('?' * len(part))})", part))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q_scores, q_rows in zip(scores, rows):
+            hits = [(by_row[int(r)], float(s)) for s, r in zip(q_scores, q_rows) if r >= 0 and int(r) in by_row]
+            result["ids"].append([h[0] for h, _ in hits])
+            result["documents"].append([h[1] for h, _ in hits])
+            result["metadatas"].append([json.loads(h[2]) for h, _ in hits])
+            result["distances"].append([1.0 - s for _, s in hits])
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include: result[key] = None
+        return result
+
+    def _search(self, queries, k, candidates=None):
+        """Similarity tertinggi per query: (scores m×k, rows m×k), baris -1 bila hasil kurang dari k."""
+        m = len(queries)
+        best_scores = np.full((m, k), -np.inf, dtype=np.float32)
+        best_rows = np.full((m, k), -1, dtype=np.int64)
+        if self._matrix is None or k <= 0: return best_scores, best_rows
+        if candidates is not None:
+            blocks = [candidates[i:i + SEARCH_BLOCK_ROWS] for i in range(0, len(candidates), SEARCH_BLOCK_ROWS)]
+        else:
+            blocks = [np.arange(i, min(i + SEARCH_BLOCK_ROWS, self._high)) for i in range(0, self._high, SEARCH_BLOCK_ROWS)]
+        queries_t = queries.T
+        for block_rows in blocks:
+            if candidates is None:
+                matrix = self._matrix[block_rows[0]:block_rows[-1] + 1]  # slice: tanpa salinan
+            else:
+                matrix = self._matrix[block_rows]
+            sims = (matrix.astype(np.float32, copy=False) @ queries_t).T  # m × blok
+            if candidates is None:
+                sims[:, ~self._alive[block_rows[0]:block_rows[-1] + 1]] = -np.inf
+            kk = min(k, sims.shape[1])
+            top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+            merged_scores = np.concatenate([best_scores, np.take_along_axis(sims, top, axis=1)], axis=1)
+            merged_rows = np.concatenate([best_rows, block_rows[top]], axis=1)
+            order = np.argsort(-merged_scores, axis=1, kind="stable")[:, :k]
+            best_scores = np.take_along_axis(merged_scores, order, axis=1)
+            best_rows = np.take_along_axis(merged_rows, order, axis=1)
+        best_rows[~np.isfinite(best_scores)] = -1
+        return best_scores, best_rows
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None: self._matrix.flush()
+            self._db.close()
+            self._lock_fh.close()
+
+class _CollectionInfo:
+    def __init__(self, name):
+        self.name = name
+
+class NumpyVectorClient:
+    """Pengganti PersistentClient: satu subfolder per koleksi di bawah `path`."""
+
+    def __init__(self, path, dtype=DEFAULT_DTYPE):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dtype = dtype
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def heartbeat(self):
+        return os.path.isdir(self.path)
+
+    def _dir(self, name):
+        return os.path.join(self.path, name)
+
+    def get_or_create_collection(self, name, embedding_function=None, metadata=None):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = NumpyCollection(
+                    self._dir(name), name, embedding_function, metadata, self.dtype)
+            elif embedding_function is not None:
+                collection._embedding_function = embedding_function
+            return collection
+
+    def get_collection(self, name, embedding_function=None):
+        if name not in self._collections and not os.path.exists(os.path.join(self._dir(name), "rows.sqlite")):
+            raise ValueError(f"Koleksi {name} tidak ada.")
+        return self.get_or_create_collection(name, embedding_function)
+
+    def list_collections(self):
+        return [_CollectionInfo(name) for name in sorted(os.listdir(self.path))
+                if os.path.exists(os.path.join(self._dir(name), "rows.sqlite"))]
+
+    def delete_collection(self, name):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None: collection.close()
+            shutil.rmtree(self._dir(name), ignore_errors=True)
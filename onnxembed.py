@@ -0,0 +1,205 @@
+"""Backend embedding CPU: all-MiniLM-L6-v2 diekspor ke ONNX dan dikuantisasi int8 (dinamis).
+
+Di node tanpa GPU, SentenceTransformer PyTorch fp32 adalah biaya terbesar ingestion. Modul ini
+menjalankan graf transformer yang sama lewat onnxruntime dengan bobot int8; tokenisasi memakai
+`tokenizers` (Rust) dan pooling/normalisasi dilakukan di NumPy persis seperti modul-modul
+SentenceTransformer aslinya, sehingga keluarannya tetap 384 dimensi dan kompatibel dengan
+koleksi yang dibuat model fp32 (lihat `check` untuk drift cosine).
+
+    python onnxembed.py export                      # sekali; butuh torch + sentence-transformers
+    python onnxembed.py check dokumen/*.pdf         # drift cosine int8 vs fp32 pada chunk sungguhan
+
+Saat runtime hanya onnxruntime, tokenizers, dan numpy yang diimpor (tanpa torch). Teks diurutkan
+menurut panjang lalu diproses per `ONNX_BATCH_SIZE` (bawaan 16; aktivasi satu batch muat di
+cache L2/L3) dan jumlah thread diatur `ONNX_THREADS` (0 = bawaan onnxruntime, semua core fisik;
+turunkan bila beberapa proses Streamlit berbagi satu node).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+SENTENCE_TRANSFORMERS_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_DIR = os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "onnx", f"{SENTENCE_TRANSFORMERS_MODEL}-int8")
+DEFAULT_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+DEFAULT_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "16"))
+CONFIG_FILE = "onnxembed.json"
+
+_export_lock = threading.Lock()
+
+def export(model_name=SENTENCE_TRANSFORMERS_MODEL, out_dir=DEFAULT_DIR, quantize=True, opset=14):
+    """Ekspor transformer SentenceTransformer ke `out_dir` (model.onnx fp32, model-int8.onnx,
+    tokenizer.json, dan onnxembed.json berisi pooling/normalisasi/panjang maks)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = st_model[0], st_model[1]
+    tokenizer = transformer.tokenizer
+    os.makedirs(out_dir, exist_ok=True)
+
+    class Encoder(torch.nn.Module):
+        # Hanya last_hidden_state; pooling dikerjakan di NumPy agar mudah dicocokkan dengan fp32
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["contoh kalimat untuk ekspor", "teks kedua"], padding=True, return_tensors="pt")
+    inputs = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "seq"} for n in inputs + ["last_hidden_state"]}
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(Encoder(transformer.auto_model).eval(), tuple(sample[n] for n in inputs), fp32_path,
+                          input_names=inputs, output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=opset)
+    model_file = "model.onnx"
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(out_dir, "model-int8.onnx"), weight_type=QuantType.QInt8, per_channel=True)
+        model_file = "model-int8.onnx"
+    tokenizer.save_pretrained(out_dir)  # tokenizer.json (fast tokenizer) dipakai `tokenizers` saat runtime
+    config = {
+        "model": model_name,
+        "model_file": model_file,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "pooling": pooling.get_pooling_mode_str(),
+        "normalize": any(type(m).__name__ == "Normalize" for m in st_model),
+        "max_seq_length": st_model.max_seq_length,
+        "inputs": inputs,
+        "pad_token": tokenizer.pad_token,
+        "pad_id": tokenizer.pad_token_id,
+    }
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as fh:
+        json.dump(config, fh, indent=2)
+    return config
+
+class OnnxEmbedder:
+    """Embedder onnxruntime. `encode(texts)` -> numpy (n, dim) seperti SentenceTransformer;
+    `embedder(texts)` -> list vektor, sehingga bisa dipakai sebagai embedding function Chroma.
+    Aman dipanggil dari beberapa thread (InferenceSession.run thread-safe)."""
+
+    def __init__(self, model_dir=DEFAULT_DIR, threads=DEFAULT_THREADS, batch_size=DEFAULT_BATCH_SIZE, model_file=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), encoding="utf-8") as fh:
+            self.config = json.load(fh)
+        self.dim = self.config["dim"]
+        self.batch_size = batch_size
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file or self.config["model_file"]), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+    def _pool(self, hidden, mask):
+        import numpy as np
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:  # mean pooling dengan mask, seperti sentence_transformers.models.Pooling
+            m = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def encode(self, texts, batch_size=None):
+        import numpy as np
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        # Urut menurut panjang: padding per batch minimal; hasil ditulis kembali ke posisi asal
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in idx])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+            if "token_type_ids" in self.config["inputs"]:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            out[idx] = self._pool(self.session.run(None, feeds)[0], mask)
+        return out
+
+    def __call__(self, input):
+        return self.encode(input).tolist()
+
+def load(model_dir=DEFAULT_DIR, threads=DEFAULT_THREADS, batch_size=DEFAULT_BATCH_SIZE):
+    """OnnxEmbedder dari `model_dir`; bila belum ada, model diekspor dulu (sekali, butuh torch)."""
+    with _export_lock:
+        if not os.path.exists(os.path.join(model_dir, CONFIG_FILE)):
+            export(out_dir=model_dir)
+    return OnnxEmbedder(model_dir, threads, batch_size)
+
+def drift_report(candidate, reference, texts, k=5):
+    """Cosine antara vektor `candidate` dan `reference` untuk teks yang sama, plus kesamaan
+    k tetangga terdekat (overlap@k) bila teks dipakai sebagai korpus sekaligus query."""
+    import numpy as np
+    a = np.asarray(candidate(texts), dtype=np.float32)
+    b = np.asarray(reference(texts), dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    cos = np.sort((a * b).sum(axis=1))
+    k = min(k, len(texts) - 1)
+    overlap = None
+    if k > 0:
+        top = lambda v: np.argsort(-(v @ v.T), axis=1)[:, 1:k + 1]  # kolom 0 = dirinya sendiri
+        overlap = float(np.mean([len(set(x) & set(y)) / k for x, y in zip(top(a), top(b))]))
+    return {
+        "n": len(texts),
+        "mean_cosine": float(cos.mean()),
+        "min_cosine": float(cos[0]),
+        "p1_cosine": float(cos[int(len(cos) * 0.01)]),
+        f"neighbour_overlap_at_{k}": overlap,
+    }
+
+def _check(paths, model_dir, limit):
+    from sentence_transformers import SentenceTransformer
+    from ingest import extract_and_chunk
+
+    texts = []
+    for path in paths:
+        chunks, _ = extract_and_chunk(os.path.basename(path), path)
+        texts += [c for c, _ in chunks]
+    texts = texts[:limit]
+    if not texts:
+        print("Tidak ada chunk dari file yang diberikan.", file=sys.stderr)
+        return 1
+    reference = SentenceTransformer(SENTENCE_TRANSFORMERS_MODEL, device="cpu")
+    embedder = load(model_dir)
+    timings = {}
+    def timed(name, fn):
+        def run(batch):
+            started = time.perf_counter()
+            result = fn(batch)
+            timings[name] = time.perf_counter() - started
+            return result
+        return run
+    report = drift_report(timed("onnx_int8", embedder.encode), timed("torch_fp32", reference.encode), texts)
+    print(json.dumps({**report, **{f"{n}_texts_per_sec": len(texts) / s for n, s in timings.items()}}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Ekspor dan cek model embedding ONNX int8.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("export", help="Ekspor + kuantisasi int8")
+    e.add_argument("--model", default=SENTENCE_TRANSFORMERS_MODEL)
+    e.add_argument("--out", default=DEFAULT_DIR)
+    e.add_argument("--no-quantize", action="store_true", help="Hanya fp32 (untuk pembanding)")
+    c = sub.add_parser("check", help="Drift cosine int8 vs PyTorch fp32 pada chunk dari file")
+    c.add_argument("paths", nargs="+")
+    c.add_argument("--model-dir", default=DEFAULT_DIR)
+    c.add_argument("--limit", type=int, default=2000, help="Batas jumlah chunk")
+    args = p.parse_args()
+    if args.cmd == "export":
+        print(json.dumps(export(args.model, args.out, quantize=not args.no_quantize), indent=2))
+    else:
+        sys.exit(_check(args.paths, args.model_dir, args.limit))
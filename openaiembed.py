@@ -0,0 +1,163 @@
+"""Dispatcher embedding OpenAI: teks dikemas per request sesuai anggaran token, dikirim paralel
+di bawah limiter token-bucket (TPM dan RPM) sisi client, dan mundur saat kena 429.
+
+`OpenAIEmbeddingFunction` bawaan Chroma mengirim semua teks dalam satu request: file besar gagal
+karena melewati batas token per request, sedangkan file kecil memboroskan round-trip. Di sini:
+
+- teks > 8191 token dipotong (batas input model), lalu dikemas berurutan ke request hingga
+  `max_request_tokens` token atau 2048 input;
+- setiap request mengambil jatah dari bucket token (perkiraan tiktoken) dan bucket request;
+- 429 menghentikan sementara *semua* worker selama `retry-after` / `x-ratelimit-reset-*` (atau
+  backoff eksponensial dengan jitter), 5xx dan error koneksi diulang dengan backoff yang sama;
+- hasil dikembalikan sesuai urutan input.
+
+Batas bawaan dari env: OPENAI_EMBED_TPM, OPENAI_EMBED_RPM, OPENAI_EMBED_MAX_REQUEST_TOKENS,
+OPENAI_EMBED_CONCURRENCY. Bucket dipakai bersama semua pemanggil dispatcher yang sama (mis. semua
+thread BatchWriter ingestion). Endpoint tiruan untuk pengujian: benchmarks/fakes.FakeEmbeddingServer.
+"""
+import os
+import re
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from ingest import count_tokens, truncate_tokens
+
+MAX_INPUT_TOKENS = 8191   # batas per teks model text-embedding-3-*
+MAX_REQUEST_INPUTS = 2048  # batas jumlah input per request
+DEFAULT_TPM = int(os.getenv("OPENAI_EMBED_TPM", "1000000"))
+DEFAULT_RPM = int(os.getenv("OPENAI_EMBED_RPM", "3000"))
+DEFAULT_MAX_REQUEST_TOKENS = int(os.getenv("OPENAI_EMBED_MAX_REQUEST_TOKENS", "50000"))
+DEFAULT_CONCURRENCY = int(os.getenv("OPENAI_EMBED_CONCURRENCY", "4"))
+MAX_ATTEMPTS = 8
+
+class TokenBucket:
+    """Bucket `per_minute` unit, terisi kontinu; kapasitas = satu menit jatah. Aman lintas thread.
+    `pause(detik)` menahan semua pengambil (dipakai setelah 429)."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1.0):
+        """Ambil `amount` unit (dibatasi kapasitas), menunggu bila perlu; mengembalikan detik menunggu."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= amount:
+                        self._tokens -= amount
+                        return waited
+                    wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+def _parse_duration(value):
+    """'1.5s', '20ms', '6m0s' (format header x-ratelimit-reset-*) atau angka detik -> detik."""
+    if not value: return None
+    try:
+        return float(value)
+    except ValueError:
+        parts = re.findall(r"([\d.]+)(ms|s|m|h)", value)
+        if not parts: return None
+        return sum(float(n) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[u] for n, u in parts)
+
+def retry_delay(headers, attempt):
+    """Jeda sebelum mencoba lagi: header server bila ada, selain itu eksponensial + jitter (maks. 60 dtk)."""
+    headers = headers or {}
+    ms = _parse_duration(headers.get("retry-after-ms"))
+    delay = ms / 1000.0 if ms is not None else None
+    for name in ("retry-after", "x-ratelimit-reset-tokens", "x-ratelimit-reset-requests"):
+        if delay is None: delay = _parse_duration(headers.get(name))
+    if delay is None: delay = min(60.0, 2 ** attempt)
+    return delay * (1 + random.random() * 0.25)
+
+def pack_requests(token_counts, max_request_tokens=DEFAULT_MAX_REQUEST_TOKENS, max_inputs=MAX_REQUEST_INPUTS):
+    """Kelompokkan indeks teks (berurutan) menjadi request yang tidak melewati anggaran token/input."""
+    groups, current, used = [], [], 0
+    for i, n in enumerate(token_counts):
+        if current and (used + n > max_request_tokens or len(current) >= max_inputs):
+            groups.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += n
+    if current: groups.append(current)
+    return groups
+
+class OpenAIEmbeddingDispatcher:
+    """Embedding function (dipanggil `dispatcher(texts)`) untuk endpoint embeddings OpenAI."""
+
+    def __init__(self, api_key, model="text-embedding-3-small", base_url=None, tpm=DEFAULT_TPM, rpm=DEFAULT_RPM,
+                 max_request_tokens=DEFAULT_MAX_REQUEST_TOKENS, concurrency=DEFAULT_CONCURRENCY, timeout=60.0):
+        from openai import OpenAI
+        # Retry SDK dimatikan: backoff ditangani di sini agar bucket bersama ikut berhenti saat 429
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self.model = model
+        self.max_request_tokens = min(max_request_tokens, tpm)
+        self.tokens = TokenBucket(tpm)
+        self.requests = TokenBucket(rpm)
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "tokens": 0, "truncated": 0}
+        self._stats_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="openai-embed")
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for k, v in deltas.items(): self.stats[k] += v
+
+    def _send(self, texts, n_tokens):
+        import openai
+        for attempt in range(MAX_ATTEMPTS):
+            waited = self.requests.acquire() + self.tokens.acquire(n_tokens)
+            started = time.perf_counter()
+            try:
+                raw = self.client.embeddings.with_raw_response.create(model=self.model, input=texts)
+            except openai.RateLimitError as e:
+                delay = retry_delay(e.response.headers, attempt)
+                self.tokens.pause(delay)
+                self._count(rate_limited=1, retries=1)
+                tracing.record("embed.openai.429", delay, attempt=attempt)
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == MAX_ATTEMPTS - 1: raise
+                time.sleep(retry_delay(getattr(getattr(e, "response", None), "headers", None), attempt))
+                self._count(retries=1)
+                continue
+            response = raw.parse()
+            self._count(requests=1, tokens=response.usage.total_tokens if response.usage else n_tokens)
+            tracing.record("embed.openai", time.perf_counter() - started, texts=len(texts), tokens=n_tokens,
+                           waited_ms=round(waited * 1000, 1), attempt=attempt)
+            return [list(d.embedding) for d in sorted(response.data, key=lambda d: d.index)]
+        raise RuntimeError(f"Embedding OpenAI gagal setelah {MAX_ATTEMPTS} percobaan (rate limit)")
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts: return []
+        counts = []
+        for i, t in enumerate(texts):
+            n = count_tokens(t) or 1
+            if n > MAX_INPUT_TOKENS:
+                texts[i], n = truncate_tokens(t, MAX_INPUT_TOKENS), MAX_INPUT_TOKENS
+                self._count(truncated=1)
+            counts.append(n)
+        groups = pack_requests(counts, self.max_request_tokens)
+        futures = [self._pool.submit(self._send, [texts[i] for i in g], sum(counts[i] for i in g)) for g in groups]
+        out = [None] * len(texts)
+        for group, future in zip(groups, futures):
+            for i, vector in zip(group, future.result()):
+                out[i] = vector
+        return out
@@ -0,0 +1,196 @@
+"""Cache hasil tinjauan kontrak on-disk (sqlite), dipakai bersama semua sesi dan pengguna.
+
+Selain tinjauan utuh per dokumen, menyimpan analisis per klausul (kunci: hash klausul + model +
+versi prompt) dan daftar hash klausul tiap versi kontrak untuk tinjauan inkremental.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_PATH = os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "reviews.sqlite")
+DEFAULT_MAX_BYTES = int(os.getenv("REVIEW_CACHE_MAX_MB", "256")) * 1024 * 1024
+DEFAULT_MAX_AGE = float(os.getenv("REVIEW_CACHE_MAX_DAYS", "30")) * 86400
+
+def review_key(content_hash, model, prompt_version, variant=""):
+    """Kunci cache: hash isi file + model + versi prompt + varian (mode tinjauan, ukuran bagian)."""
+    return hashlib.sha256(f"{content_hash}\x00{model}\x00{prompt_version}\x00{variant}".encode("utf-8")).hexdigest()
+
+class ReviewCache:
+    """Satu baris per kunci tinjauan: teks hasil, metadata (timing, nama file), dan waktu pakai.
+
+    Entri yang lebih tua dari `max_age` detik dianggap kedaluwarsa; bila total ukuran melebihi
+    `max_bytes`, entri yang paling lama tidak dipakai dibuang sampai 90% batas. Batas berlaku
+    terpisah untuk tabel tinjauan utuh (`reviews`), analisis klausul (`clause_reviews`), dan daftar
+    klausul per versi kontrak (`contract_versions`, satu baris per nama + isi; yang tertua dibuang).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS reviews (key TEXT PRIMARY KEY, result TEXT NOT NULL, meta TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS clause_reviews (key TEXT PRIMARY KEY, analysis TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS contract_versions (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL, clause_hashes TEXT NOT NULL, labels TEXT NOT NULL, created_at REAL NOT NULL,"
+            " bytes INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS contract_versions_by_name ON contract_versions(name, created_at);"
+        )
+        if "bytes" not in {r[1] for r in self._db.execute("PRAGMA table_info(contract_versions)")}:
+            # Cache lama: tambah kolom ukuran dan buang duplikat (nama, isi) sebelum indeks unik dibuat
+            self._db.execute("ALTER TABLE contract_versions ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("UPDATE contract_versions SET bytes=length(clause_hashes) + length(labels)")
+            self._db.execute("DELETE FROM contract_versions WHERE id NOT IN"
+                             " (SELECT MAX(id) FROM contract_versions GROUP BY name, content_hash)")
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS contract_versions_unique ON contract_versions(name, content_hash)")
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM reviews").fetchone()[0]
+        self._clause_bytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM clause_reviews").fetchone()[0]
+        self._version_bytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM contract_versions").fetchone()[0]
+
+    def get(self, key):
+        """Mengembalikan (result, meta, created_at) atau None (tidak ada / kedaluwarsa)."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT result, meta, created_at, bytes FROM reviews WHERE key=?", (key,)).fetchone()
+            if row and now - row[2] > self.max_age:
+                self._db.execute("DELETE FROM reviews WHERE key=?", (key,))
+                self._bytes -= row[3]
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE reviews SET last_used=? WHERE key=?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, key, result, meta=None):
+        meta_json = json.dumps(meta or {}, ensure_ascii=False, default=str)
+        size = len(result.encode("utf-8")) + len(meta_json)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT bytes FROM reviews WHERE key=?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO reviews(key, result, meta, bytes, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, result, meta_json, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self._bytes = self._evict("reviews", self._bytes, now)
+            self._db.commit()
+
+    def invalidate(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT bytes FROM reviews WHERE key=?", (key,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM reviews WHERE key=?", (key,))
+                self._bytes -= row[0]
+                self._db.commit()
+
+    def _evict(self, table, total, now, key="key", order="last_used"):
+        """Buang entri kedaluwarsa lalu LRU (urut `order`) dari `table`; mengembalikan total byte yang tersisa."""
+        expired = self._db.execute(f"SELECT COALESCE(SUM(bytes), 0) FROM {table} WHERE created_at < ?", (now - self.max_age,)).fetchone()[0]
+        if expired:
+            self._db.execute(f"DELETE FROM {table} WHERE created_at < ?", (now - self.max_age,))
+            total -= expired
+        if total <= self.max_bytes: return total
+        # Buang entri yang paling lama tidak dipakai sampai ukuran turun ke 90% batas
+        excess, victims = total - int(self.max_bytes * 0.9), []
+        for victim, size in self._db.execute(f"SELECT {key}, bytes FROM {table} ORDER BY {order}"):
+            if excess <= 0: break
+            victims.append(victim)
+            excess -= size
+            total -= size
+        self._db.executemany(f"DELETE FROM {table} WHERE {key}=?", [(k,) for k in victims])
+        return total
+
+    # ---------------- Tinjauan per klausul ----------------
+    def get_clauses(self, keys):
+        """Analisis klausul yang sudah ada: dict kunci -> teks analisis (yang kedaluwarsa diabaikan)."""
+        keys, found = list(keys), {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start+500]
+                found.update(self._db.execute(
+                    f"SELECT key, analysis FROM clause_reviews WHERE created_at >= ? AND key IN ({','.join('?' * len(part))})",
+                    [now - self.max_age] + part,
+                ).fetchall())
+            if found:
+                self._db.executemany("UPDATE clause_reviews SET last_used=? WHERE key=?", [(now, k) for k in found])
+                self._db.commit()
+        return found
+
+    def put_clauses(self, analyses):
+        now = time.time()
+        with self._lock:
+            for key, analysis in analyses.items():
+                size = len(analysis.encode("utf-8"))
+                old = self._db.execute("SELECT bytes FROM clause_reviews WHERE key=?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO clause_reviews(key, analysis, bytes, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, analysis, size, now, now),
+                )
+                self._clause_bytes += size - (old[0] if old else 0)
+            self._clause_bytes = self._evict("clause_reviews", self._clause_bytes, now)
+            self._db.commit()
+
+    def save_version(self, name, content_hash, clause_hashes, labels):
+        """Catat daftar klausul satu versi kontrak (untuk diff dengan revisi berikutnya). Versi yang
+        sama (nama + isi) yang ditinjau ulang hanya diperbarui waktunya, bukan ditambah barisnya."""
+        hashes_json, labels_json = json.dumps(clause_hashes), json.dumps(labels, ensure_ascii=False)
+        size = len(hashes_json) + len(labels_json.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT bytes FROM contract_versions WHERE name=? AND content_hash=?",
+                                   (name, content_hash)).fetchone()
+            self._db.execute(
+                "INSERT INTO contract_versions(name, content_hash, clause_hashes, labels, created_at, bytes) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(name, content_hash) DO UPDATE SET clause_hashes=excluded.clause_hashes,"
+                " labels=excluded.labels, created_at=excluded.created_at, bytes=excluded.bytes",
+                (name, content_hash, hashes_json, labels_json, now, size),
+            )
+            self._version_bytes += size - (old[0] if old else 0)
+            self._version_bytes = self._evict("contract_versions", self._version_bytes, now, key="id", order="created_at")
+            self._db.commit()
+
+    def find_prior_version(self, name, content_hash, clause_hashes, min_overlap=0.3, candidates=200):
+        """Versi sebelumnya dari kontrak ini: versi terakhir dengan nama file sama, atau (bila tidak
+        ada) versi dengan irisan klausul terbesar di atas `min_overlap` (Jaccard). Versi dengan isi
+        yang identik dilewati. Mengembalikan dict name, created_at, clause_hashes, labels atau None."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, content_hash, clause_hashes, labels, created_at FROM contract_versions"
+                " WHERE content_hash != ? ORDER BY created_at DESC LIMIT ?", (content_hash, candidates),
+            ).fetchall()
+        current, best, best_overlap = set(clause_hashes), None, min_overlap
+        for row_name, _, hashes_json, labels_json, created_at in rows:
+            hashes = json.loads(hashes_json)
+            version = {"name": row_name, "created_at": created_at, "clause_hashes": hashes, "labels": json.loads(labels_json)}
+            if row_name == name: return version
+            union = current | set(hashes)
+            overlap = len(current & set(hashes)) / len(union) if union else 0.0
+            if overlap > best_overlap:
+                best, best_overlap = version, overlap
+        return best
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+            clauses = self._db.execute("SELECT COUNT(*) FROM clause_reviews").fetchone()[0]
+            versions = self._db.execute("SELECT COUNT(*) FROM contract_versions").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries, "bytes": self._bytes, "clauses": clauses, "clause_bytes": self._clause_bytes,
+                "versions": versions, "version_bytes": self._version_bytes}
@@ -0,0 +1,84 @@
+"""Katalog sumber dokumen per koleksi (sqlite lokal), agar daftar dokumen tidak perlu memindai Chroma."""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_PATH = os.path.join(os.getenv("RAG_CACHE_DIR", ".rag_cache"), "catalog.sqlite")
+
+class SourceCatalog:
+    """Satu baris per (koleksi, sumber): jumlah chunk, ukuran byte, waktu ingest, dan hash konten.
+
+    Diperbarui setiap upload/hapus sehingga listing cukup O(#sumber). Bila katalog melenceng
+    (mis. koleksi diubah replika lain), jalankan `rebuild` untuk menyusun ulang dari Chroma.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " collection TEXT NOT NULL, source TEXT NOT NULL, chunks INTEGER NOT NULL,"
+            " bytes INTEGER NOT NULL, ingested_at REAL NOT NULL, content_hash TEXT NOT NULL,"
+            " PRIMARY KEY (collection, source))"
+        )
+
+    def upsert(self, collection_key, source, chunks, nbytes, content_hash, ingested_at=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sources(collection, source, chunks, bytes, ingested_at, content_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (collection_key, source, chunks, nbytes, ingested_at or time.time(), content_hash),
+            )
+            self._db.commit()
+
+    def remove(self, collection_key, source):
+        with self._lock:
+            self._db.execute("DELETE FROM sources WHERE collection=? AND source=?", (collection_key, source))
+            self._db.commit()
+
+    def list(self, collection_key):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT source, chunks, bytes, ingested_at, content_hash FROM sources"
+                " WHERE collection=? ORDER BY source", (collection_key,)
+            ).fetchall()
+        return [
+            {"source": s, "chunks": c, "bytes": b, "ingested_at": t, "content_hash": h}
+            for s, c, b, t, h in rows
+        ]
+
+    def rebuild(self, collection_key, collection, page_size=1000):
+        """Susun ulang katalog dengan memindai koleksi per halaman. Mengembalikan jumlah sumber.
+
+        Ukuran byte diperkirakan dari teks chunk dan hash konten diganti hash dari ID chunk
+        (yang sudah content-addressed), karena file aslinya tidak tersimpan di Chroma.
+        """
+        per_source = {}
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas", "documents"])
+            ids = page["ids"]
+            if not ids: break
+            for cid, meta, doc in zip(ids, page["metadatas"] or [], page["documents"] or []):
+                src = (meta or {}).get("source", "unknown")
+                entry = per_source.setdefault(src, {"ids": [], "bytes": 0})
+                entry["ids"].append(cid)
+                entry["bytes"] += len((doc or "").encode("utf-8"))
+            offset += len(ids)
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM sources WHERE collection=?", (collection_key,))
+            self._db.executemany(
+                "INSERT INTO sources(collection, source, chunks, bytes, ingested_at, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (collection_key, src, len(e["ids"]), e["bytes"], now,
+                     hashlib.sha256("\n".join(sorted(e["ids"])).encode()).hexdigest())
+                    for src, e in per_source.items()
+                ],
+            )
+            self._db.commit()
+        return len(per_source)
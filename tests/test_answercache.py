@@ -0,0 +1,36 @@
+from answercache import SemanticAnswerCache
+
+SCOPE = "gpt-4o-mini|all-MiniLM-L6-v2|torch|chroma|k=4"
+
+def test_lookup_by_similarity_scope_and_ttl():
+    cache = SemanticAnswerCache()
+    cache.store("k", SCOPE, [1.0, 0.0, 0.0], "jawaban", 2.0)
+    (payload, sim), _ = cache.lookup("k", SCOPE, [0.99, 0.05, 0.0], threshold=0.95)
+    assert payload == "jawaban" and sim > 0.95
+    assert cache.lookup("k", SCOPE, [0.0, 1.0, 0.0], threshold=0.95)[0] is None
+    assert cache.lookup("k", SCOPE.replace("chroma", "numpy"), [1.0, 0.0, 0.0])[0] is None
+    assert cache.lookup("lain", SCOPE, [1.0, 0.0, 0.0])[0] is None
+    assert cache.lookup("k", SCOPE, [1.0, 0.0, 0.0], ttl=-1)[0] is None  # kedaluwarsa dan dibuang
+    assert cache.stats()["entries"] == 0
+
+def test_invalidate_drops_only_that_collection_and_lru_bounds_size():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("k", SCOPE, [1.0, 0.0], "a", 1.0)
+    cache.store("j", SCOPE, [1.0, 0.0], "b", 1.0)
+    cache.invalidate("k")
+    assert cache.lookup("k", SCOPE, [1.0, 0.0])[0] is None
+    assert cache.lookup("j", SCOPE, [1.0, 0.0])[0][0] == "b"
+    cache.store("k", SCOPE, [0.0, 1.0], "c", 1.0)
+    cache.store("k", SCOPE, [1.0, 1.0], "d", 1.0)
+    assert cache.stats()["entries"] == 2 and cache.lookup("j", SCOPE, [1.0, 0.0])[0] is None
+
+def test_answer_built_before_invalidate_is_not_stored():
+    cache = SemanticAnswerCache()
+    hit, version = cache.lookup("k", SCOPE, [1.0, 0.0])
+    assert hit is None
+    cache.invalidate("k")  # upload selesai sementara jawaban masih disusun dari retrieval lama
+    assert cache.store("k", SCOPE, [1.0, 0.0], "usang", 1.0, version) is False
+    assert cache.lookup("k", SCOPE, [1.0, 0.0])[0] is None
+    _, version = cache.lookup("k", SCOPE, [1.0, 0.0])
+    assert cache.store("k", SCOPE, [1.0, 0.0], "baru", 1.0, version) is True
+    assert cache.lookup("k", SCOPE, [1.0, 0.0])[0][0] == "baru"
@@ -0,0 +1,23 @@
+from batchqa import load_questions
+
+def test_text_and_csv():
+    assert load_questions(b"# komentar\nApa itu PMA?\n\n  Berapa modal minimum? \n", "q.txt") == \
+        ["Apa itu PMA?", "Berapa modal minimum?"]
+    assert load_questions("no,pertanyaan\n1,Apa itu OSS?\n2,\n", "q.csv") == ["Apa itu OSS?"]
+    assert load_questions("Apa itu NIB?\nApa itu KBLI?\n", "q.csv") == ["Apa itu NIB?", "Apa itu KBLI?"]
+
+def test_jsonl_skips_bad_lines_with_line_numbers():
+    data = '\n'.join([
+        '"Apa itu PMA?"',
+        '{"question": "Apa itu OSS?"}',
+        '{"pertanyaan": 2024}',
+        '{bukan json',
+        '{"jawaban": "x"}',
+        '',
+        '[1, 2]',
+        '42',
+    ])
+    errors = []
+    assert load_questions(data, "q.jsonl", errors) == ["Apa itu PMA?", "Apa itu OSS?", "2024", "42"]
+    assert [e.split(":")[0] for e in errors] == ["baris 4", "baris 5", "baris 7"]
+    assert load_questions(data, "q.jsonl") == ["Apa itu PMA?", "Apa itu OSS?", "2024", "42"]
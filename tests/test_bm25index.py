@@ -0,0 +1,31 @@
+from bm25index import BM25Index, tokenize, reciprocal_rank_fusion
+
+DOCS = {
+    "a": "Peraturan Pemerintah Nomor 24/2018 tentang perizinan berusaha terintegrasi secara elektronik.",
+    "b": "Modal dasar perseroan penanaman modal asing paling sedikit sepuluh miliar rupiah.",
+    "c": "Ketentuan modal disetor dan modal ditempatkan untuk perseroan.",
+}
+
+def _index(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite"))
+    index.add("k", list(DOCS), list(DOCS.values()), [{"source": f"{cid}.pdf", "chunk": 0} for cid in DOCS])
+    return index
+
+def test_tokenize_keeps_compound_numbers_and_drops_stopwords():
+    assert tokenize("Pasal 3.2 dari PP 24/2018 yang berlaku") == ["pasal", "3.2", "3", "2", "pp", "24/2018", "24", "2018", "berlaku"]
+
+def test_search_ranks_by_bm25_and_tracks_deletes(tmp_path):
+    index = _index(tmp_path)
+    assert index.count("k") == 3
+    assert [r[0] for r in index.search("k", "2018", k=3)] == ["a"]
+    hits = index.search("k", "modal perseroan", k=3)
+    assert {r[0] for r in hits} == {"b", "c"} and hits[0][0] == "c"  # "modal" 3x di dokumen terpendek
+    assert hits[0][3] == {"source": "c.pdf", "chunk": 0}
+    index.delete_source("k", "c.pdf")
+    assert index.count("k") == 2 and [r[0] for r in index.search("k", "modal perseroan")] == ["b"]
+    assert index.search("lain", "modal") == []
+
+def test_reciprocal_rank_fusion_favours_agreement():
+    fused = reciprocal_rank_fusion(["a", "b", "c"], ["b", "d", "a"])
+    assert fused[:2] == ["b", "a"] and set(fused) == {"a", "b", "c", "d"}
+    assert reciprocal_rank_fusion(["a", "b"], ["b"], limit=1) == ["b"]
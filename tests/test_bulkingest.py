@@ -0,0 +1,25 @@
+import os
+
+from bulkingest import Journal, walk_files
+
+def test_journal_last_line_wins_and_failed_is_retried(tmp_path):
+    doc = tmp_path / "docs" / "a.txt"
+    doc.parent.mkdir()
+    doc.write_text("isi")
+    stat = os.stat(doc)
+    journal = Journal(str(tmp_path / "j.jsonl"))
+    journal.record("a.txt", stat, "done", 3)
+    journal.record("a.txt", stat, "failed", error="gagal ditulis ke koleksi")
+    journal.close()
+    reopened = Journal(str(tmp_path / "j.jsonl"))
+    assert not reopened.is_done("a.txt", stat)
+    reopened.record("a.txt", stat, "done", 3)
+    assert reopened.is_done("a.txt", stat)
+    reopened.close()
+
+def test_walk_files_skips_hidden_dirs_and_other_extensions(tmp_path):
+    for rel in ("b.pdf", "sub/a.txt", "sub/x.png", ".git/c.txt"):
+        path = tmp_path / rel
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("x")
+    assert [name for name, _ in walk_files(str(tmp_path))] == ["b.pdf", "sub/a.txt"]
@@ -0,0 +1,47 @@
+import pytest
+
+from collectionregistry import CollectionRegistry
+
+class CountingClient:
+    def __init__(self, names=()):
+        self.collections = set(names)
+        self.calls = []
+
+    def get_collection(self, name, **kwargs):
+        self.calls.append(("get", name))
+        if name not in self.collections: raise ValueError(f"Collection {name} does not exist")
+        return ("handle", name)
+
+    def get_or_create_collection(self, name, **kwargs):
+        self.calls.append(("create", name))
+        self.collections.add(name)
+        return ("handle", name)
+
+    def list_collections(self):
+        self.calls.append(("list", None))
+        return list(self.collections)
+
+    def delete_collection(self, name):
+        self.collections.discard(name)
+
+def test_handles_and_names_are_cached_until_invalidated():
+    client, registry = CountingClient(["b", "a"]), CollectionRegistry(ttl=60)
+    assert registry.names(client) == ["a", "b"] and registry.names(client) == ["a", "b"]
+    assert registry.get(client, "a") is registry.get(client, "a")
+    assert client.calls == [("list", None), ("get", "a")]
+    registry.get(client, "c", create=True)
+    assert registry.names(client) == ["a", "b", "c"]  # koleksi baru memaksa daftar diambil ulang
+    registry.delete(client, "a")
+    assert registry.names(client) == ["b", "c"]
+    with pytest.raises(ValueError):
+        registry.get(client, "a")
+
+def test_scopes_and_ttl_are_separate():
+    client, registry = CountingClient(["a"]), CollectionRegistry(ttl=0)
+    registry.get(client, "a", scope="chroma")
+    registry.get(client, "a", scope="chroma")
+    assert client.calls.count(("get", "a")) == 2  # ttl 0: selalu diambil ulang
+    cached = CollectionRegistry(ttl=60)
+    cached.get(client, "a", scope="chroma")
+    cached.get(client, "a", scope="numpy")
+    assert cached.stats()["handles"] == 2
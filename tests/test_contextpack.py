@@ -0,0 +1,36 @@
+from contextpack import _merge_overlap, pack_context
+from ingest import chunk_text
+
+TEXT = " ".join(f"Pasal {i} mengatur syarat modal dasar penanaman modal asing nomor {i}." for i in range(60))
+
+def test_short_coincidental_match_is_not_an_overlap():
+    assert _merge_overlap("Modal dana", "adalah syarat") == "Modal dana\nadalah syarat"
+
+def test_adjacent_chunks_merge_back_to_source_text():
+    chunks = chunk_text(TEXT, size=300, overlap=100)
+    assert len(chunks) > 3
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged = _merge_overlap(merged, chunk)
+    assert merged == TEXT
+
+def test_pack_context_merges_runs_dedups_and_orders_by_rank():
+    chunks = chunk_text(TEXT, size=300, overlap=100)
+    results = [
+        (chunks[2], {"source": "a.pdf", "chunk": 2}),
+        ("Lampiran tarif.", {"source": "b.pdf", "chunk": 0}),
+        (chunks[1], {"source": "a.pdf", "chunk": 1}),
+        (chunks[2], {"source": "a.pdf", "chunk": 2}),
+    ]
+    blocks, context, stats = pack_context(results, budget_tokens=10000)
+    assert [(b["source"], b["chunks"]) for b in blocks] == [("a.pdf", [1, 2]), ("b.pdf", [0])]
+    assert blocks[0]["text"] == _merge_overlap(chunks[1], chunks[2])
+    assert context.startswith("[1] Source: a.pdf (chunk 1–2)")
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+def test_pack_context_respects_budget():
+    chunks = chunk_text(TEXT, size=300, overlap=0)
+    results = [(c, {"source": f"{i}.pdf", "chunk": 0}) for i, c in enumerate(chunks)]
+    blocks, _, stats = pack_context(results, budget_tokens=200)
+    assert stats["tokens_after"] <= 200
+    assert 0 < len(blocks) < len(chunks)
@@ -0,0 +1,20 @@
+from embedcache import EmbeddingCache
+
+def test_embed_computes_only_unique_misses_per_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "e.sqlite"))
+    calls = []
+    def compute(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+    assert cache.embed("m1", ["ab", "abc", "ab"], compute) == [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]]
+    assert cache.embed("m1", ["abc", "abcd"], compute) == [[3.0, 0.5], [4.0, 0.5]]
+    cache.embed("m2", ["ab"], compute)
+    assert calls == [["ab", "abc"], ["abcd"], ["ab"]]
+    assert cache.stats()["entries"] == 4
+
+def test_size_stays_bounded(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "e.sqlite"), max_bytes=3 * 8)  # 3 vektor 2-dimensi float32
+    cache.put_many("m", ["a", "b", "c"], [[1, 1]] * 3)
+    assert cache.get_many("m", ["a", "c"]) == [[1.0, 1.0], [1.0, 1.0]]
+    cache.put_many("m", ["d"], [[2, 2]])
+    assert cache.stats()["bytes"] <= 3 * 8
@@ -0,0 +1,55 @@
+import time
+import threading
+
+import pytest
+
+import embedserver
+from embedserver import MicroBatcher
+
+def fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+    return encode
+
+def test_concurrent_requests_share_a_batch_and_get_their_own_vectors():
+    calls, entered, gate = [], threading.Event(), threading.Event()
+    def slow_encode(texts):
+        entered.set()
+        gate.wait(5)
+        return fake_encode(calls)(texts)
+    batcher = MicroBatcher(slow_encode, max_batch=64, max_wait_ms=50)
+    results = {}
+    def submit(i, texts): results[i] = batcher.submit(texts)
+    first = threading.Thread(target=submit, args=(0, ["a"]))
+    first.start()  # menahan thread batcher di encode sementara permintaan lain antri
+    assert entered.wait(5)
+    others = [threading.Thread(target=submit, args=(i, ["x" * i, "a"])) for i in range(1, 6)]
+    for t in others: t.start()
+    while batcher._queue.qsize() < len(others): time.sleep(0.001)
+    gate.set()
+    for t in [first] + others: t.join(5)
+    assert results[0] == [[1.0, 1.0]]
+    for i in range(1, 6):
+        assert results[i] == [[float(i), 1.0], [1.0, 1.0]]
+    assert len(calls) == 2 and len(calls[1]) == len(set(calls[1]))  # antrian digabung, teks unik
+    assert batcher.stats()["requests"] == 6
+
+def test_encode_errors_reach_the_caller():
+    def broken(texts): raise RuntimeError("model rusak")
+    batcher = MicroBatcher(broken, max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="model rusak"):
+        batcher.submit(["a"])
+    assert batcher.submit([]) == []
+
+def test_http_round_trip():
+    server = embedserver.serve(fake_encode([]), port=0, max_wait_ms=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = embedserver.connect(url=f"http://127.0.0.1:{server.server_address[1]}")
+        assert client(["ab", "c"]) == [[2.0, 1.0], [1.0, 1.0]]
+        with pytest.raises(ValueError):
+            embedserver.connect("model-lain", url=client.url)
+    finally:
+        server.shutdown()
+        server.server_close()
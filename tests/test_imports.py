@@ -0,0 +1,17 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_ingest_does_not_import_tiktoken_or_numpy_eagerly():
+    code = "import sys, ingest, contextpack, batchqa; print(sorted({'tiktoken', 'numpy'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+def test_token_helpers_fall_back_without_encoder(monkeypatch):
+    import ingest
+    monkeypatch.setattr(ingest, "get_encoder", lambda name="cl100k_base": None)
+    assert ingest.count_tokens("a" * 40) == 10
+    assert ingest.truncate_tokens("a" * 40, 2) == "a" * 8
+    assert [n for _, n in ingest.iter_chunks("a" * 100, size=40, overlap=0)] == [10, 10, 5]
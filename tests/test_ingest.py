@@ -0,0 +1,106 @@
+from ingest import BatchWriter, chunk_id
+
+class FakeCollection:
+    """Koleksi in-memory dengan API get/add/update/delete yang dipakai BatchWriter."""
+
+    def __init__(self, fail_add_for=()):
+        self.rows = {}
+        self.fail_add_for = set(fail_add_for)
+
+    def get(self, where=None, include=None):
+        ids = [i for i, (_, m) in self.rows.items() if m["source"] == where["source"]]
+        return {"ids": ids, "metadatas": [self.rows[i][1] for i in ids]}
+
+    def add(self, documents, ids, metadatas):
+        if any(m["source"] in self.fail_add_for for m in metadatas):
+            raise RuntimeError("add gagal")
+        for d, i, m in zip(documents, ids, metadatas):
+            self.rows.setdefault(i, (d, m))
+
+    def update(self, ids, metadatas):
+        for i, m in zip(ids, metadatas):
+            self.rows[i] = (self.rows[i][0], m)
+
+    def delete(self, ids):
+        for i in ids: self.rows.pop(i, None)
+
+def _write(collection, sources, batch_size=2):
+    done = []
+    writer = BatchWriter(collection, batch_size=batch_size, on_source=lambda src, info: done.append(src))
+    writer.start()
+    for source, chunks in sources:
+        writer.submit(source, [(c, 1) for c in chunks])
+    writer.close()
+    return writer, done
+
+def test_chunk_id_is_deterministic_per_source():
+    assert chunk_id("a.pdf", "teks") == chunk_id("a.pdf", "teks")
+    assert chunk_id("a.pdf", "teks") != chunk_id("b.pdf", "teks")
+
+def test_dedup_skip_and_stale_delete():
+    col = FakeCollection()
+    writer, done = _write(col, [("a.pdf", ["satu", "dua", "dua", "tiga"])])
+    assert writer.added == 3 and done == ["a.pdf"]
+    writer, done = _write(col, [("a.pdf", ["dua", "empat"])])
+    assert writer.skipped == 1 and writer.added == 1 and writer.deleted == 2
+    assert sorted(d for d, _ in col.rows.values()) == ["dua", "empat"]
+    assert col.rows[chunk_id("a.pdf", "dua")][1]["chunk"] == 0  # posisi diperbarui tanpa embed ulang
+
+def test_failed_add_keeps_old_chunks_and_skips_on_source():
+    col = FakeCollection()
+    _write(col, [("a.pdf", ["lama satu", "lama dua"])])
+    col.fail_add_for = {"a.pdf"}
+    writer, done = _write(col, [("a.pdf", ["baru satu", "baru dua", "baru tiga"]), ("b.pdf", ["lain"])], batch_size=2)
+    assert writer.failed_sources == {"a.pdf", "b.pdf"}  # b.pdf ikut batch terakhir a.pdf yang gagal
+    assert sorted(d for d, m in col.rows.values() if m["source"] == "a.pdf") == ["lama dua", "lama satu"]
+    assert done == []
+    col.fail_add_for = set()
+    writer, done = _write(col, [("b.pdf", ["lain"])])
+    assert done == ["b.pdf"] and writer.failed_sources == set()
+
+def test_failed_add_keeps_old_chunk_positions():
+    col = FakeCollection()
+    _write(col, [("a.pdf", ["satu", "dua"])])
+    col.fail_add_for = {"a.pdf"}
+    writer, _ = _write(col, [("a.pdf", ["nol", "satu", "dua"])])
+    assert writer.failed_sources == {"a.pdf"}
+    assert {d: m["chunk"] for d, m in col.rows.values()} == {"satu": 0, "dua": 1}
+
+def test_chunk_spool_spills_to_disk_and_survives_pickle():
+    import os
+    import pickle
+    from ingest import ChunkSpool
+    spool = ChunkSpool(max_bytes=10)
+    items = [(f"chunk {i}\nbaris", i) for i in range(5)]
+    for chunk, n in items: spool.append(chunk, n)
+    assert spool.path and os.path.exists(spool.path) and spool.chunks == []
+    copy = pickle.loads(pickle.dumps(spool))
+    assert len(copy) == 5 and list(copy) == items and list(copy) == items
+    copy.discard()
+    assert not os.path.exists(spool.path)
+
+def test_run_pipeline_with_small_chunk_cap(tmp_path):
+    import os
+    import tempfile
+    from ingest import run_pipeline
+    doc = tmp_path / "a.txt"
+    doc.write_text(" ".join(f"kalimat nomor {i}." for i in range(2000)), encoding="utf-8")
+    before = set(os.listdir(tempfile.gettempdir()))
+    col = FakeCollection()
+    stats = run_pipeline([("a.txt", str(doc))], col, size=300, overlap=0, workers=1, max_chunk_bytes=1000)
+    assert stats["chunks"] == stats["extracted"] == len(col.rows) > 10 and stats["failed_sources"] == []
+    assert not {f for f in set(os.listdir(tempfile.gettempdir())) - before if f.startswith("rag-chunks-")}
+
+def test_spool_upload_removes_partial_file_on_error(tmp_path):
+    import io
+    import os
+    import pytest
+    from ingest import spool_upload
+    class Broken(io.BytesIO):
+        def read(self, *args):
+            raise OSError("upload terputus")
+    path = spool_upload(io.BytesIO(b"isi"), dir=str(tmp_path))
+    assert open(path, "rb").read() == b"isi"
+    with pytest.raises(OSError):
+        spool_upload(Broken(b"x"), dir=str(tmp_path))
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(path)]
@@ -0,0 +1,68 @@
+import threading
+
+import n8nstub
+from n8noutbox import WebhookOutbox, PENDING, SENDING, SENT, FAILED
+
+class _RaceAfterSelect:
+    """Koneksi sqlite yang menjalankan `between()` tepat setelah SELECT kandidat (simulasi proses lain)."""
+
+    def __init__(self, db, between):
+        self._db, self._between = db, between
+
+    def execute(self, sql, *args):
+        cur = self._db.execute(sql, *args)
+        if sql.startswith("SELECT id, webhook_url") and self._between:
+            rows, between, self._between = cur.fetchall(), self._between, None
+            between()
+            return type("Rows", (), {"fetchall": lambda _: rows})()
+        return cur
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def test_two_outboxes_never_claim_the_same_row(tmp_path):
+    path = str(tmp_path / "outbox.sqlite")
+    a, b = WebhookOutbox(path), WebhookOutbox(path)
+    ids = [a.enqueue("http://127.0.0.1:9/x", {"n": i}) for i in range(10)]
+    claimed_a = []
+    b._db = _RaceAfterSelect(b._db, lambda: claimed_a.extend(r[0] for r in a._claim_due()))
+    claimed_b = [r[0] for r in b._claim_due()]
+    assert sorted(claimed_a) == ids and claimed_b == []
+
+def test_fresh_claim_survives_new_process_but_expired_lease_is_requeued(tmp_path):
+    path = str(tmp_path / "outbox.sqlite")
+    a = WebhookOutbox(path)
+    outbox_id = a.enqueue("http://127.0.0.1:9/x", {"n": 1})
+    assert [r[0] for r in a._claim_due()] == [outbox_id]
+    assert WebhookOutbox(path).status([outbox_id])[outbox_id]["status"] == SENDING
+    c = WebhookOutbox(path, lease=0)
+    assert c.status([outbox_id])[outbox_id]["status"] == PENDING
+
+def test_deliver_retries_then_sends(tmp_path, monkeypatch):
+    down = [True]
+    monkeypatch.setattr(n8nstub.random, "random", lambda: 0.0 if down[0] else 1.0)
+    log = []
+    server = n8nstub.serve(port=0, fail_rate=0.5, log=log)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/webhook/tinjauan"
+    try:
+        outbox = WebhookOutbox(str(tmp_path / "outbox.sqlite"), base_delay=0, max_attempts=3)
+        ids = [outbox.enqueue(url, {"decision": "setuju"}), outbox.enqueue(url, {"decision": "tolak"})]
+        assert outbox.deliver_due() == 2
+        state = outbox.status(ids)[ids[0]]
+        assert state["status"] == PENDING and state["attempts"] == 1 and "503" in state["last_error"]
+        down[0] = False
+        assert outbox.deliver_due() == 2
+        assert {v["status"] for v in outbox.status(ids).values()} == {SENT}
+        assert [e["status"] for e in log] == [503, 503, 200, 200]
+    finally:
+        server.shutdown()
+
+def test_unexpected_error_does_not_leave_row_sending(tmp_path):
+    outbox = WebhookOutbox(str(tmp_path / "outbox.sqlite"), base_delay=0, max_attempts=1)
+    def boom(*args, **kwargs): raise RuntimeError("rusak")
+    outbox.session.post = boom
+    outbox_id = outbox.enqueue("http://127.0.0.1:9/x", {"n": 1})
+    outbox.deliver_due()
+    state = outbox.status([outbox_id])[outbox_id]
+    assert state["status"] == FAILED and "RuntimeError" in state["last_error"]
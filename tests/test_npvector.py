@@ -0,0 +1,53 @@
+import numpy as np
+
+from npvector import NumpyVectorClient
+
+def _vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+def test_query_matches_brute_force_cosine(tmp_path):
+    col = NumpyVectorClient(str(tmp_path)).get_or_create_collection("c")
+    vecs = _vectors(300)
+    col.add(ids=[f"d{i}" for i in range(300)], embeddings=vecs.tolist(), documents=[f"doc {i}" for i in range(300)],
+            metadatas=[{"source": "a.pdf" if i % 2 else "b.pdf"} for i in range(300)])
+    queries = _vectors(5, seed=1)
+    res = col.query(query_embeddings=queries.tolist(), n_results=7)
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    sims = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T
+    for q in range(5):
+        expected = [f"d{i}" for i in np.argsort(-sims[q])[:7]]
+        assert res["ids"][q] == expected
+        assert np.allclose(res["distances"][q], 1 - np.sort(sims[q])[::-1][:7], atol=1e-5)
+    filtered = col.query(query_embeddings=queries[:1].tolist(), n_results=5, where={"source": "a.pdf"})
+    assert all(m["source"] == "a.pdf" for m in filtered["metadatas"][0])
+
+def test_delete_frees_rows_for_reuse(tmp_path):
+    col = NumpyVectorClient(str(tmp_path)).get_or_create_collection("c")
+    vecs = _vectors(4)
+    col.add(ids=["a", "b", "c"], embeddings=vecs[:3].tolist())
+    col.delete(ids=["b"])
+    col.add(ids=["d", "a"], embeddings=[vecs[3].tolist(), vecs[0].tolist()])  # "a" sudah ada: dilewati
+    assert col.count() == 3
+    assert col.query(query_embeddings=[vecs[3].tolist()], n_results=1)["ids"] == [["d"]]
+    assert col.get(ids=["b"])["ids"] == []
+
+def test_two_handles_on_one_dir_do_not_share_rows(tmp_path):
+    a = NumpyVectorClient(str(tmp_path)).get_or_create_collection("c")
+    b = NumpyVectorClient(str(tmp_path)).get_or_create_collection("c")
+    v1, v2 = _vectors(2)
+    a.add(ids=["p2"], embeddings=[v2.tolist()], documents=["dua"])
+    b.add(ids=["p1"], embeddings=[v1.tolist()], documents=["satu"])
+    for handle in (a, b):
+        assert handle.count() == 2
+        assert handle.query(query_embeddings=[v1.tolist()], n_results=1)["ids"] == [["p1"]]
+        assert handle.query(query_embeddings=[v2.tolist()], n_results=1)["ids"] == [["p2"]]
+
+def test_handle_sees_rows_written_after_it_opened(tmp_path):
+    reader = NumpyVectorClient(str(tmp_path)).get_or_create_collection("c")
+    writer = NumpyVectorClient(str(tmp_path)).get_or_create_collection("c")
+    vecs = _vectors(1500)  # melewati kapasitas awal: file vektor tumbuh setelah reader dibuka
+    writer.add(ids=[f"d{i}" for i in range(1500)], embeddings=vecs.tolist())
+    assert reader.count() == 1500
+    assert reader.query(query_embeddings=[vecs[1400].tolist()], n_results=1)["ids"] == [["d1400"]]
+    writer.delete(ids=["d1400"])
+    assert "d1400" not in reader.query(query_embeddings=[vecs[1400].tolist()], n_results=3)["ids"][0]
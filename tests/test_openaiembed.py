@@ -0,0 +1,38 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from openaiembed import OpenAIEmbeddingDispatcher, TokenBucket, pack_requests, retry_delay, _parse_duration
+from fakes import FakeEmbeddingServer
+
+def test_pack_requests_respects_token_and_input_budgets():
+    assert pack_requests([3, 3, 3, 3], max_request_tokens=6) == [[0, 1], [2, 3]]
+    assert pack_requests([10, 1, 1], max_request_tokens=6) == [[0], [1, 2]]  # teks besar tetap dikirim sendiri
+    assert pack_requests([1] * 5, max_request_tokens=100, max_inputs=2) == [[0, 1], [2, 3], [4]]
+    assert pack_requests([]) == []
+
+def test_retry_delay_prefers_server_headers():
+    assert _parse_duration("6m0s") == 360 and _parse_duration("20ms") == 0.02 and _parse_duration("1.5") == 1.5
+    assert 0.25 <= retry_delay({"retry-after-ms": "250"}, 0) <= 0.25 * 1.25
+    assert 2.0 <= retry_delay({"x-ratelimit-reset-tokens": "2s"}, 5) <= 2.5
+    assert 8.0 <= retry_delay({}, 3) <= 10.0
+    assert retry_delay(None, 10) <= 75.0
+
+def test_token_bucket_waits_for_refill_and_pause():
+    bucket = TokenBucket(per_minute=600)  # 10 unit/detik
+    assert bucket.acquire(600) == 0.0
+    assert 0.15 <= bucket.acquire(2) < 1.0
+    bucket.pause(0.2)
+    assert bucket.acquire(0) >= 0.15
+
+def test_dispatcher_splits_requests_and_keeps_order():
+    texts = [f"klausul {i} " + "modal " * (i % 7) for i in range(40)]
+    with FakeEmbeddingServer(tpm=1_000_000, rpm=10_000, max_request_tokens=50, base_ms=0) as server:
+        dispatcher = OpenAIEmbeddingDispatcher("uji", "uji", base_url=server.base_url, max_request_tokens=50, concurrency=4)
+        vectors = dispatcher(texts)
+        assert np.allclose(np.asarray(vectors), np.asarray(server.embed(texts)), atol=1e-5)
+        assert server.stats["rejected"] == 0 and dispatcher.stats["requests"] > 1
+    assert dispatcher([]) == []
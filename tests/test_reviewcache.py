@@ -0,0 +1,58 @@
+import sqlite3
+
+from reviewcache import ReviewCache, review_key
+from contractreview import clause_cache_key, clause_hash, incremental_reduce_messages
+
+def test_keys_change_with_every_component():
+    base = review_key("isi", "gpt-4o-mini", "v1", "auto")
+    assert base == review_key("isi", "gpt-4o-mini", "v1", "auto")
+    assert len({base, review_key("isi2", "gpt-4o-mini", "v1", "auto"), review_key("isi", "gpt-4o", "v1", "auto"),
+                review_key("isi", "gpt-4o-mini", "v2", "auto"), review_key("isi", "gpt-4o-mini", "v1", "map")}) == 5
+    assert clause_hash("Pasal 1\n  Modal  dasar") == clause_hash("Pasal 1 Modal dasar")
+    assert clause_cache_key("h", "gpt-4o-mini") != clause_cache_key("h", "gpt-4o")
+
+def test_put_get_and_lru_eviction(tmp_path):
+    cache = ReviewCache(str(tmp_path / "r.sqlite"), max_bytes=300)
+    cache.put("a", "x" * 100)
+    cache.put("b", "y" * 100)
+    assert cache.get("a")[0] == "x" * 100  # a dipakai lebih baru dari b
+    cache.put("c", "z" * 100)
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+
+def test_save_version_upserts_and_prunes(tmp_path):
+    cache = ReviewCache(str(tmp_path / "r.sqlite"), max_bytes=400)
+    for _ in range(3):
+        cache.save_version("kontrak.pdf", "h1", ["a", "b"], ["Pasal 1", "Pasal 2"])
+    assert cache.stats()["versions"] == 1
+    cache.save_version("kontrak.pdf", "h2", ["a", "c"], ["Pasal 1", "Pasal 2 (revisi)"])
+    prior = cache.find_prior_version("kontrak.pdf", "h2", ["a", "c"])
+    assert prior["clause_hashes"] == ["a", "b"]
+    for i in range(20):
+        cache.save_version(f"lain-{i}.pdf", f"x{i}", ["k"] * 5, ["Pasal"] * 5)
+    stats = cache.stats()
+    assert stats["version_bytes"] <= 400 and stats["versions"] < 22
+    assert cache.find_prior_version("kontrak.pdf", "h3", ["a", "c"]) is None  # versi tertua sudah dibuang
+
+def test_old_version_table_is_deduplicated(tmp_path):
+    path = str(tmp_path / "r.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE contract_versions (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,"
+               " content_hash TEXT NOT NULL, clause_hashes TEXT NOT NULL, labels TEXT NOT NULL, created_at REAL NOT NULL)")
+    db.executemany("INSERT INTO contract_versions(name, content_hash, clause_hashes, labels, created_at) VALUES (?, ?, ?, ?, ?)",
+                   [("k.pdf", "h1", '["a"]', '["P1"]', t) for t in (1.0, 2.0)])
+    db.commit()
+    db.close()
+    cache = ReviewCache(path)
+    assert cache.stats()["versions"] == 1
+    cache.save_version("k.pdf", "h1", ["a"], ["P1"])
+    assert cache.stats()["versions"] == 1
+
+def test_incremental_reduce_keeps_changed_clauses_within_budget():
+    clauses = [f"Pasal {i}\nIsi pasal {i}." for i in range(40)]
+    analyses = {i: f"Analisis panjang pasal {i}. " * 30 for i in range(40)}
+    diff = {"changed": [35], "added": [39], "removed": []}
+    messages = incremental_reduce_messages(clauses, analyses, diff, max_tokens=2000)
+    body = messages[1]["content"]
+    assert analyses[35] in body and analyses[39] in body
+    assert analyses[0] in body and analyses[30] not in body
+    assert "### Pasal 30\n(tidak berubah" in body
@@ -0,0 +1,30 @@
+from sourcecatalog import SourceCatalog
+
+class PagedCollection:
+    def __init__(self, rows):
+        self.rows = rows  # list (id, dokumen, metadata)
+
+    def get(self, limit, offset, include=None):
+        page = self.rows[offset:offset + limit]
+        return {"ids": [r[0] for r in page], "documents": [r[1] for r in page], "metadatas": [r[2] for r in page]}
+
+def test_upsert_remove_and_list_per_collection(tmp_path):
+    catalog = SourceCatalog(str(tmp_path / "c.sqlite"))
+    catalog.upsert("k1", "b.pdf", 3, 300, "h-b", ingested_at=1.0)
+    catalog.upsert("k1", "a.pdf", 2, 200, "h-a", ingested_at=1.0)
+    catalog.upsert("k1", "a.pdf", 4, 400, "h-a2", ingested_at=2.0)
+    catalog.upsert("k2", "a.pdf", 1, 10, "h")
+    assert [(r["source"], r["chunks"], r["content_hash"]) for r in catalog.list("k1")] == [("a.pdf", 4, "h-a2"), ("b.pdf", 3, "h-b")]
+    catalog.remove("k1", "b.pdf")
+    assert [r["source"] for r in catalog.list("k1")] == ["a.pdf"]
+    assert len(catalog.list("k2")) == 1
+
+def test_rebuild_scans_collection_pages(tmp_path):
+    catalog = SourceCatalog(str(tmp_path / "c.sqlite"))
+    catalog.upsert("k", "hilang.pdf", 1, 1, "x")
+    rows = [(f"id{i}", "abcd", {"source": "a.pdf" if i % 3 else "b.pdf"}) for i in range(7)]
+    assert catalog.rebuild("k", PagedCollection(rows), page_size=3) == 2
+    listed = {r["source"]: r for r in catalog.list("k")}
+    assert set(listed) == {"a.pdf", "b.pdf"}
+    assert (listed["a.pdf"]["chunks"], listed["a.pdf"]["bytes"]) == (4, 16)
+    assert listed["b.pdf"]["chunks"] == 3
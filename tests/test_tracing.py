@@ -0,0 +1,33 @@
+import socket
+import urllib.request
+
+import tracing
+
+def test_span_records_only_when_enabled():
+    tracing.set_enabled(False)
+    with tracing.span("uji.nonaktif"):
+        pass
+    assert "uji.nonaktif" not in tracing.prometheus_text()
+    tracing.set_enabled(True)
+    try:
+        with tracing.span("uji.aktif"):
+            pass
+        assert "uji.aktif" in tracing.prometheus_text()
+    finally:
+        tracing.set_enabled(False)
+
+def test_metrics_server_binds_loopback_by_default(monkeypatch):
+    monkeypatch.delenv("RAG_METRICS_HOST", raising=False)
+    monkeypatch.setattr(tracing, "_server", None)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = tracing.start_metrics_server(port)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as r:
+            assert r.status == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+        tracing.set_enabled(False)
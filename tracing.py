@@ -0,0 +1,265 @@
+"""Tracing ringan: span berwaktu per tahap, histogram agregat, ekspor Prometheus / JSON lines.
+
+Span hanya dicatat bila metrik global aktif (env RAG_TRACING=1 atau `set_enabled(True)`) atau
+sedang ada trace aktif (mis. panel debug di sidebar). Selain itu `span()` mengembalikan objek
+no-op bersama sehingga overhead-nya hanya satu pengecekan flag + ContextVar.
+
+    with tracing.trace("chat", force=debug) as tr:
+        with tracing.span("collection.query", k=5):
+            ...
+    tr.rows()  # untuk panel debug
+"""
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_TRACES = 50
+
+_enabled = os.getenv("RAG_TRACING", "0") == "1"
+_jsonl_path = os.getenv("RAG_TRACE_JSONL") or None
+_current = contextvars.ContextVar("rag_trace", default=None)
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+def is_enabled():
+    return _enabled
+
+# ---------------- Registry ----------------
+class _Histogram:
+    __slots__ = ("counts", "total", "n", "errors")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.errors = 0
+
+    def quantile(self, q):
+        """Perkiraan kuantil dari bucket (batas atas bucket tempat kuantil jatuh)."""
+        if not self.n: return None
+        target, seen = q * self.n, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Registry:
+    """Histogram durasi per (jenis, label) dan counter, aman dipakai dari beberapa thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist = {}      # (metrik, label) -> _Histogram
+        self._counters = {}  # (metrik, label) -> nilai
+
+    def observe(self, metric, label, seconds, error=False):
+        with self._lock:
+            hist = self._hist.get((metric, label))
+            if hist is None:
+                hist = self._hist[(metric, label)] = _Histogram()
+            hist.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            hist.total += seconds
+            hist.n += 1
+            hist.errors += bool(error)
+
+    def inc(self, metric, label, value=1):
+        with self._lock:
+            self._counters[(metric, label)] = self._counters.get((metric, label), 0) + value
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            hists, counters = sorted(self._hist.items()), sorted(self._counters.items())
+            for metric, label_name in (("rag_stage_seconds", "stage"), ("rag_request_seconds", "kind")):
+                series = [(label, h) for (m, label), h in hists if m == metric]
+                if not series: continue
+                lines.append(f"# TYPE {metric} histogram")
+                for label, h in series:
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, h.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{{label_name}="{label}",le="+Inf"}} {h.n}')
+                    lines.append(f'{metric}_sum{{{label_name}="{label}"}} {h.total:.6f}')
+                    lines.append(f'{metric}_count{{{label_name}="{label}"}} {h.n}')
+            errors = [(label, h.errors) for (m, label), h in hists if m == "rag_stage_seconds" and h.errors]
+            if errors:
+                lines.append("# TYPE rag_stage_errors_total counter")
+                lines.extend(f'rag_stage_errors_total{{stage="{label}"}} {n}' for label, n in errors)
+            for name in sorted({m for (m, _), _ in counters}):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f'{name}{{kind="{label}"}} {v}' for (m, label), v in counters if m == name)
+        return "\n".join(lines) + "\n"
+
+    def jsonl(self):
+        """Satu baris JSON per histogram/counter (snapshot agregat saat ini)."""
+        now = time.time()
+        with self._lock:
+            rows = [{
+                "ts": now, "metric": metric, "label": label, "count": h.n, "sum": h.total, "errors": h.errors,
+                "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts)),
+            } for (metric, label), h in sorted(self._hist.items())]
+            rows += [{"ts": now, "metric": metric, "label": label, "value": v}
+                     for (metric, label), v in sorted(self._counters.items())]
+        return "".join(json.dumps(r) + "\n" for r in rows)
+
+    def summary(self):
+        with self._lock:
+            return [{"tahap": label, "n": h.n, "rata2_ms": h.total / h.n * 1000, "p95_ms<=": (h.quantile(0.95) or 0) * 1000}
+                    for (metric, label), h in sorted(self._hist.items()) if metric == "rag_stage_seconds" and h.n]
+
+REGISTRY = Registry()
+recent = deque(maxlen=RECENT_TRACES)
+
+# ---------------- Span & Trace ----------------
+class _NoopSpan:
+    kind = total = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def set(self, **attrs): pass
+    def rows(self): return []
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    __slots__ = ("stage", "attrs", "started")
+
+    def __init__(self, stage, attrs):
+        self.stage, self.attrs = stage, attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __exit__(self, exc_type, exc, tb):
+        _finish(self.stage, self.started, time.perf_counter() - self.started, self.attrs, exc_type is not None)
+        return False
+
+def _finish(stage, started, seconds, attrs, error):
+    REGISTRY.observe("rag_stage_seconds", stage, seconds, error)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if attrs.get(kind): REGISTRY.inc("rag_llm_tokens_total", kind.split("_")[0], attrs[kind])
+    tr = _current.get()
+    if tr is not None:
+        tr.spans.append((stage, started - tr.started, seconds, dict(attrs, error=True) if error else attrs))
+
+def span(stage, **attrs):
+    """Context manager yang mengukur satu tahap; no-op bila tracing mati dan tidak ada trace aktif."""
+    if not _enabled and _current.get() is None: return _NOOP
+    return _Span(stage, attrs)
+
+def record(stage, seconds, **attrs):
+    """Catat tahap yang durasinya sudah diukur sendiri (mis. dari proses worker atau streaming)."""
+    if not _enabled and _current.get() is None: return
+    now = time.perf_counter()
+    _finish(stage, now - seconds, seconds, attrs, False)
+
+class Trace:
+    """Satu permintaan (chat, upload, review): kumpulan span beserta offset mulainya."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.spans = []
+        self.total = None
+        self.created = time.time()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.total = time.perf_counter() - self.started
+        _current.reset(self._token)
+        REGISTRY.observe("rag_request_seconds", self.kind, self.total, exc_type is not None)
+        recent.append(self)
+        if _jsonl_path:
+            _append_jsonl(self)
+        return False
+
+    def rows(self):
+        return [dict({"tahap": stage, "mulai_ms": round(offset * 1000, 1), "durasi_ms": round(seconds * 1000, 1)}, **attrs)
+                for stage, offset, seconds, attrs in self.spans]
+
+    def as_dict(self):
+        return {"ts": self.created, "kind": self.kind, "total_ms": round((self.total or 0) * 1000, 1), "spans": self.rows()}
+
+def trace(kind, force=False):
+    """Mulai trace untuk satu permintaan. `force=True` (panel debug) mengaktifkan trace walau metrik mati."""
+    if not (_enabled or force): return _NOOP
+    return Trace(kind)
+
+_jsonl_lock = threading.Lock()
+
+def _append_jsonl(tr):
+    try:
+        with _jsonl_lock, open(_jsonl_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(tr.as_dict(), ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        pass
+
+# ---------------- Ekspor ----------------
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+def metrics_jsonl():
+    return REGISTRY.jsonl()
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, host=None):
+    """Endpoint /metrics (Prometheus) dan /metrics.jsonl di thread latar. Port dari RAG_METRICS_PORT,
+    alamat dari RAG_METRICS_HOST (bawaan 127.0.0.1; isi 0.0.0.0 agar bisa di-scrape dari host lain).
+
+    Aman dipanggil berulang (Streamlit rerun): server hanya dibuat sekali per proses.
+    """
+    global _server
+    port = port or os.getenv("RAG_METRICS_PORT")
+    if not port: return None
+    host = host or os.getenv("RAG_METRICS_HOST", "127.0.0.1")
+    with _server_lock:
+        if _server is None:
+            _server = _make_server(host, int(port))
+    return _server
+
+def _make_server(host, port):
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args): pass
+
+        def do_GET(self):
+            if self.path.startswith("/metrics.jsonl"):
+                body, ctype = metrics_jsonl(), "application/x-ndjson"
+            elif self.path.startswith("/metrics"):
+                body, ctype = prometheus_text(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError:
+        return None  # port dipakai proses lain (mis. replika kedua)
+    set_enabled(True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,222 +1,423 @@
 import os
-import io
-import uuid
 import time
+import asyncio
+import hashlib
 import streamlit as st
 
 # ---- Dependencies ----
-try:
-    import chromadb
-    # PERUBAHAN: Impor CloudClient, bukan hanya HttpClient
-    from chromadb import CloudClient
-    from chromadb.utils import embedding_functions
-except Exception as e:
-    st.error(f"Gagal mengimpor chromadb. Pastikan sudah terpasang. Error: {e}")
-    st.stop()
+# chromadb dan model embedding tidak diimpor di sini: dimuat di thread latar (lihat warmup.py)
+# setelah sidebar dirender, dan error impor tampil saat client pertama kali dibutuhkan.
+from chromaconn import (
+    CHROMA_CLOUD, CHROMA_LOCAL, CHROMA_NUMPY, EMBED_OPENAI, EMBED_SENTENCE_TRANSFORMERS, EMBED_ONNX,
+    make_chroma_client, make_embedding_function, open_collection, collection_key as make_collection_key,
+)
 
-try:
-    import tiktoken
-except Exception: tiktoken = None
-try:
-    import docx
-except Exception: docx = None
-try:
-    import PyPDF2
-except Exception: PyPDF2 = None
 try:
     from openai import OpenAI
 except Exception: OpenAI = None
 
+from ingest import run_pipeline, spool_upload, count_tokens, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS
+from embedcache import EmbeddingCache
+from sourcecatalog import SourceCatalog
+from collectionregistry import REGISTRY as COLLECTIONS
+from llmstream import stream_chat, format_timing
+from answercache import SemanticAnswerCache, DEFAULT_THRESHOLD, DEFAULT_TTL
+from bm25index import BM25Index, reciprocal_rank_fusion
+from contextpack import pack_context, chunk_label, DEFAULT_CONTEXT_TOKENS
+from batchqa import (
+    load_questions, query_batch, answer_batch, summarize, default_output_path, ResultWriter,
+    DEFAULT_CONCURRENCY as BATCH_CONCURRENCY, DEFAULT_RPM as BATCH_RPM,
+)
+import tracing
+import warmup
+
+RETRIEVAL_MODES = ["Vektor", "Lexical (BM25, tanpa embedding)", "Hybrid (BM25 + vektor, RRF)"]
+
 st.set_page_config(page_title="Chroma Uploader + RAG Chat", page_icon="📚", layout="wide")
 
 st.title("📚 Chroma Uploader + RAG Chat")
+warmup.mark("first_paint")
 st.caption("Upload dokumen → simpan ke Chroma → tanya dokumen dengan sitasi")
 
 # ---------------- Sidebar: Credentials & Settings ----------------
 with st.sidebar:
     st.header("🔐 Koneksi Chroma")
-    chroma_mode = st.radio("Mode", ["Chroma Cloud", "Local (Persistent)"], index=0)
-    if chroma_mode == "Chroma Cloud":
+    chroma_mode = st.radio("Mode", [CHROMA_CLOUD, CHROMA_LOCAL, CHROMA_NUMPY], index=0,
+                           help="NumPy mmap: indeks vektor in-process tanpa server Chroma, cocok untuk koleksi < 1 juta chunk.")
+    if chroma_mode == CHROMA_CLOUD:
         st.info("Salin kredensial dari halaman 'Connect' database Anda di Chroma Cloud.")
         # PERUBAHAN: Menghapus input Host yang tidak lagi diperlukan
         tenant = st.text_input("Tenant", value="", help="Salin dari halaman koneksi database Anda.")
         database = st.text_input("Database", value="n8nsmallcr", help="Salin dari halaman koneksi database Anda.")
         chroma_api_key = st.text_input("Chroma API Key", type="password", help="Buat dengan tombol 'Create API key'.")
+        persist_dir = None
     else:
-        persist_dir = st.text_input("Persist Directory", value="./chroma_data")
+        persist_dir = st.text_input("Persist Directory", value="./chroma_data" if chroma_mode == CHROMA_LOCAL else "./npvector_data")
         tenant = database = chroma_api_key = None
 
     st.divider()
     st.header("🧠 Embedding Model")
-    embed_choice = st.selectbox("Embedding function", ["OpenAIEmbeddings", "Sentence-Transformers (all-MiniLM-L6-v2)"], index=0)
+    embed_choice = st.selectbox("Embedding function", [EMBED_OPENAI, EMBED_SENTENCE_TRANSFORMERS, EMBED_ONNX], index=0)
     openai_api_key = st.text_input("OPENAI_API_KEY (untuk embeddings & jawaban)", type="password", value=os.getenv("OPENAI_API_KEY", ""))
     openai_model = st.text_input("OpenAI Chat Model", value=os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
     collection_name = st.text_input("Collection Name", value="docs")
     top_k = st.slider("Top-K retrieval", 1, 10, 5)
+    retrieval_mode = st.radio("Mode retrieval", RETRIEVAL_MODES, index=0)
+    context_tokens = st.slider("Anggaran token konteks", 500, 8000, DEFAULT_CONTEXT_TOKENS, step=250)
     chunk_size = st.slider("Chunk size (chars)", 300, 2000, 900, step=50)
     chunk_overlap = st.slider("Chunk overlap (chars)", 0, 400, 150, step=10)
+    ingest_workers = st.slider("Worker ekstraksi (proses)", 1, 16, DEFAULT_WORKERS)
+    batch_size = st.slider("Batch size (chunks per add)", 32, 1024, DEFAULT_BATCH_SIZE, step=32)
+    st.divider()
+    st.header("🗄️ Cache")
+    embed_cache_stats_box = st.empty()
+    use_answer_cache = st.checkbox("Cache jawaban semantik", value=True)
+    answer_cache_threshold = st.slider("Ambang kemiripan (cosine)", 0.80, 1.00, DEFAULT_THRESHOLD, step=0.01)
+    answer_cache_ttl = st.number_input("TTL cache jawaban (detik)", 60, 86400, DEFAULT_TTL, step=60)
+    answer_cache_stats_box = st.empty()
+    st.divider()
+    st.header("🐞 Debug")
+    debug_panel = st.checkbox("Panel latensi per tahap", value=tracing.is_enabled())
+    debug_box = st.container()
 
-# ---------------- Helpers ----------------
-def chunk_text(text, size=900, overlap=150):
-    if not text: return []
-    if tiktoken:
-        try:
-            enc = tiktoken.get_encoding("cl100k_base")
-            toks = enc.encode(text)
-            chunks, i, tok_size, tok_overlap = [], 0, max(50, size // 4), max(0, overlap // 4)
-            while i < len(toks):
-                chunks.append(enc.decode(toks[i:i+tok_size]))
-                i += max(1, tok_size - tok_overlap)
-            return chunks
-        except Exception: pass
-    chunks, i = [], 0
-    while i < len(text):
-        chunks.append(text[i:i+size])
-        i += max(1, size - overlap)
-    return chunks
-
-def read_file(uploaded_file) -> str:
-    name = uploaded_file.name.lower()
-    data = uploaded_file.read()
-    if name.endswith((".txt", ".md")): return data.decode("utf-8", errors="ignore")
-    if name.endswith(".pdf"):
-        if PyPDF2 is None: raise RuntimeError("PyPDF2 belum terpasang.")
-        reader = PyPDF2.PdfReader(io.BytesIO(data))
-        return "\n\n".join([p.extract_text() or "" for p in reader.pages])
-    if name.endswith(".docx"):
-        if docx is None: raise RuntimeError("python-docx belum terpasang.")
-        return "\n".join([p.text for p in docx.Document(io.BytesIO(data)).paragraphs])
-    return data.decode("utf-8", errors="ignore")
+tracing.start_metrics_server()  # hanya bila RAG_METRICS_PORT diset
 
+# ---------------- Helpers ----------------
 @st.cache_resource(show_spinner=False)
+def get_embedding_cache():
+    return EmbeddingCache()
+
+# Nama tugas warm-up ikut berubah saat mode/folder/kunci diganti, sehingga client baru dibuat
+def chroma_task():
+    if chroma_mode == CHROMA_CLOUD:
+        key_hash = hashlib.sha256((chroma_api_key or "").encode("utf-8")).hexdigest()[:12]
+        return f"chroma:{chroma_mode}:{tenant}/{database}:{key_hash}"
+    return f"chroma:{chroma_mode}:{persist_dir}"
+
+def embed_task():
+    if embed_choice == EMBED_OPENAI:
+        return f"embed:{embed_choice}:{hashlib.sha256(openai_api_key.encode('utf-8')).hexdigest()[:12]}"
+    return f"embed:{embed_choice}"
+
 def get_chroma_client():
-    if chroma_mode == "Chroma Cloud":
-        if not (tenant and database and chroma_api_key):
-            st.error("Lengkapi Tenant, Database, dan Chroma API Key.")
-            st.stop()
-        try:
-            # PERUBAHAN BESAR: Menggunakan CloudClient, bukan HttpClient
-            client = CloudClient(
-                tenant=tenant,
-                database=database,
-                api_key=chroma_api_key
-            )
-            client.heartbeat() # Cek koneksi
-            return client
-        except Exception as e:
+    if chroma_mode == CHROMA_CLOUD and not (tenant and database and chroma_api_key):
+        st.error("Lengkapi Tenant, Database, dan Chroma API Key.")
+        st.stop()
+    try:
+        # PERUBAHAN BESAR: Menggunakan CloudClient, bukan HttpClient
+        return warmup.result(chroma_task(), make_chroma_client, chroma_mode, tenant, database, chroma_api_key, persist_dir)
+    except Exception as e:
+        if chroma_mode == CHROMA_CLOUD:
             st.error(f"Gagal konek ke Chroma Cloud: {e}")
-            st.stop()
-    else: # Local Persistent
-        try:
-            client = chromadb.PersistentClient(path=persist_dir)
-            client.heartbeat()
-            return client
-        except Exception as e:
-            st.error(f"Gagal membuat PersistentClient: {e}")
-            st.stop()
+        else:
+            st.error(f"Gagal membuka penyimpanan lokal ({chroma_mode}): {e}")
+        st.stop()
 
-@st.cache_resource(show_spinner=False)
 def get_embedding_function():
-    if embed_choice == "OpenAIEmbeddings":
-        if not openai_api_key:
-            st.error("OPENAI_API_KEY diperlukan.")
-            st.stop()
-        return embedding_functions.OpenAIEmbeddingFunction(
-            api_key=openai_api_key, model_name="text-embedding-3-small"
-        )
-    else:
-        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+    if embed_choice == EMBED_OPENAI and not openai_api_key:
+        st.error("OPENAI_API_KEY diperlukan.")
+        st.stop()
+    return warmup.result(embed_task(), make_embedding_function, embed_choice, openai_api_key, get_embedding_cache())
+
+# Warm-up latar: mulai memuat sumber daya berat selagi halaman dirender (sekali per proses)
+warmup.start("import:chromadb", warmup.timed_import, "chromadb")
+warmup.start("tiktoken", count_tokens, "")
+if chroma_mode != CHROMA_CLOUD or (tenant and database and chroma_api_key):
+    warmup.start(chroma_task(), make_chroma_client, chroma_mode, tenant, database, chroma_api_key, persist_dir)
+if embed_choice != EMBED_OPENAI:
+    warmup.start(embed_task(), make_embedding_function, embed_choice, None, get_embedding_cache())
+
+@st.cache_resource(show_spinner=False)
+def get_source_catalog():
+    return SourceCatalog()
+
+@st.cache_resource(show_spinner=False)
+def get_answer_cache():
+    return SemanticAnswerCache()
+
+@st.cache_resource(show_spinner=False)
+def get_bm25_index():
+    return BM25Index()
+
+def collection_key():
+    return make_collection_key(chroma_mode, collection_name, tenant=tenant, database=database, persist_dir=persist_dir)
 
 def get_or_create_collection():
     client = get_chroma_client()
     emb_func = get_embedding_function()
-    return client.get_or_create_collection(
-        name=collection_name, embedding_function=emb_func, metadata={"hnsw:space": "cosine"}
-    )
+    # Handle di-cache per proses (lihat collectionregistry.py), bukan round-trip per aksi
+    return open_collection(client, collection_name, emb_func, COLLECTIONS, chroma_task())
 
 # Sisa kode (fungsi RAG, tabs) tidak perlu diubah secara signifikan
 # ... (kode lainnya tetap sama) ...
-def build_prompt(question, results):
-    numbered = []
-    for i, (doc, meta) in enumerate(results, start=1):
-        src, chunk_idx = meta.get("source", "?"), meta.get("chunk", "?")
-        numbered.append(f"[{i}] Source: {src} (chunk {chunk_idx}) — {doc.strip()}")
-    context = "\n\n".join(numbered)
+def retrieve_contexts(questions, mode, query_embeddings=None):
+    """Top-k pasangan (dokumen, metadata) per pertanyaan; semua query vektor dikirim dalam satu
+    collection.query. Mode lexical tidak memanggil Chroma."""
+    bm25 = get_bm25_index()
+    if mode == RETRIEVAL_MODES[1]:
+        with tracing.span("bm25.search", k=top_k, queries=len(questions)):
+            return [[(doc, meta) for _, _, doc, meta in bm25.search(collection_key(), q, top_k)] for q in questions]
+    hits = query_batch(get_or_create_collection(), top_k, query_embeddings=query_embeddings)
+    results = []
+    for question, (ids, docs, metas) in zip(questions, hits):
+        if mode == RETRIEVAL_MODES[0]:
+            results.append(list(zip(docs, metas)))
+            continue
+        with tracing.span("bm25.search", k=top_k):
+            lexical = bm25.search(collection_key(), question, top_k)
+        by_id = {cid: (doc, meta) for cid, _, doc, meta in lexical}
+        by_id.update(zip(ids, zip(docs, metas)))
+        fused = reciprocal_rank_fusion(ids, [cid for cid, *_ in lexical], limit=top_k)
+        results.append([by_id[cid] for cid in fused])
+    return results
+
+def retrieve_context(question, mode, query_embedding=None):
+    return retrieve_contexts([question], mode, [query_embedding])[0]
+
+def build_prompt(question, results, budget_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Prompt RAG dengan konteks yang dikemas (lihat contextpack); blok dikembalikan untuk daftar sumber [n]."""
+    with tracing.span("build_prompt") as sp:
+        blocks, context, pack_stats = pack_context(results, budget_tokens)
+        sp.set(tokens=pack_stats["tokens_after"])
     system = "Anda adalah asisten yang menjawab hanya dari konteks berikut. Berikan jawaban ringkas dan tambahkan sitasi [n] pada klaim penting."
     user = f"Pertanyaan: {question}\n\nKonteks:\n{context}\n\nInstruksi: Jawab ringkas, lalu daftar sumber yang dirujuk."
-    return system, user
+    return system, user, blocks, pack_stats
 
 def openai_answer(system_msg, user_msg):
+    """Streaming jawaban langsung ke halaman; mengembalikan teks lengkap."""
     if OpenAI is None or not openai_api_key:
         st.error("OPENAI_API_KEY tidak tersedia/valid.")
         st.stop()
     client = OpenAI(api_key=openai_api_key)
+    stats = {}
     try:
-        resp = client.chat.completions.create(
+        answer = st.write_stream(stream_chat(
+            client.chat.completions.create, stats,
             model=openai_model, messages=[{"role":"system","content":system_msg}, {"role":"user","content":user_msg}],
-            temperature=0.2)
-        return resp.choices[0].message.content
+            temperature=0.2))
+        st.caption(format_timing(stats))
+        return answer
     except Exception as e:
         st.error(f"Gagal memanggil OpenAI API: {e}")
         return None
 
-tab_up, tab_list, tab_chat = st.tabs(["⬆️ Upload", "📄 List Dokumen", "💬 Chat"])
+tab_up, tab_list, tab_chat, tab_batch = st.tabs(["⬆️ Upload", "📄 List Dokumen", "💬 Chat", "🧪 Batch QA"])
 
 with tab_up:
     st.subheader("Upload Dokumen")
     uploader = st.file_uploader("Pilih file (.pdf, .docx, .txt, .md)", accept_multiple_files=True, type=["pdf","docx","txt","md"])
     if uploader and st.button("🚀 Upload ke Chroma"):
         collection = get_or_create_collection()
-        with st.spinner("Memproses & mengunggah..."):
-            total_chunks = 0
-            for f in uploader:
-                try:
-                    text = read_file(f)
-                    chunks = chunk_text(text, size=chunk_size, overlap=chunk_overlap)
-                    if not chunks:
-                        st.warning(f"File {f.name} tidak menghasilkan chunk.")
-                        continue
-                    ids = [f"{f.name}-{i}-{uuid.uuid4().hex[:8]}" for i in range(len(chunks))]
-                    metadatas = [{"source": f.name, "chunk": i} for i in range(len(chunks))]
-                    collection.add(documents=chunks, ids=ids, metadatas=metadatas)
-                    total_chunks += len(chunks)
-                except Exception as e:
-                    st.error(f"Gagal upload {f.name}: {e}")
-            if total_chunks > 0:
-                st.success(f"Selesai. Total chunks diunggah: {total_chunks}")
+        progress = st.progress(0.0, text="Memproses & mengunggah...")
+        status = st.empty()
+        done = {"n": 0}
+
+        def on_file(name, n_chunks, error):
+            done["n"] += 1
+            progress.progress(done["n"] / len(uploader), text=f"Diekstrak {done['n']}/{len(uploader)} file")
+            if error is not None:
+                st.error(f"Gagal upload {name}: {error}")
+            elif not n_chunks:
+                st.warning(f"File {name} tidak menghasilkan chunk.")
+            else:
+                status.caption(f"✔️ {name}: {n_chunks} chunks")
+
+        catalog, catalog_key = get_source_catalog(), collection_key()
+        with tracing.trace("upload", force=debug_panel) as tr:
+            # Upload ditulis ke file sementara; worker membaca per halaman dari disk. Path dicatat satu
+            # per satu di dalam try, sehingga file yang sudah dibuat tetap dihapus bila upload berikutnya gagal.
+            files = []
+            try:
+                with tracing.span("spool_upload", files=len(uploader)):
+                    for f in uploader:
+                        files.append((f.name, spool_upload(f, suffix=os.path.splitext(f.name)[1])))
+                with st.spinner("Menulis batch ke Chroma..."):
+                    stats = run_pipeline(files, collection, size=chunk_size, overlap=chunk_overlap,
+                                         batch_size=batch_size, workers=ingest_workers, on_file=on_file,
+                                         on_source=lambda src, info: catalog.upsert(catalog_key, src, info["chunks"], info["bytes"], info["content_hash"]),
+                                         mirrors=[get_bm25_index().for_collection(catalog_key)])
+            finally:
+                for _, path in files:
+                    os.remove(path)
+        st.session_state.last_trace = tr
+        progress.progress(1.0, text="Selesai")
+        for srcs, msg in stats["write_errors"]:
+            st.error(f"Gagal menulis batch ({srcs}): {msg}")
+        if stats["failed_sources"]:
+            st.warning("Tidak tersimpan utuh (versi lama dipertahankan, unggah ulang): " + ", ".join(stats["failed_sources"]))
+        if stats["chunks"] or stats["deleted"]:
+            get_answer_cache().invalidate(catalog_key)
+        if stats["chunks"] or stats["skipped"] or stats["deleted"]:
+            st.success(f"Selesai. Chunks baru diunggah: {stats['chunks']}, sudah ada (dilewati): {stats['skipped']}, "
+                       f"usang dihapus: {stats['deleted']} "
+                       f"({stats['batches']} batch, {stats['seconds']:.1f} dtk, {stats['chunks_per_sec']:.1f} chunks/dtk)")
 
 with tab_list:
     st.subheader("Daftar Dokumen")
-    if st.button("🔄 Refresh Daftar"):
-        collection = get_or_create_collection()
-        count = collection.count()
-        st.write(f"Total entri (chunks) dalam koleksi: {count}")
-        if count > 0:
-            with st.spinner("Mengambil daftar sumber..."):
-                entries = collection.get(limit=count, include=["metadatas"])
-                sources = sorted(list(set(m.get('source', 'unknown') for m in entries['metadatas'])))
-                st.dataframe(sources, use_container_width=True)
+    catalog = get_source_catalog()
+    col_refresh, col_rebuild = st.columns(2)
+    col_refresh.button("🔄 Refresh Daftar")
+    if col_rebuild.button("🛠️ Rebuild Katalog & Indeks", help="Susun ulang katalog dan indeks BM25 dari isi koleksi bila tidak sesuai."):
+        with st.spinner("Memindai koleksi untuk menyusun ulang katalog dan indeks BM25..."):
+            n_sources = catalog.rebuild(collection_key(), get_or_create_collection())
+            n_indexed = get_bm25_index().rebuild(collection_key(), get_or_create_collection())
+        st.success(f"Katalog disusun ulang: {n_sources} sumber, {n_indexed} chunks terindeks BM25.")
+    rows = catalog.list(collection_key())
+    st.write(f"Total sumber: {len(rows)} · Total entri (chunks): {sum(r['chunks'] for r in rows)}")
+    if rows:
+        st.dataframe(
+            [{"Sumber": r["source"], "Chunks": r["chunks"], "Ukuran (KB)": round(r["bytes"] / 1024, 1),
+              "Diingest": time.strftime("%Y-%m-%d %H:%M", time.localtime(r["ingested_at"])),
+              "Hash": r["content_hash"][:12]} for r in rows],
+            use_container_width=True,
+        )
+        to_delete = st.multiselect("Hapus sumber", [r["source"] for r in rows])
+        if to_delete and st.button("🗑️ Hapus dari Koleksi"):
+            collection = get_or_create_collection()
+            for src in to_delete:
+                collection.delete(where={"source": src})
+                catalog.remove(collection_key(), src)
+                get_bm25_index().delete_source(collection_key(), src)
+            get_answer_cache().invalidate(collection_key())
+            st.success(f"{len(to_delete)} sumber dihapus.")
+            st.rerun()
 
 with tab_chat:
     st.subheader("Tanya Dokumen Anda")
     question = st.text_input("Pertanyaan")
     if st.button("Kirim Pertanyaan") and question.strip():
-        collection = get_or_create_collection()
-        with st.spinner("Mengambil konteks dari Chroma..."):
-            qres = collection.query(query_texts=[question], n_results=top_k, include=["documents", "metadatas"])
-        docs = (qres.get("documents") or [[]])[0]
-        metas = (qres.get("metadatas") or [[]])[0]
-        if not docs:
-            st.warning("Tidak ada hasil relevan ditemukan di dokumen.")
-        else:
-            pairs = list(zip(docs, metas))
-            system_msg, user_msg = build_prompt(question, pairs)
-            with st.spinner("Menyusun jawaban..."):
-                answer = openai_answer(system_msg, user_msg)
-            if answer:
+        with tracing.trace("chat", force=debug_panel) as tr:
+            answer_cache, cache_scope = get_answer_cache(), f"{openai_model}|{embed_choice}|k={top_k}|{retrieval_mode}|ctx={context_tokens}"
+            started = time.perf_counter()
+            lexical_only = retrieval_mode == RETRIEVAL_MODES[1]
+            # Embedding pertanyaan dihitung sekali: untuk cache semantik dan untuk query Chroma.
+            # Mode lexical sama sekali tidak memanggil embedding (dan karenanya tidak memakai cache semantik).
+            query_embedding = None if lexical_only else get_embedding_function()([question])[0]
+            cached = cache_version = None
+            if use_answer_cache and not lexical_only:
+                with tracing.span("answer_cache.lookup") as sp:
+                    cached, cache_version = answer_cache.lookup(collection_key(), cache_scope, query_embedding,
+                                                                answer_cache_threshold, answer_cache_ttl)
+                    sp.set(hit=cached is not None)
+            if cached:
+                (answer, blocks), similarity = cached
                 st.markdown("### 🧾 Jawaban")
                 st.write(answer)
+                st.caption(f"⚡ Dari cache (kemiripan {similarity:.3f})")
+            else:
+                with st.spinner("Mengambil konteks..."):
+                    retrieval_started = time.perf_counter()
+                    pairs = retrieve_context(question, retrieval_mode, query_embedding)
+                    retrieval_ms = (time.perf_counter() - retrieval_started) * 1000
+                answer = None
+                if not pairs:
+                    st.warning("Tidak ada hasil relevan ditemukan di dokumen.")
+                else:
+                    system_msg, user_msg, blocks, pack_stats = build_prompt(question, pairs, context_tokens)
+                    st.markdown("### 🧾 Jawaban")
+                    answer = openai_answer(system_msg, user_msg)
+                    st.caption(f"🔎 Retrieval {retrieval_mode}: {retrieval_ms:.0f} ms · "
+                               f"konteks {pack_stats['tokens_before']} → {pack_stats['tokens_after']} token")
+                    if answer and use_answer_cache and not lexical_only:
+                        answer_cache.store(collection_key(), cache_scope, query_embedding, (answer, blocks),
+                                           time.perf_counter() - started, cache_version)
+            if answer:
                 st.markdown("### 📚 Sumber yang Digunakan")
-                for i, (doc, m) in enumerate(pairs, start=1):
-                    with st.expander(f"Sumber [{i}]: {m.get('source','?')} (chunk {m.get('chunk','?')})"):
-                        st.write(doc)
+                for i, block in enumerate(blocks, start=1):
+                    with st.expander(f"Sumber [{i}]: {block['source']} (chunk {chunk_label(block['chunks'])})"):
+                        st.write(block["text"])
+        st.session_state.last_trace = tr
+
+with tab_batch:
+    st.subheader("Tanya-Jawab Massal")
+    st.caption("Satu pertanyaan per baris (.txt), kolom `question`/`pertanyaan` (.csv), atau JSONL. "
+               "Retrieval memakai satu query Chroma untuk semua pertanyaan; cache jawaban tidak dipakai.")
+    question_file = st.file_uploader("File pertanyaan", type=["txt", "csv", "jsonl"], key="batch_questions")
+    col_a, col_b, col_c = st.columns(3)
+    batch_concurrency = col_a.slider("Panggilan LLM bersamaan", 1, 32, BATCH_CONCURRENCY)
+    batch_rpm = col_b.number_input("Batas panggilan / menit", 10, 10000, BATCH_RPM, step=10)
+    batch_format = col_c.radio("Format hasil", ["jsonl", "csv"], horizontal=True)
+    if question_file and st.button("▶️ Jalankan batch"):
+        skipped, load_error = [], None
+        try:
+            questions = load_questions(question_file.getvalue(), question_file.name, skipped)
+        except Exception as e:  # mis. CSV rusak
+            questions, load_error = [], e
+        if skipped:
+            st.warning(f"{len(skipped)} baris dilewati:\n\n" + "\n".join(f"- {m}" for m in skipped[:20]))
+        if load_error is not None:
+            st.error(f"File pertanyaan tidak dapat dibaca: {load_error}")
+        elif not questions:
+            st.warning("Tidak ada pertanyaan di file.")
+        elif OpenAI is None or not openai_api_key:
+            st.error("OPENAI_API_KEY tidak tersedia/valid.")
+        else:
+            with tracing.trace("batch", force=debug_panel) as tr:
+                started = time.perf_counter()
+                with st.spinner(f"Retrieval untuk {len(questions)} pertanyaan..."):
+                    embeddings = None if retrieval_mode == RETRIEVAL_MODES[1] else get_embedding_function()(questions)
+                    contexts = retrieve_contexts(questions, retrieval_mode, embeddings)
+                retrieval_seconds = time.perf_counter() - started
+                jobs = []
+                for i, (q, pairs) in enumerate(zip(questions, contexts)):
+                    job = {"index": i, "question": q}
+                    if pairs:
+                        system_msg, user_msg, blocks, _ = build_prompt(q, pairs, context_tokens)
+                        job["messages"] = [{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}]
+                        job["sources"] = [f"{b['source']} (chunk {chunk_label(b['chunks'])})" for b in blocks]
+                    jobs.append(job)
+                progress = st.progress(0.0, text="Menjawab...")
+                out_path = default_output_path(collection_name, batch_format)
+                done = {"n": 0}
+                with ResultWriter(out_path) as writer:
+                    def on_result(row):
+                        writer.write(row)
+                        done["n"] += 1
+                        progress.progress(done["n"] / len(jobs), text=f"{done['n']}/{len(jobs)} pertanyaan selesai")
+                    rows = asyncio.run(answer_batch(jobs, openai_api_key, openai_model, batch_concurrency, batch_rpm,
+                                                    on_result, temperature=0.2))
+                summary = summarize(rows, time.perf_counter() - started, retrieval_seconds)
+            st.session_state.last_trace = tr
+            st.session_state.batch_result = (summary, rows, out_path)
+    if st.session_state.get("batch_result"):
+        summary, rows, out_path = st.session_state.batch_result
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Pertanyaan", summary["questions"], f"{summary['errors']} gagal", delta_color="inverse")
+        m2.metric("Throughput", f"{summary['questions_per_sec']:.2f}/dtk")
+        m3.metric("Latensi p50 / p95", f"{(summary['latency_p50_ms'] or 0) / 1000:.1f} / {(summary['latency_p95_ms'] or 0) / 1000:.1f} dtk")
+        m4.metric("Retrieval (semua)", f"{summary['retrieval_ms']:.0f} ms")
+        st.caption(f"Total {summary['wall_seconds']} dtk · {summary['prompt_tokens']} token prompt / "
+                   f"{summary['completion_tokens']} token jawaban · hasil: `{out_path}`")
+        st.dataframe(rows, use_container_width=True)
+        if os.path.exists(out_path):
+            with open(out_path, "rb") as fh:
+                st.download_button("⬇️ Unduh hasil", fh.read(), file_name=os.path.basename(out_path))
+
+cache_stats = get_embedding_cache().stats()
+embed_cache_stats_box.caption(
+    f"Hit rate: {cache_stats['hit_rate']:.0%} ({cache_stats['hits']} hit / {cache_stats['misses']} miss) · "
+    f"{cache_stats['entries']} vektor · {cache_stats['bytes'] / 1e6:.1f} MB"
+)
+answer_stats = get_answer_cache().stats()
+answer_cache_stats_box.caption(
+    f"Cache jawaban: {answer_stats['hits']} hit / {answer_stats['misses']} miss ({answer_stats['hit_rate']:.0%}) · "
+    f"{answer_stats['entries']} entri · hemat {answer_stats['saved_seconds']:.1f} dtk"
+)
+
+warmup.mark("script_end")
+
+if debug_panel:
+    with debug_box:
+        last = st.session_state.get("last_trace")
+        if last is not None and last.total is not None:
+            st.caption(f"Permintaan terakhir ({last.kind}): {last.total * 1000:.0f} ms")
+            st.dataframe(last.rows(), use_container_width=True)
+        else:
+            st.caption("Belum ada permintaan yang direkam.")
+        with st.expander("Agregat proses"):
+            st.dataframe(tracing.REGISTRY.summary(), use_container_width=True)
+        with st.expander("Startup (cold start & warm-up)"):
+            st.dataframe(warmup.report(), use_container_width=True)
+        st.caption("Registry koleksi: " + " · ".join(f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}" for k, v in COLLECTIONS.stats().items()))
+        st.download_button("⬇️ Metrik (Prometheus)", tracing.prometheus_text(), file_name="metrics.prom")
+        st.download_button("⬇️ Metrik (JSONL)", tracing.metrics_jsonl(), file_name="metrics.jsonl")
@@ -0,0 +1,116 @@
+"""Startup cepat: sumber daya berat (model embedding, client Chroma, encoder tiktoken) dimuat di
+thread latar sementara UI Streamlit sudah dirender, lalu diambil saat pertama kali dipakai.
+
+    warmup.start("model", load_model)        # segera kembali; berjalan sekali per proses
+    model = warmup.result("model", load_model)  # menunggu bila belum selesai
+
+Tugas disimpan per proses (bukan per sesi/rerun), jadi rerun Streamlit tidak memuat ulang.
+`RAG_STARTUP=eager` mengembalikan perilaku lama (start() menunggu sampai selesai), berguna untuk
+membandingkan waktu cold start. Lama impor modul, durasi tiap tugas, berapa lama UI benar-benar
+menunggu, dan penanda seperti "first_paint" dikumpulkan di `report()` untuk panel debug.
+"""
+import os
+import sys
+import time
+import importlib
+import threading
+
+import tracing
+
+EAGER = os.getenv("RAG_STARTUP", "lazy") == "eager"
+
+def _process_started():
+    """Waktu mulai proses (epoch) dari /proc; di luar Linux jatuh ke waktu modul ini diimpor."""
+    try:
+        with open("/proc/self/stat") as fh:
+            start_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+PROCESS_STARTED = _process_started()
+_MODULE_LOADED = time.time()
+
+class _Task:
+    def __init__(self, name, fn, args):
+        self.name, self.fn, self.args = name, fn, args
+        self.done = threading.Event()
+        self.value = self.error = None
+        self.started = time.time()
+        self.seconds = None
+        self.waited = 0.0  # total detik pemanggil result() terblokir menunggu tugas ini
+        self.thread = threading.Thread(target=self._run, name=f"warmup-{name}", daemon=True)
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.value = self.fn(*self.args)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - started
+            self.done.set()
+            tracing.record("warmup", self.seconds, task=self.name, error=self.error is not None)
+
+_tasks = {}
+_imports = {}  # modul -> detik impor (hanya impor pertama di proses ini)
+_marks = {}    # penanda -> detik sejak proses mulai
+_lock = threading.Lock()
+
+def start(name, fn, *args):
+    """Jalankan `fn(*args)` di thread latar, sekali per proses; tugas yang gagal boleh diulang."""
+    with _lock:
+        task = _tasks.get(name)
+        if task is None or (task.done.is_set() and task.error is not None):
+            task = _tasks[name] = _Task(name, fn, args)
+            task.thread.start()
+    if EAGER: task.done.wait()
+    return task
+
+def result(name, fn=None, *args, timeout=None):
+    """Hasil tugas `name`, menunggu bila belum selesai. Bila belum pernah dimulai, `fn(*args)`
+    dimulai sekarang. Error dari tugas diteruskan ke pemanggil."""
+    task = _tasks.get(name)
+    if task is None or (fn is not None and task.done.is_set() and task.error is not None):
+        if fn is None: raise KeyError(f"Tugas warm-up '{name}' belum dimulai")
+        task = start(name, fn, *args)
+    if not task.done.is_set():
+        started = time.perf_counter()
+        if not task.done.wait(timeout):
+            raise TimeoutError(f"Tugas warm-up '{name}' belum selesai setelah {timeout} dtk")
+        task.waited += time.perf_counter() - started
+    if task.error is not None: raise task.error
+    return task.value
+
+def ready(name):
+    task = _tasks.get(name)
+    return task is not None and task.done.is_set() and task.error is None
+
+def timed_import(module_name):
+    """importlib.import_module dengan pencatatan lama impor (bila modul belum pernah diimpor)."""
+    if module_name in sys.modules: return sys.modules[module_name]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _lock:
+        _imports.setdefault(module_name, time.perf_counter() - started)
+    return module
+
+def mark(event):
+    """Catat penanda waktu (detik sejak proses mulai); hanya kemunculan pertama per proses."""
+    with _lock:
+        _marks.setdefault(event, time.time() - PROCESS_STARTED)
+
+def report():
+    """Baris untuk panel debug: penanda startup, impor modul, dan tugas warm-up."""
+    with _lock:
+        rows = [{"jenis": "penanda", "nama": name, "detik": round(t, 3)} for name, t in sorted(_marks.items(), key=lambda x: x[1])]
+        rows.append({"jenis": "penanda", "nama": "warmup diimpor", "detik": round(_MODULE_LOADED - PROCESS_STARTED, 3)})
+        rows += [{"jenis": "impor", "nama": name, "detik": round(t, 3)} for name, t in _imports.items()]
+        for task in _tasks.values():
+            status = "berjalan" if not task.done.is_set() else ("gagal" if task.error is not None else "siap")
+            rows.append({"jenis": "warm-up", "nama": task.name, "status": status,
+                         "detik": round(task.seconds, 3) if task.seconds is not None else None,
+                         "mulai": round(task.started - PROCESS_STARTED, 3), "ditunggu_ui": round(task.waited, 3)})
+    return rows